@@ -0,0 +1,59 @@
+"""How long the game loop is held by a save: writing it in place, encoding it and handing the bytes to a writer
+thread, or forking and letting the child do everything. Uses the deep level game of the save benchmark.
+
+Run from the Core folder: python -m benchmarks.autosave_benchmark
+"""
+import os
+import time
+import random
+import logging
+import argparse
+import tempfile
+from managers import SaveGame
+from managers.AutoSaver import AutoSaver
+from benchmarks.save_benchmark import make_game
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-d", "--depth", type=int, default=20, help="dungeon level the game is set up at")
+parser.add_argument("-n", "--number", type=int, default=20, help="saves measured per method")
+parser.add_argument("--seed", type=int, default=1)
+
+
+def blocking_stalls(path, game_context, number):
+    stalls = []
+    for _ in range(number):
+        start = time.perf_counter()
+        SaveGame.save_game(path, game_context)
+        stalls.append(time.perf_counter() - start)
+    return stalls
+
+
+def autosaver_stalls(path, game_context, number, use_fork):
+    autosaver = AutoSaver(path, use_fork=use_fork)
+    for _ in range(number):
+        autosaver.save(game_context)
+        autosaver.wait()
+    return autosaver.stalls
+
+
+def main():
+    args = parser.parse_args()
+    random.seed(args.seed)
+    logging.disable(logging.WARNING)
+    game_context = make_game(args.depth, args.seed)
+
+    methods = [("blocking", lambda path: blocking_stalls(path, game_context, args.number)),
+               ("thread", lambda path: autosaver_stalls(path, game_context, args.number, use_fork=False))]
+    if hasattr(os, 'fork'):
+        methods.append(("fork", lambda path: autosaver_stalls(path, game_context, args.number, use_fork=True)))
+
+    print("{:<10} {:>10} {:>10} {:>10}   (ms the game loop waits per save)".format("method", "mean", "median", "max"))
+    with tempfile.TemporaryDirectory() as folder:
+        for name, method in methods:
+            stalls = sorted(stall * 1000 for stall in method(os.path.join(folder, name + ".sav")))
+            print("{:<10} {:>10.2f} {:>10.2f} {:>10.2f}".format(
+                name, sum(stalls) / len(stalls), stalls[len(stalls) // 2], stalls[-1]))
+
+
+if __name__ == '__main__':
+    main()
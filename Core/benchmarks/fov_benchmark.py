@@ -0,0 +1,70 @@
+"""Times the field of view engines against tdl.map.quickFOV with the TileMap.is_visible_tile callback,
+for torch radii from 5 to 30 on generated CONSTRUCTIVE1 maps.
+
+Run from the Core folder: python -m benchmarks.fov_benchmark
+"""
+import os
+import random
+import timeit
+import argparse
+import logging
+import numpy as np
+import tdl
+from models.MapObjects import MapConstructor
+from models.EnumStatus import MapTypes
+from utils import FieldOfView
+
+tiles_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "gamedata", "tiles")
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-n", "--number", type=int, default=20, help="field of views timed per origin")
+parser.add_argument("-o", "--origins", type=int, default=10, help="random floor tiles used as origin")
+parser.add_argument("--seed", type=int, default=1)
+parser.add_argument("--radii", type=str, default="5,10,15,20,25,30")
+
+
+def quick_fov_mask(tile_map, x, y, radius):
+    """The previous path: a python callback per tile and a set of tuples turned into a mask"""
+    visible_tiles = tdl.map.quickFOV(x, y, tile_map.is_visible_tile, fov='SHADOW', radius=radius, lightWalls=True)
+    tile_map.set_visible_tiles(visible_tiles)
+    return tile_map.visible_tiles
+
+
+def main():
+    args = parser.parse_args()
+    random.seed(args.seed)
+    logging.disable(logging.WARNING)
+
+    tile_map = MapConstructor(200, 200, max_number_of_rooms=30).add_starting_tile_template(
+        os.path.join(tiles_dir, "room-02.yaml")
+    ).add_tile_template_folder(
+        tiles_dir
+    ).make_random_map(strategy=MapTypes.CONSTRUCTIVE1, maximum_number_of_tries=150)
+
+    floor = np.argwhere(~tile_map.blocked)
+    origins = [tuple(floor[random.randrange(len(floor))]) for _ in range(args.origins)]
+
+    methods = [('quickFOV', lambda x, y, r: quick_fov_mask(tile_map, x, y, r))]
+    for name in sorted(FieldOfView.ALGORITHMS):
+        methods.append((name, lambda x, y, r, name=name: FieldOfView.compute_fov(
+            tile_map.transparent, x, y, radius=r, algorithm=name)))
+
+    print("{:>6} ".format("radius") + " ".join("{:>12}".format(name) for name, _ in methods) + "   (ms per fov)")
+    for radius in (int(r) for r in args.radii.split(',')):
+        timings = []
+        for name, method in methods:
+            total = sum(timeit.timeit(lambda: method(x, y, radius), number=args.number) for x, y in origins)
+            timings.append(total / (args.number * len(origins)) * 1000)
+        print("{:>6} ".format(radius) + " ".join("{:>12.3f}".format(t) for t in timings))
+
+    # how close the shadowcasting mask is to what quickFOV used to light
+    agreement = []
+    for x, y in origins:
+        reference = quick_fov_mask(tile_map, x, y, 10).copy()
+        mask = FieldOfView.compute_fov(tile_map.transparent, x, y, radius=10, algorithm='SHADOW')
+        agreement.append((reference & mask).sum() / (reference | mask).sum())
+    print("SHADOW lights the same tiles as quickFOV on {:.2%} of the lit area at radius 10".format(np.mean(agreement)))
+
+
+if __name__ == '__main__':
+    main()
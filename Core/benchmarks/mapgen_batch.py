@@ -0,0 +1,141 @@
+"""Generates a batch of seeded maps with one MapTypes strategy on every core, and writes the numbers of each map
+to a jsonl or npz file: generation time, rooms placed against the maximum, placement tries used, walkable
+cells and how much of them can be reached from the first room. Prints percentiles of all of them, to tune
+maximum_number_of_tries and the tile set against what the generation really costs.
+The map of a seed is the one the game would make with the same settings, see LevelGenerator.
+
+Run from the Core folder: python -m benchmarks.mapgen_batch -n 2000 -o maps.jsonl
+"""
+import os
+import json
+import time
+import random
+import logging
+import argparse
+import multiprocessing
+import numpy as np
+from models.MapObjects import MapConstructor
+from models.EnumStatus import MapTypes
+from utils import PathFinding
+
+tiles_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "gamedata", "tiles")
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-n", "--number", type=int, default=1000, help="maps generated")
+parser.add_argument("-s", "--strategy", type=str, default=MapTypes.CONSTRUCTIVE1.name,
+                    choices=[strategy.name for strategy in MapTypes])
+parser.add_argument("-r", "--rooms", type=int, default=30, help="maximum number of rooms")
+parser.add_argument("-t", "--tries", type=int, default=150, help="maximum number of tries")
+parser.add_argument("--size", type=str, default="200x200", help="size of the maps, WxH")
+parser.add_argument("--starting_room", type=str, default="room-02.yaml")
+parser.add_argument("--seed", type=int, default=1, help="seed the seeds of the maps are derived from")
+parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes, defaults to one per core")
+parser.add_argument("-o", "--output", type=str, default=None,
+                    help="file for the numbers of every map, .jsonl or .npz")
+
+# numbers of every map, in the order of the npz columns
+FIELDS = ('index', 'seed', 'ms', 'rooms', 'max_rooms', 'tries_used', 'tries', 'walkable', 'reachable',
+          'rooms_reachable')
+SUMMARY = ('ms', 'rooms', 'tries_used', 'walkable', 'reachable', 'rooms_reachable')
+
+
+def seed_for(game_seed, index):
+    # derived the way LevelGenerator.seed_for does it, a map of the batch is a level of some game
+    return random.Random("{}-{}".format(game_seed, index)).getrandbits(32)
+
+
+def generate(task):
+    index, seed, settings = task
+    width, height, rooms, strategy, tries, starting_room = settings
+
+    constructor = MapConstructor(width, height, max_number_of_rooms=rooms, rng=random.Random(seed))
+    constructor.add_starting_tile_template(os.path.join(tiles_dir, starting_room)).add_tile_template_folder(tiles_dir)
+    start = time.perf_counter()
+    tile_map = constructor.make_random_map(strategy=MapTypes[strategy], maximum_number_of_tries=tries)
+    elapsed = time.perf_counter() - start
+
+    walkable = int(np.count_nonzero(~tile_map.blocked))
+    map_rooms = tile_map.get_rooms()
+    reachable, rooms_reachable = 0.0, 0.0
+    if map_rooms and walkable:
+        distances = np.array(PathFinding.dijkstra_map(tile_map, [tuple(map_rooms[0].center())]))
+        distances = distances.reshape(tile_map.blocked.shape)
+        reached = (distances < PathFinding.unreachable(tile_map)) & ~tile_map.blocked
+        reachable = float(np.count_nonzero(reached)) / walkable
+        # the center of a room may be a wall of its template, any of its floor cells will do
+        rooms_reachable = sum(1 for room in map_rooms if reached[room.x1:room.x2, room.y1:room.y2].any()) \
+            / float(len(map_rooms))
+
+    return {
+        'index': index,
+        'seed': seed,
+        'ms': elapsed * 1000,
+        'rooms': len(map_rooms),
+        'max_rooms': rooms,
+        'tries_used': constructor.tries_used,
+        'tries': tries,
+        'walkable': walkable,
+        'reachable': reachable,
+        'rooms_reachable': rooms_reachable,
+        'skipped_templates': constructor.skipped_templates
+    }
+
+
+def write(path, stats):
+    if path.endswith('.npz'):
+        np.savez_compressed(path, **{field: np.array([row[field] for row in stats]) for field in FIELDS})
+    else:
+        with open(path, 'w') as stream:
+            for row in stats:
+                stream.write(json.dumps(row) + '\n')
+
+
+def summary(stats):
+    lines = ["{:<16} {:>10} {:>10} {:>10} {:>10} {:>10}".format("", "min", "p50", "p90", "p99", "max")]
+    for field in SUMMARY:
+        values = np.array([row[field] for row in stats], dtype=float)
+        p50, p90, p99 = np.percentile(values, [50, 90, 99])
+        lines.append("{:<16} {:>10.2f} {:>10.2f} {:>10.2f} {:>10.2f} {:>10.2f}".format(
+            field, values.min(), p50, p90, p99, values.max()))
+    full = sum(1 for row in stats if row['rooms'] >= row['max_rooms'])
+    exhausted = sum(1 for row in stats if row['tries_used'] >= row['tries'] and row['rooms'] < row['max_rooms'])
+    connected = sum(1 for row in stats if row['rooms_reachable'] == 1.0)
+    lines.append("{} maps: {:.1%} reached the maximum of rooms, {:.1%} ran out of tries, {:.1%} fully connected"
+                 .format(len(stats), full / len(stats), exhausted / len(stats), connected / len(stats)))
+    return "\n".join(lines)
+
+
+def main():
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    width, height = (int(value) for value in args.size.split('x'))
+    settings = (width, height, args.rooms, args.strategy, args.tries, args.starting_room)
+    tasks = [(index, seed_for(args.seed, index), settings) for index in range(args.number)]
+    jobs = args.jobs or multiprocessing.cpu_count()
+
+    start = time.perf_counter()
+    pool = multiprocessing.Pool(jobs)
+    try:
+        stats = sorted(pool.imap_unordered(generate, tasks, chunksize=max(1, len(tasks) // (jobs * 8))),
+                       key=lambda row: row['index'])
+    except NotImplementedError:
+        parser.error("the {} strategy is not implemented".format(args.strategy))
+    finally:
+        pool.close()
+        pool.join()
+    elapsed = time.perf_counter() - start
+
+    print("{} {} maps of {}x{}, at most {} rooms and {} tries, in {:.1f}s on {} processes".format(
+        args.number, args.strategy, width, height, args.rooms, args.tries, elapsed, jobs))
+    print(summary(stats))
+    # the warnings of the workers are turned off with the rest, tell about the tile set here
+    skipped = sorted(set(name for row in stats for name in row['skipped_templates']))
+    if skipped:
+        print("tile templates skipped by the {} strategy: {}".format(args.strategy, ", ".join(skipped)))
+    if args.output:
+        write(args.output, stats)
+        print("numbers of every map written to {}".format(args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Times CONSTRUCTIVE1 map generation with the tile templates parsed from disk on every placement attempt,
+as it used to be, against the templates cached on the tile_templates registry.
+
+Run from the Core folder: python -m benchmarks.mapgen_benchmark
+"""
+import os
+import random
+import timeit
+import argparse
+import logging
+from models import MapObjects
+from models.MapObjects import MapConstructor, TileTemplate
+from models.EnumStatus import MapTypes
+
+tiles_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "gamedata", "tiles")
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-n", "--number", type=int, default=20, help="maps generated per measure")
+parser.add_argument("-r", "--rooms", type=int, default=30, help="maximum number of rooms")
+parser.add_argument("--seed", type=int, default=1)
+
+
+class UncachedRegistry(object):
+    """Parses the yaml file on every request, like Room.load did before the registry"""
+    def get(self, yaml_file):
+        return TileTemplate.load(yaml_file)
+
+
+def make_map(rooms):
+    return MapConstructor(200, 200, max_number_of_rooms=rooms).add_starting_tile_template(
+        os.path.join(tiles_dir, "room-02.yaml")
+    ).add_tile_template_folder(
+        tiles_dir
+    ).make_random_map(strategy=MapTypes.CONSTRUCTIVE1, maximum_number_of_tries=150)
+
+
+def measure(rooms, number, seed):
+    random.seed(seed)
+    return timeit.timeit(lambda: make_map(rooms), number=number) / number
+
+
+def main():
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    cached = MapObjects.tile_templates
+    MapObjects.tile_templates = UncachedRegistry()
+    parsing = measure(args.rooms, args.number, args.seed)
+    MapObjects.tile_templates = cached
+    caching = measure(args.rooms, args.number, args.seed)
+
+    print("parsing every attempt: {:.2f}ms per map".format(parsing * 1000))
+    print("cached templates:      {:.2f}ms per map ({:.1f}x faster)".format(caching * 1000, parsing / caching))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Times PathFinding.breadth_first_search against the A* engine on generated CONSTRUCTIVE1 maps,
+using pairs of floor tiles that are connected to each other. bfs and a*-manhattan-4 move in four directions,
+the others in eight, so their step counts are not comparable with the first two.
+
+Run from the Core folder: python -m benchmarks.pathfinding_benchmark
+"""
+import os
+import random
+import timeit
+import argparse
+import logging
+import numpy as np
+from models.MapObjects import MapConstructor
+from models.EnumStatus import MapTypes
+from utils import PathFinding
+
+tiles_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "gamedata", "tiles")
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-m", "--maps", type=int, default=5, help="number of maps generated")
+parser.add_argument("-p", "--pairs", type=int, default=20, help="start and goal pairs per map")
+parser.add_argument("-r", "--rooms", type=int, default=30, help="max number of rooms per map")
+parser.add_argument("--seed", type=int, default=1)
+
+
+def make_map(max_rooms):
+    return MapConstructor(200, 200, max_number_of_rooms=max_rooms).add_starting_tile_template(
+        os.path.join(tiles_dir, "room-02.yaml")
+    ).add_tile_template_folder(
+        tiles_dir
+    ).make_random_map(strategy=MapTypes.CONSTRUCTIVE1, maximum_number_of_tries=150)
+
+
+def connected_pairs(tile_map, count):
+    floor = [tuple(coord) for coord in np.argwhere(~tile_map.blocked).tolist()]
+    pairs = []
+    while len(pairs) < count:
+        start, goal = random.choice(floor), random.choice(floor)
+        path = PathFinding.breadth_first_search(tile_map, start, goal)
+        if start != goal and path[-1] == goal:
+            pairs.append((start, goal))
+    return pairs
+
+
+def main():
+    args = parser.parse_args()
+    random.seed(args.seed)
+    logging.disable(logging.WARNING)
+
+    methods = [('bfs', lambda m, s, g: PathFinding.breadth_first_search(m, s, g))]
+    # manhattan is only admissible without diagonals, it searches the same four way moves as bfs
+    methods.append(('a*-manhattan-4', lambda m, s, g: PathFinding.a_star_search(
+        m, s, g, heuristic='manhattan', diagonal=False, max_expansions=40000)))
+    for heuristic in ('octile', 'chebyshev'):
+        methods.append(('a*-' + heuristic, lambda m, s, g, h=heuristic: PathFinding.a_star_search(
+            m, s, g, heuristic=h, max_expansions=40000)))
+    methods.append(('dijkstra', lambda m, s, g: PathFinding.dijkstra_search(m, s, g)))
+
+    totals = {name: 0.0 for name, _ in methods}
+    lengths = {name: 0 for name, _ in methods}
+    searches = 0
+    for _ in range(args.maps):
+        tile_map = make_map(args.rooms)
+        for start, goal in connected_pairs(tile_map, args.pairs):
+            searches += 1
+            for name, method in methods:
+                totals[name] += timeit.timeit(lambda: method(tile_map, start, goal), number=1)
+                lengths[name] += len(method(tile_map, start, goal)) - 1
+
+    baseline = totals['bfs']
+    for name, _ in methods:
+        print("{:>14}: {:8.3f}ms per search, {:6.1f} steps on average, {:5.1f}x faster than bfs".format(
+            name, totals[name] / searches * 1000, lengths[name] / searches, baseline / totals[name]))
+
+
+if __name__ == '__main__':
+    main()
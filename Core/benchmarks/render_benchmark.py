@@ -0,0 +1,112 @@
+"""Compares the vectorized TileMap.draw against the old per cell loop on an off-screen console.
+No window is opened, both renders are checked cell by cell before timing them.
+
+Run from the Core folder: python -m benchmarks.render_benchmark
+"""
+import os
+import random
+import timeit
+import argparse
+import tdl
+from models.MapObjects import MapConstructor
+from models.EnumStatus import MapTypes
+from models.GenericObjects import Vector2
+from utils.Registry import colors as palette
+
+tiles_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "gamedata", "tiles")
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-s", "--screensize", type=str, default='100x75',
+                    help="size of the viewport in tiles using the pattern WxH")
+parser.add_argument("-n", "--number", type=int, default=50, help="renders timed per method")
+parser.add_argument("--seed", type=int, default=1)
+
+
+class Camera(object):
+    def __init__(self, camera_coord, camera_width, camera_height):
+        self.camera_coord = camera_coord
+        self.camera_width = camera_width
+        self.camera_height = camera_height
+
+
+def per_cell_draw(tile_map, console, camera):
+    """The previous TileMap.draw, kept here as the reference output"""
+    for x in range(camera.camera_width):
+        for y in range(camera.camera_height):
+            map_x, map_y = x + camera.camera_coord.X, y + camera.camera_coord.Y
+
+            visible = tile_map.visible_tiles[map_x, map_y]
+            wall = not tile_map.transparent[map_x, map_y]
+            explored = tile_map.explored[map_x, map_y]
+
+            if visible:
+                tile_map.explored[map_x, map_y] = True
+
+            bg_color = None
+            fg_color = None
+            char = None
+            if visible or explored:
+                # shades 1/2 are dark ground/wall, 3/4 light ground/wall
+                shade = (3 if visible else 1) + wall
+                color = palette.tuples[tile_map.shade_colors[shade]]
+                if not tile_map.legacy_mode:
+                    bg_color = color
+                else:
+                    fg_color = color
+                    char = '#' if wall else '.'
+
+            console.draw_char(x, y, char, fg=fg_color, bg=bg_color)
+
+
+def make_scene(width, height):
+    tile_map = MapConstructor(200, 200, max_number_of_rooms=20).add_starting_tile_template(
+        os.path.join(tiles_dir, "room-02.yaml")
+    ).add_tile_template_folder(
+        tiles_dir
+    ).make_random_map(strategy=MapTypes.CONSTRUCTIVE1, maximum_number_of_tries=150)
+
+    center = tile_map.get_rooms()[0].center()
+    camera_x = min(max(0, center.X - width // 2), tile_map.get_width() - width)
+    camera_y = min(max(0, center.Y - height // 2), tile_map.get_height() - height)
+    camera = Camera(Vector2(camera_x, camera_y), width, height)
+
+    # half the viewport was seen before, a disc around the center is in view now
+    tile_map.explored[camera.camera_coord.X:camera.camera_coord.X + width // 2, :] = True
+    visible = set((x, y) for x in range(center.X - 9, center.X + 10) for y in range(center.Y - 9, center.Y + 10)
+                  if (x - center.X) ** 2 + (y - center.Y) ** 2 <= 81)
+    tile_map.set_visible_tiles(visible)
+    return tile_map, camera
+
+
+def same_output(first, second, width, height):
+    return all(first.get_char(x, y) == second.get_char(x, y) for x in range(width) for y in range(height))
+
+
+def main():
+    args = parser.parse_args()
+    random.seed(args.seed)
+    width, height = (int(v) for v in args.screensize.split('x'))
+
+    for legacy_mode in (False, True):
+        tile_map, camera = make_scene(width, height)
+        tile_map.legacy_mode = legacy_mode
+        explored = tile_map.explored.copy()
+
+        reference, vectorized = tdl.Console(width, height), tdl.Console(width, height)
+        per_cell_draw(tile_map, reference, camera)
+        reference_explored = tile_map.explored.copy()
+        tile_map.explored[:] = explored
+        tile_map.draw(vectorized, camera)
+
+        identical = same_output(reference, vectorized, width, height) and \
+            (reference_explored == tile_map.explored).all()
+
+        per_cell = timeit.timeit(lambda: per_cell_draw(tile_map, reference, camera), number=args.number)
+        vector = timeit.timeit(lambda: tile_map.draw(vectorized, camera), number=args.number)
+
+        print("legacy_mode={} identical={} per-cell={:.2f}ms vectorized={:.2f}ms speedup={:.1f}x".format(
+            legacy_mode, identical, per_cell / args.number * 1000, vector / args.number * 1000, per_cell / vector))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Times drawing monster templates with the previous linear scan over the template list against the alias
+tables of TagSampler, for growing template libraries.
+
+Run from the Core folder: python -m benchmarks.sampling_benchmark
+"""
+import random
+import timeit
+import argparse
+from utils.Sampling import TagSampler
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-d", "--draws", type=int, default=200, help="templates drawn per measure")
+parser.add_argument("-n", "--number", type=int, default=20, help="measures averaged")
+parser.add_argument("--sizes", type=str, default="10,100,1000,10000", help="sizes of the template library")
+parser.add_argument("--seed", type=int, default=1)
+
+
+def linear_draw(object_templates, tag):
+    """The previous MapObjectsConstructor._get_random_object_template, without building the object"""
+    filtered_template_list = [template for template in object_templates if tag in template[1]["tags"]]
+
+    total = sum(w for _, _, w in filtered_template_list)
+    r = random.uniform(0, total)
+    upto = 0
+    for obj_template, argument_template, weight in filtered_template_list:
+        if upto + weight >= r:
+            return argument_template
+        upto += weight
+
+
+def make_library(size):
+    library = []
+    for i in range(size):
+        tags = ["monster"] if i % 2 else ["item"]
+        library.append((None, {"name": "template {}".format(i), "tags": tags}, random.uniform(0.1, 5.0)))
+    return library
+
+
+def main():
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    print("{:>8} {:>12} {:>12}   (ms per {} draws)".format("library", "linear", "alias", args.draws))
+    for size in (int(s) for s in args.sizes.split(',')):
+        library = make_library(size)
+        sampler = TagSampler(rng=random.Random(args.seed))
+        for obj_template, argument_template, weight in library:
+            sampler.add(argument_template, weight, argument_template["tags"])
+        sampler.compile()
+
+        linear = timeit.timeit(lambda: [linear_draw(library, "monster") for _ in range(args.draws)],
+                               number=args.number) / args.number
+        alias = timeit.timeit(lambda: sampler.draw_many("monster", args.draws), number=args.number) / args.number
+        print("{:>8} {:>12.3f} {:>12.3f}".format(size, linear * 1000, alias * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""Size, save time and load time of the binary save files of SaveGame against the shelve dump core.py used
+to write, on a game set up at a deep dungeon level: a map built for that level, populated, fully explored,
+and a player carrying every item of the level file. The binary files are timed with the whole level stored
+and with the level stored as its seed plus the objects that changed, which is what the game writes.
+
+Run from the Core folder: python -m benchmarks.save_benchmark
+"""
+import os
+import glob
+import random
+import shelve
+import logging
+import argparse
+import tempfile
+import time
+import numpy as np
+import yaml
+from managers import ObjectManager, ObjectPool, SaveGame
+from managers.GenericControllerObjects import GameContext
+from models import GameObjects
+from models.GameObjects import Character
+from models.EnumStatus import EGameState
+from managers.LevelGenerator import LevelGenerator
+
+gamedata_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "gamedata")
+tiles_dir = os.path.join(gamedata_dir, "tiles")
+level_file = os.path.join(gamedata_dir, "map_data1.yaml")
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-d", "--depth", type=int, default=20, help="dungeon level the game is set up at")
+parser.add_argument("-n", "--number", type=int, default=10, help="saves and loads timed, the best one is kept")
+parser.add_argument("--seed", type=int, default=1)
+
+
+def make_game(depth, seed):
+    game_context = GameContext(next_level=None, game_state=ObjectManager.GameState(EGameState.PLAYING),
+                               level_generator=LevelGenerator(seed, level_file, tiles_dir))
+    game_context.set_object_pool(ObjectPool.ObjectPool())
+    game_context.level_generator.generate(depth, game_context)
+
+    messages = ObjectManager.ConsoleBuffer(ObjectManager.NullConsole(), width=80, height=7)
+    messages.add_message_console(58, 6, 22, 1)
+    game_context.lower_gui_renderer = messages
+
+    player = Character.load(
+        yaml_file=os.path.join(gamedata_dir, "player.yaml"),
+        coord=game_context.map.get_rooms()[0].center(),
+        collision_handler=game_context.collision_handler,
+        inventory=list(),
+        game_state=game_context.game_state
+    )
+    game_context.set_player(player)
+    game_context.add_extra("dungeon_level", depth)
+
+    with open(level_file) as stream:
+        level = yaml.safe_load(stream)
+    for template in level.get("items") or []:
+        item = getattr(GameObjects, template["type"]).load(hard_values=template["params"])
+        item.pick_up(player)
+
+    game_context.map.explored[:] = True
+    for _ in range(depth):
+        for monster in game_context.object_pool.find_by_tag("monster"):
+            if monster.fighter:
+                monster.fighter.automatic_level_up()
+    return game_context
+
+
+def shelve_save(path, game_context):
+    """The previous core.save()"""
+    with shelve.open(path, 'n') as savefile:
+        savefile['game_context'] = game_context
+        savefile['player-id'] = game_context.player.get_id()
+        savefile['object_pool'] = game_context.object_pool.get_objects_as_dict()
+        savefile['map'] = game_context.map
+        savefile['game_msgs'] = game_context.lower_gui_renderer.game_msg
+        savefile['game_state'] = game_context.game_state
+        savefile['ais'] = {k: monster.ai for k, monster in game_context.object_pool.get_objects_as_dict().items()
+                           if type(monster) == Character}
+        savefile['fighters'] = {k: monster.fighter for k, monster in game_context.object_pool.get_objects_as_dict().items()
+                                if type(monster) == Character}
+        savefile['dungeon_level'] = game_context.get_extra("dungeon_level")
+        savefile['extras'] = game_context.extras
+
+
+def shelve_load(path):
+    """The previous core.load(), up to the point where the gui is built"""
+    with shelve.open(path, 'r') as savefile:
+        tile_map = savefile['map']
+        objects = savefile['object_pool']
+        player_id = savefile['player-id']
+        game_state = savefile['game_state']
+        ais = savefile['ais']
+        fighters = savefile['fighters']
+        extras = savefile['extras']
+
+    game_context = GameContext(next_level=None, game_state=ObjectManager.GameState(game_state))
+    game_context.extras = extras
+    game_context.set_object_pool(ObjectPool.ObjectPool())
+    game_context.set_map(tile_map)
+    for k, v in objects.items():
+        v.collision_handler = game_context.collision_handler
+        if k in fighters.keys():
+            v.fighter = fighters[k]
+            if v.fighter:
+                v.fighter.owner = v
+        if k in ais.keys():
+            v.ai = ais[k]
+            if v.ai:
+                v.ai.owner = v
+                v.ai.visible_tiles_ref = tile_map.visible_tiles
+        if k == player_id:
+            v.game_state = game_context.game_state
+            game_context.set_player(v)
+        else:
+            game_context.object_pool.append(v)
+    return game_context
+
+
+def full_save(path, game_context):
+    """The binary file with the whole level stored, as if it did not come from a seed"""
+    level, game_context.level = game_context.level, None
+    try:
+        SaveGame.save_game(path, game_context)
+    finally:
+        game_context.level = level
+
+
+def binary_load(path):
+    game_context = GameContext(next_level=None, game_state=ObjectManager.GameState(EGameState.LOADING),
+                               level_generator=LevelGenerator(None, level_file, tiles_dir))
+    SaveGame.load_game(path, game_context)
+    return game_context
+
+
+def best(function, number):
+    timings = []
+    for _ in range(number):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def same_game(first, second):
+    return (np.array_equal(first.map.blocked, second.map.blocked)
+            and np.array_equal(first.map.explored, second.map.explored)
+            and len(first.object_pool.get_objects_as_list()) == len(second.object_pool.get_objects_as_list())
+            and first.player.coord == second.player.coord
+            and first.player.fighter.hp == second.player.fighter.hp
+            and first.player.fighter.power == second.player.fighter.power
+            and [item.name for item in first.player.inventory] == [item.name for item in second.player.inventory])
+
+
+def main():
+    args = parser.parse_args()
+    random.seed(args.seed)
+    logging.disable(logging.WARNING)
+
+    game_context = make_game(args.depth, args.seed)
+    print("dungeon level {}, {} objects on the pool, {} items carried".format(
+        args.depth, len(game_context.object_pool.get_objects_as_list()), len(game_context.player.inventory)))
+
+    with tempfile.TemporaryDirectory() as folder:
+        shelve_path = os.path.join(folder, "savegame")
+        full_path = os.path.join(folder, "full.sav")
+        binary_path = os.path.join(folder, "savegame.sav")
+
+        rows = [
+            ("shelve",
+             best(lambda: shelve_save(shelve_path, game_context), args.number),
+             best(lambda: shelve_load(shelve_path), args.number),
+             sum(os.path.getsize(path) for path in glob.glob(shelve_path + "*"))),
+            ("full",
+             best(lambda: full_save(full_path, game_context), args.number),
+             best(lambda: binary_load(full_path), args.number),
+             os.path.getsize(full_path)),
+            ("seed",
+             best(lambda: SaveGame.save_game(binary_path, game_context), args.number),
+             best(lambda: binary_load(binary_path), args.number),
+             os.path.getsize(binary_path)),
+        ]
+
+        print("{:<8} {:>10} {:>10} {:>12}".format("format", "save ms", "load ms", "bytes"))
+        for row in rows:
+            print("{:<8} {:>10.1f} {:>10.1f} {:>12,}".format(*row))
+        print("round trip keeps the game: full {}, seed {}".format(
+            same_game(game_context, binary_load(full_path)), same_game(game_context, binary_load(binary_path))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Spawn throughput for the templates of a level file, building every object with load(hard_values=...)
+as it used to be against cloning the prototypes compiled once by MapObjectsConstructor.
+
+Run from the Core folder: python -m benchmarks.spawn_benchmark
+"""
+import os
+import time
+import argparse
+import logging
+import yaml
+from models import GameObjects
+
+gamedata_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "gamedata")
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-n", "--number", type=int, default=20000, help="objects spawned per type and method")
+parser.add_argument("-L", "--level_file", type=str, default="map_data1.yaml")
+
+
+def throughput(spawn, templates, number):
+    start = time.perf_counter()
+    for i in range(number):
+        spawn(templates[i % len(templates)])
+    return number / (time.perf_counter() - start)
+
+
+def main():
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    with open(os.path.join(gamedata_dir, args.level_file)) as stream:
+        level = yaml.safe_load(stream)
+
+    by_type = {}
+    for key in ("items", "monsters", "mandatory"):
+        for template in level.get(key) or []:
+            by_type.setdefault(template["type"], []).append(template["params"])
+
+    print("{:<12} {:>10} {:>16} {:>16}   (objects per second)".format("type", "templates", "load", "clone"))
+    for type_name in ("Character", "Item", "Equipment"):
+        templates = by_type.get(type_name)
+        if not templates:
+            continue
+        obj_template = getattr(GameObjects, type_name)
+        prototypes = [obj_template.load(hard_values=params) for params in templates]
+
+        loading = throughput(lambda params: obj_template.load(hard_values=params), templates, args.number)
+        cloning = throughput(lambda prototype: prototype.clone(), prototypes, args.number)
+        print("{:<12} {:>10} {:>16,.0f} {:>16,.0f}".format(type_name, len(templates), loading, cloning))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Goes down a few levels, saves, loads the save and climbs back up, checking that every object of every level
+comes back where it was left, on games of many seeds. The levels left before the save are read back from the
+files of the level store. Exits with status 1 when an object is lost or moved.
+
+Run from the Core folder: python -m benchmarks.stairs_check --seeds 12
+"""
+import os
+import sys
+import random
+import logging
+import argparse
+import tempfile
+from managers import ObjectManager, SaveGame
+from managers.LevelStore import LevelStore
+from managers.LevelGenerator import LevelGenerator
+from managers.GenericControllerObjects import GameContext
+from models.EnumStatus import EGameState
+from benchmarks.save_benchmark import make_game, level_file, tiles_dir
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--seeds", type=int, default=12, help="games checked, seeded 1 to seeds")
+parser.add_argument("-d", "--depth", type=int, default=4, help="dungeon level the game is saved at")
+parser.add_argument("--hot_levels", type=int, default=3)
+
+
+def objects_of(game_context):
+    return sorted((obj.name, obj.coord.X, obj.coord.Y) for obj in SaveGame.level_objects(game_context)
+                  if obj.coord is not None)
+
+
+def change_level(level_store, game_context, depth, arrive_on):
+    level_store.leave(game_context.get_extra("dungeon_level"), game_context)
+    game_context.add_extra("dungeon_level", depth)
+    level_store.enter(depth, game_context, arrive_on=arrive_on)
+
+
+def check(seed, depth, hot_levels, folder):
+    """Returns what went missing, as (level, objects left there, objects found back)"""
+    random.seed(seed)
+    level_store = LevelStore(os.path.join(folder, "levels"), hot_levels=hot_levels)
+    game_context = make_game(1, seed)
+    left = {}
+    for level in range(1, depth):
+        left[level] = objects_of(game_context)
+        change_level(level_store, game_context, level + 1, 'upstairs')
+    left[depth] = objects_of(game_context)
+    path = os.path.join(folder, "savegame.sav")
+    SaveGame.save_game(path, game_context)
+
+    game_context = GameContext(next_level=None, game_state=ObjectManager.GameState(EGameState.LOADING),
+                               level_generator=LevelGenerator(None, level_file, tiles_dir))
+    level_store.release()
+    SaveGame.load_game(path, game_context)
+
+    lost = []
+    for level in range(depth, 0, -1):
+        if level < depth:
+            change_level(level_store, game_context, level, 'stairs')
+        found = objects_of(game_context)
+        if found != left[level]:
+            lost.append((level, left[level], found))
+    level_store.clear()
+    return lost
+
+
+def main():
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    failures = 0
+    for seed in range(1, args.seeds + 1):
+        with tempfile.TemporaryDirectory() as folder:
+            lost = check(seed, args.depth, args.hot_levels, folder)
+        for level, left, found in lost:
+            missing = sorted(set(left) - set(found))
+            print("seed {} level {}: {} objects left, {} found back, missing {}".format(
+                seed, level, len(left), len(found), missing))
+        failures += bool(lost)
+    print("{} of {} games came back up with every object".format(args.seeds - failures, args.seeds))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
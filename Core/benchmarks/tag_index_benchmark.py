@@ -0,0 +1,59 @@
+"""Per turn AI dispatch cost with 5000 pooled objects: the old find_by_tag full scan against the tag index.
+A turn looks up every monster, and every monster looks up its point of interest like BasicMonsterAI does.
+
+Run from the Core folder: python -m benchmarks.tag_index_benchmark
+"""
+import random
+import timeit
+import argparse
+from managers.ObjectPool import ObjectPool
+from models.GameObjects import GameObject
+from models.GenericObjects import Vector2
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-o", "--objects", type=int, default=5000, help="objects in the pool")
+parser.add_argument("-m", "--monsters", type=float, default=0.1, help="share of the objects that are monsters")
+parser.add_argument("-n", "--number", type=int, default=20, help="turns timed")
+parser.add_argument("--seed", type=int, default=1)
+
+
+def full_scan(object_pool, tag):
+    """The previous ObjectPool.find_by_tag"""
+    return [obj for obj in object_pool.get_objects_as_list() if tag in obj.tags]
+
+
+def dispatch_turn(object_pool, find_by_tag):
+    for monster in find_by_tag(object_pool, 'monster'):
+        for point_of_interest in find_by_tag(object_pool, 'player'):
+            Vector2.distance(monster.coord, point_of_interest.coord)
+
+
+def make_pool(objects, monster_share):
+    object_pool = ObjectPool()
+    object_pool.add_player(GameObject(coord=Vector2(100, 100), name='player', blocks=True, tags=['player', 'mortal']))
+    for _ in range(objects - 1):
+        coord = Vector2(random.randrange(200), random.randrange(200))
+        if random.random() < monster_share:
+            obj = GameObject(coord=coord, name='monster', blocks=True, tags=['monster', 'mortal'])
+        else:
+            obj = GameObject(coord=coord, name='item', tags=['item', 'small'])
+        object_pool.append(obj)
+    return object_pool
+
+
+def main():
+    args = parser.parse_args()
+    random.seed(args.seed)
+    object_pool = make_pool(args.objects, args.monsters)
+    monsters = len(object_pool.find_by_tag('monster'))
+
+    scan = timeit.timeit(lambda: dispatch_turn(object_pool, full_scan), number=args.number) / args.number
+    index = timeit.timeit(lambda: dispatch_turn(object_pool, ObjectPool.find_by_tag), number=args.number) / args.number
+
+    print("{} objects, {} monsters".format(args.objects, monsters))
+    print("full scan: {:.3f}ms per turn".format(scan * 1000))
+    print("tag index: {:.3f}ms per turn ({:.1f}x faster)".format(index * 1000, scan / index))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Allocation and operation cost of Vector2, against the previous mutable dict backed version kept here
+as reference. Dict lookups go through as_tuple() on the old one, as the game code used to.
+
+Run from the Core folder: python -m benchmarks.vector_benchmark
+"""
+import sys
+import timeit
+import argparse
+import tracemalloc
+from models.GenericObjects import Vector2
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-n", "--number", type=int, default=200000, help="operations timed per measure")
+parser.add_argument("-r", "--repeat", type=int, default=5, help="measures taken, the best one is kept")
+
+
+class MutableVector2(object):
+    """The previous Vector2, reduced to what the benchmark uses"""
+    def __init__(self, X=0.0, Y=0.0):
+        self.X = X
+        self.Y = Y
+
+    def __add__(self, other):
+        if isinstance(other, MutableVector2):
+            new_vec = MutableVector2()
+            new_vec.X = self.X + other.X
+            new_vec.Y = self.Y + other.Y
+            return new_vec
+        else:
+            raise TypeError("other must be of type Vector2")
+
+    def __eq__(self, other):
+        if isinstance(other, MutableVector2):
+            if self.X == other.X and self.Y == other.Y:
+                return True
+        else:
+            raise TypeError("other must be of type Vector2")
+        return False
+
+    def as_tuple(self):
+        return (self.X, self.Y)
+
+
+def allocation_bytes(cls, number):
+    tracemalloc.start()
+    vectors = [cls(i, i) for i in range(number)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size / len(vectors)
+
+
+def best(statement, number, repeat):
+    """Nanoseconds per call of the fastest measure, the call of the lambda itself included"""
+    return min(timeit.repeat(statement, number=number, repeat=repeat)) / number * 1e9
+
+
+def main():
+    args = parser.parse_args()
+    n, r = args.number, args.repeat
+
+    rows = []
+    for name, cls, key in (("mutable", MutableVector2, lambda v: v.as_tuple()), ("Vector2", Vector2, lambda v: v)):
+        a, b = cls(3, 4), cls(1, -1)
+        cells = {key(cls(x, y)): None for x in range(50) for y in range(50)}
+        rows.append((
+            name,
+            best(lambda: cls(3, 4), n, r),
+            best(lambda: a + b, n, r),
+            best(lambda: a == b, n, r),
+            best(lambda: key(a) in cells, n, r),
+            best(lambda: a.X + a.Y, n, r),
+            allocation_bytes(cls, 10000),
+        ))
+
+    print("{:<10} {:>8} {:>8} {:>8} {:>10} {:>8} {:>12}".format(
+        "version", "new ns", "add ns", "eq ns", "lookup ns", "X+Y ns", "bytes each"))
+    for row in rows:
+        print("{:<10} {:>8.0f} {:>8.0f} {:>8.0f} {:>10.0f} {:>8.0f} {:>12.0f}".format(*row))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,24 @@
 import os
+import time
+import random
+import tempfile
 import tdl
 from tcod import image_load
 import logging
 import argparse
 import textwrap
-import shelve
 from pathlib import Path
-from utils import Colors
-from managers import ObjectManager, ObjectPool, Messenger
+from concurrent.futures import ProcessPoolExecutor
+from utils import Colors, Profiler
+from managers import ObjectManager, ObjectPool, Messenger, InputPeripherals, SaveGame, Journal
+from managers.LevelGenerator import LevelGenerator
+from managers.LevelStore import LevelStore
+from managers.AutoSaver import AutoSaver
 from managers.GenericControllerObjects import GameContext
 from models.GameObjects import Character
 from models.GenericObjects import Vector2
-from models.EnumStatus import EGameState, EAction, MapTypes, EMessage
-from models.MapObjects import MapConstructor, MapObjectsConstructor
+from models.EnumStatus import EGameState, EAction, MapTypes
+from models.MapObjects import MapObjectsConstructor
 
 parser = argparse.ArgumentParser()
 parser.add_argument("-l", "--loglevel", type=int, default=0,
@@ -33,6 +39,30 @@ parser.add_argument("-P", "--player_file", type=str, default='player.yaml',
                     help="Selects a different player file to use")
 parser.add_argument("-r", "--minimum_number_of_rooms", type=int, default=7,
                     help="Selects a minimum number of rooms")
+parser.add_argument("--map_strategy", type=str, default=MapTypes.CONSTRUCTIVE1.name,
+                    choices=[MapTypes.CONSTRUCTIVE1.name, MapTypes.CONSTRUCTIVE2.name, MapTypes.CONSTRAINT.name,
+                             MapTypes.RANDOM.name],
+                    help="how the maps are generated")
+parser.add_argument("--headless", help="runs the game without a window, driven by scripted input, and reports "
+                                       "the time spent on each phase (use -l 3 to keep the log out of the timings)",
+                    action="store_true")
+parser.add_argument("--turns", type=int, default=1000,
+                    help="number of turns played by the headless run")
+parser.add_argument("--seed", type=int, default=None,
+                    help="seed of the map generation and of the headless input")
+parser.add_argument("--autosave", type=int, default=None,
+                    help="turns between autosaves, 0 turns them off. Defaults to 50, and to off on headless runs")
+parser.add_argument("--journal", type=int, default=None,
+                    help="turns between the checkpoints of the crash recovery journal, 0 turns it off. "
+                         "Defaults to 200, and to off on headless runs")
+parser.add_argument("--hot_levels", type=int, default=3,
+                    help="levels the player left that are kept in memory, the others are read back from disk")
+parser.add_argument("--sync_levels", help="generates every level when the player reaches it, instead of in a worker "
+                                          "process while the level before is played",
+                    action="store_true")
+parser.add_argument("--script", type=str, default=None,
+                    help="comma separated keys played in a loop by the headless run, ex.: UP,UP,LEFT,g. "
+                         "Without it the player wanders randomly")
 
 args = parser.parse_args()
 #########################################
@@ -68,6 +98,9 @@ assets_dir = os.path.join(os.path.dirname(__file__), "assets")
 
 LEVEL_DATA = os.path.join(gamedata_dir, args.level_file)
 PLAYER_DATA = os.path.join(gamedata_dir, args.player_file)
+SAVE_FILE = 'savegame.sav'
+AUTOSAVE_TURNS = args.autosave if args.autosave is not None else (0 if args.headless else 50)
+JOURNAL_TURNS = args.journal if args.journal is not None else (0 if args.headless else 200)
 
 # instantiating logger
 logging.basicConfig(
@@ -94,8 +127,38 @@ ch.setFormatter(formatter)
 logger.addHandler(fh)
 logger.addHandler(ch)
 
+# headless runs keep their levels apart, they must not touch the ones of the saved game
+LEVELS_FOLDER = os.path.join(tempfile.gettempdir(), 'rogue-eve-headless-{}.levels'.format(os.getpid())) \
+    if args.headless else SAVE_FILE + '.levels'
+
 root_view = None
 game_context = None
+# made by setup when the game starts, not on import
+journal = None
+level_store = None
+autosaver = None
+level_executor = None
+
+
+def setup():
+    """Makes the save machinery and the worker process of the level generation"""
+    global journal, level_store, autosaver, level_executor
+
+    journal = Journal.Journal(SAVE_FILE, checkpoint_every=JOURNAL_TURNS)
+    level_store = LevelStore(LEVELS_FOLDER, hot_levels=args.hot_levels)
+    # the levels of a new game replace the ones of the saved game only once an autosave of it is on disk
+    autosaver = AutoSaver(SAVE_FILE, every=AUTOSAVE_TURNS, on_saved=level_store.commit)
+    # one worker is enough, only the level below the one being played is ever generated ahead
+    level_executor = None if args.sync_levels else ProcessPoolExecutor(max_workers=1)
+
+
+def teardown():
+    """Stops the worker process, waiting for the level it may be generating"""
+    global level_executor
+
+    if level_executor is not None:
+        level_executor.shutdown()
+        level_executor = None
 
 
 def main_menu():
@@ -105,6 +168,10 @@ def main_menu():
     offset_x = (SCREEN_WIDTH - 80) // 2
     offset_y = (SCREEN_HEIGHT - 50) // 2
 
+    # the first level of a new game is generated while the menu waits for the player
+    level_generator = make_level_generator(random.getrandbits(32))
+    level_generator.prefetch(1)
+
     while not tdl.event.is_window_closed():
         img.blit_2x(root_view, offset_x, offset_y)
 
@@ -121,8 +188,10 @@ def main_menu():
         choice = menu('', ['Play a new game', 'Continue last game', 'Quit'], 24)
 
         if choice == 0:  # new game
-            new_game()
+            new_game(level_generator=level_generator)
             play_game()
+            level_generator = make_level_generator(random.getrandbits(32))
+            level_generator.prefetch(1)
         elif choice == 1:
             load()
             play_game()
@@ -177,28 +246,31 @@ def menu(header, options, width):
 
 
 def next_level():
-    global game_context
-
     # advance to the next level
     Messenger.send_message('You take a moment to rest, and recover your strength.', Colors.light_violet)
-    player = game_context.player
-    player.fighter.heal_percent(0.5)  # heal the player by 50%
+    game_context.player.fighter.heal_percent(0.5)  # heal the player by 50%
 
-    game_context.object_pool.clear_object_pool(keep_player=True)
+    change_level(game_context.get_extra("dungeon_level", default=1) - 1, 'upstairs',
+                 'After a rare moment of peace, you descend deeper into the heart of the dungeon...')
 
-    game_context.set_map(
-        make_map(max_rooms=game_context.get_extra("dungeon_level", default=1))
-    )
 
-    MapObjectsConstructor(
-        game_instance=game_context
-    ).load_object_templates(
-        LEVEL_DATA
-    ).populate_map()
+def previous_level():
+    change_level(game_context.get_extra("dungeon_level", default=1) + 1, 'stairs',
+                 'You climb back to a level you already walked through...')
 
-    player.coord = game_context.map.get_rooms()[0].center()
 
-    Messenger.send_message('After a rare moment of peace, you descend deeper into the heart of the dungeon...', Colors.red)
+def change_level(left_depth, arrive_on, message):
+    global game_context
+
+    player = game_context.player
+    # the level left goes to the level store, the new one comes back from it or from its seed
+    level_store.leave(left_depth, game_context)
+    depth = game_context.get_extra("dungeon_level", default=1)
+    level_store.enter(depth, game_context, arrive_on=arrive_on)
+    if not level_store.visited(depth + 1):
+        game_context.level_generator.prefetch(depth + 1)
+
+    Messenger.send_message(message, Colors.red)
 
     viewport = ObjectManager.ConsoleBuffer(
         root_view,
@@ -238,10 +310,14 @@ def next_level():
 
     game_context.set_camera(viewport)
     game_context.lower_gui_renderer = lower_gui_renderer
-    Messenger.broadcast_message("game-controller", {EMessage.MONSTERS_LEVEL_UP: None})
+
+    if autosaver.every:
+        autosaver.save(game_context)
+    if journal.checkpoint_every:
+        journal.checkpoint(game_context)
 
 
-def new_game():
+def new_game(input_source=None, level_generator=None):
     global game_context
 
     # Start to setup the object which will handle most of the generally accessed stuff
@@ -249,20 +325,26 @@ def new_game():
     # ObjectPool keeps track of all the objects on the scene
     # Starting up the collision handler, which manages all the objects collision events
     # Adding the object pool and the map to the collision handler so they interact
-    game_context = GameContext(next_level=next_level, game_state=ObjectManager.GameState(EGameState.LOADING), real_time=REALTIME, menu=menu)
+    game_context = GameContext(
+        next_level=next_level,
+        previous_level=previous_level,
+        game_state=ObjectManager.GameState(EGameState.LOADING),
+        real_time=REALTIME,
+        menu=input_source.menu if input_source else menu,
+        input_source=input_source,
+        level_generator=level_generator or make_level_generator(random.getrandbits(32))
+    )
 
     game_context.set_object_pool(ObjectPool.ObjectPool())
+    # the levels of the saved game stay until this one is saved over it
+    level_store.begin()
 
-    # A map constructor, that randomly create rooms with (not yet implemented) many different strategies
-    # Legacy mode makes the map be drawn using chars instead of colored blocks
-    game_context.set_map(
-        make_map(max_rooms=1)
-    )
-
-    # Before we start the map objects constructor we load the level data that is being hold on a file
-    # With all the information necessary to build the monsters from the template
-    # Map objects constructor is a special factory that randomly populates the map with object templates
-    # and does deal with weighted distributions, It makes everything in place, by reference
+    # The level generator builds the map with a map constructor, that randomly create rooms with (not yet
+    # implemented) many different strategies, and populates it with the map objects constructor, a special
+    # factory that places the object templates of the level data file following their weighted distributions.
+    # Both draw from the seed of the level, so the same level can be generated again when loading a game
+    game_context.level_generator.generate(1, game_context)
+    game_context.level_generator.prefetch(2)
 
     # Creation of the player
     player = Character.load(
@@ -282,7 +364,7 @@ def new_game():
         LEVEL_DATA
     ).give_item_for_player(
         "ICFBS01"
-    ).populate_map()
+    )
 
     viewport = ObjectManager.ConsoleBuffer(
         root_view,
@@ -326,115 +408,136 @@ def new_game():
     game_context.game_state.set_state(EGameState.PLAYING)
     game_context.set_camera(viewport)
     game_context.lower_gui_renderer = lower_gui_renderer
-    Messenger.broadcast_message("game-controller", {EMessage.MONSTERS_LEVEL_UP: None})
+    if journal.checkpoint_every:
+        journal.checkpoint(game_context)
+        # a load recovers the journal over the save from now on
+        level_store.commit()
     return game_context
 
 
-def make_map(max_rooms, starting_room="room-02.yaml"):
-
-    max_rooms = max(MIN_NUMBER_OF_ROOMS, int(max_rooms * 1.25))
-
-    return MapConstructor(
-        MAP_SIZE[0],
-        MAP_SIZE[1],
-        max_number_of_rooms=max_rooms
-    ).add_starting_tile_template(
-        os.path.join(tiles_dir, starting_room)
-    ).add_tile_template_folder(
-        tiles_dir
-    ).make_random_map(
-        strategy=MapTypes.CONSTRUCTIVE1,
+def make_level_generator(game_seed=None):
+    # Legacy mode makes the map be drawn using chars instead of colored blocks
+    return LevelGenerator(
+        game_seed,
+        LEVEL_DATA,
+        tiles_dir,
+        map_size=MAP_SIZE,
+        min_rooms=MIN_NUMBER_OF_ROOMS,
+        strategy=MapTypes[args.map_strategy],
         maximum_number_of_tries=150,
-        legacy_mode=LEGACY_MODE
+        legacy_mode=LEGACY_MODE,
+        executor=level_executor
     )
 
 
+def render():
+    game_context.camera.render_all_objects()
+    game_context.lower_gui_renderer.render_gui()
+
+
+def take_turn():
+    """Reads the input of the player and lets the monsters act, returns False when the player wants to leave"""
+    game_context.camera.clear_all_objects()
+
+    game_context.handle_keys()
+
+    game_context.camera.set_fov_recompute(game_context.fov_recompute)
+
+    if game_context.player_action == EAction.EXIT:
+        return False
+
+    game_context.run_ai_turn()
+
+    if game_context.player_action != EAction.DIDNT_TAKE_TURN:
+        if game_context.game_state.get_state() == EGameState.PLAYING:
+            autosaver.turn_done(game_context)
+        if journal.checkpoint_every:
+            journal.record_turn(game_context)
+    return True
+
+
 def play_game():
     while not tdl.event.is_window_closed():
 
-        game_context.camera.render_all_objects()
-        game_context.lower_gui_renderer.render_gui()
+        render()
 
         tdl.flush()
 
-        game_context.camera.clear_all_objects()
+        if not take_turn():
+            # the last autosave must not land over the save made on exit
+            autosaver.wait()
+            save()
+            # the save has everything the journal had
+            journal.discard()
+            break
 
-        game_context.handle_keys()
 
-        game_context.camera.set_fov_recompute(game_context.fov_recompute)
+def run_headless(turns, seed=None, script=None):
+    """Plays the game without a window, used as the regression benchmark of the performance changes"""
+    global root_view
 
-        if game_context.player_action == EAction.EXIT:
-            save()
-            break
+    random.seed(seed)
+    if script:
+        input_source = InputPeripherals.ScriptedInput(script.split(','))
+    else:
+        input_source = InputPeripherals.RandomInput(seed)
 
-        game_context.run_ai_turn()
+    root_view = ObjectManager.NullConsole(SCREEN_WIDTH, SCREEN_HEIGHT)
+    timer = Profiler.start()
+
+    start = time.perf_counter()
+    new_game(input_source=input_source)
+    setup_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    played = 0
+    while played < turns and game_context.game_state.get_state() == EGameState.PLAYING:
+        render()
+        if not take_turn():
+            break
+        played += 1
+    play_time = time.perf_counter() - start
+    autosaver.wait()
+
+    Profiler.stop()
+    print("new game set up in {:.1f}ms".format(setup_time * 1000))
+    print("{} turns in {:.2f}s, {:.1f} turns/s, dungeon level {}, player {}".format(
+        played, play_time, played / play_time if play_time else float('nan'),
+        game_context.get_extra("dungeon_level"),
+        "dead" if game_context.game_state.get_state() == EGameState.DEAD else "alive"))
+    print(timer.report(turns=played))
+    if autosaver.every:
+        print(autosaver.report())
+    if journal.checkpoint_every:
+        print(journal.report())
+        journal.discard()
+    print(level_store.report())
+    print(game_context.level_generator.report())
+    level_store.clear()
 
 
 def save():
-    with shelve.open('savegame', 'n') as savefile:
-        savefile['game_context'] = game_context
-        savefile['player-id'] = game_context.player.get_id()
-        savefile['object_pool'] = game_context.object_pool.get_objects_as_dict()
-        savefile['map'] = game_context.map
-        savefile['game_msgs'] = game_context.lower_gui_renderer.game_msg
-        savefile['game_state'] = game_context.game_state
-        savefile['ais'] = {k: monster.ai
-                                for k, monster in game_context.object_pool.get_objects_as_dict().items()
-                                if type(monster) == Character
-                            }
-        savefile['fighters'] = {k: monster.fighter
-                                for k, monster in game_context.object_pool.get_objects_as_dict().items()
-                                if type(monster) == Character
-                            }
-        savefile['dungeon_level'] = game_context.get_extra("dungeon_level")
-        savefile['extras'] = game_context.extras
-        savefile.close()
+    SaveGame.save_game(SAVE_FILE, game_context)
+    level_store.commit()
 
 
 def load():
     global game_context
 
-    with shelve.open('savegame', 'r') as savefile:
-        map = savefile['map']
-        objects = savefile['object_pool']
-        player_id = savefile['player-id']
-        game_msgs = savefile['game_msgs']
-        game_state = savefile['game_state']
-        ais = savefile['ais']
-        fighters = savefile['fighters']
-        extras = savefile['extras']
-
     game_context = GameContext(
         next_level=next_level,
-        game_state=ObjectManager.GameState(game_state),
+        previous_level=previous_level,
+        game_state=ObjectManager.GameState(EGameState.LOADING),
         real_time=REALTIME,
-        menu=menu
+        menu=menu,
+        level_generator=make_level_generator()
     )
-
-    game_context.extras = extras
-    game_context.set_object_pool(ObjectPool.ObjectPool())
-    game_context.set_map(map)
-
-    for k, v in objects.items():
-        v.collision_handler = game_context.collision_handler
-        if k in fighters.keys():
-            v.fighter = fighters[k]
-            if v.fighter:
-                v.fighter.owner = v
-        if k in ais.keys():
-            v.ai = ais[k]
-            if v.ai:
-                v.ai.owner = v
-                v.ai.visible_tiles_ref = map.visible_tiles
-        if k == player_id:
-            v.game_state = game_context.game_state
-            game_context.set_player(v, inventory_width=INVENTORY_WIDTH)
-        else:
-            game_context.object_pool.append(v)
-
-    inventory = game_context.player.get_inventory()
-    for i in inventory:
-        i.context = game_context
+    level_store.release()
+    if journal.newer_than(SAVE_FILE):
+        # the game was not left through the menu, what was played after the save is on the journal
+        game_msgs = Journal.recover(SAVE_FILE, game_context, inventory_width=INVENTORY_WIDTH)
+    else:
+        game_msgs = SaveGame.load_game(SAVE_FILE, game_context, inventory_width=INVENTORY_WIDTH)
 
     viewport = ObjectManager.ConsoleBuffer(
         root_view,
@@ -473,18 +576,30 @@ def load():
 
     game_context.set_camera(viewport)
     game_context.lower_gui_renderer = lower_gui_renderer
-    Messenger.broadcast_message("game-controller", {EMessage.MONSTERS_LEVEL_UP: None})
+    depth = game_context.get_extra("dungeon_level", default=1)
+    if not level_store.visited(depth + 1):
+        game_context.level_generator.prefetch(depth + 1)
+    if journal.checkpoint_every:
+        journal.checkpoint(game_context)
 
 
 def main():
     global root_view
 
-    # setup to start the TDL and small consoles
-    font = os.path.join(assets_dir, "arial10x10.png")
-    tdl.set_font(font, greyscale=True, altLayout=True)
-    tdl.setFPS(LIMIT_FPS)
-    root_view = tdl.init(width=SCREEN_WIDTH, height=SCREEN_HEIGHT, title="Roguelike", fullscreen=False)
-    main_menu()
+    setup()
+    try:
+        if args.headless:
+            run_headless(args.turns, seed=args.seed, script=args.script)
+            return
+
+        # setup to start the TDL and small consoles
+        font = os.path.join(assets_dir, "arial10x10.png")
+        tdl.set_font(font, greyscale=True, altLayout=True)
+        tdl.setFPS(LIMIT_FPS)
+        root_view = tdl.init(width=SCREEN_WIDTH, height=SCREEN_HEIGHT, title="Roguelike", fullscreen=False)
+        main_menu()
+    finally:
+        teardown()
 
 
 if __name__ == '__main__':
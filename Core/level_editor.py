@@ -166,8 +166,7 @@ def player_move_or_attack(dx, dy):
 
     #move by the given amount, if the destination is not blocked
     if not is_blocked(player.coord.X + dx, player.coord.Y + dy):
-        player.coord.X += dx
-        player.coord.Y += dy
+        player.coord = player.coord + Vector2(dx, dy)
 
 
 def handle_keys():
@@ -0,0 +1,122 @@
+"""Saves the game every few turns without holding the game loop while the file is written.
+Where os.fork exists the child process gets a copy on write snapshot of the whole game, encodes it and writes
+it, so the loop only pays for the fork. Elsewhere the game is encoded in memory and a thread writes the bytes.
+Either way the file is replaced atomically and only one autosave is in flight at a time"""
+
+import os
+import time
+import logging
+import threading
+from managers import SaveGame
+from utils import Profiler
+
+logger = logging.getLogger('Rogue-EVE')
+
+
+class AutoSaver(object):
+    def __init__(self, path, every=50, use_fork=None, on_saved=None):
+        self.path = path
+        self.every = every
+        self.use_fork = hasattr(os, 'fork') if use_fork is None else use_fork
+        self.turns = 0
+        self.child = None
+        self.writer = None
+        # seconds the game loop was held by each autosave
+        self.stalls = []
+        self.skipped = 0
+        self.failed = 0
+        # called on the game loop once an autosave is known to be on disk
+        self.on_saved = on_saved
+        self.written = False
+
+    def turn_done(self, game_context):
+        """Counts a turn played, saves when it is time to"""
+        if not self.every:
+            return
+        self.turns += 1
+        if self.turns % self.every == 0:
+            self.save(game_context)
+        else:
+            # notices the autosave in flight landing, on_saved runs the turn after
+            self.busy()
+
+    def busy(self):
+        if self.child is not None:
+            pid, status = os.waitpid(self.child, os.WNOHANG)
+            if pid == 0:
+                return True
+            self.child = None
+            self._finished(status)
+        if self.writer is not None:
+            if self.writer.is_alive():
+                return True
+            self.writer = None
+            self._finished(0 if self.written else 1)
+        return False
+
+    def _finished(self, status):
+        if status:
+            self.failed += 1
+            logger.error("Autosave of {} failed with status {}".format(self.path, status))
+        elif self.on_saved is not None:
+            self.on_saved()
+
+    @Profiler.timed('autosave')
+    def save(self, game_context):
+        if self.busy():
+            # the previous one is still being written, the next turn count will try again
+            self.skipped += 1
+            return False
+
+        start = time.perf_counter()
+        if self.use_fork:
+            self.child = self._fork_save(game_context)
+        else:
+            data = SaveGame.encode(game_context)
+            self.written = False
+            self.writer = threading.Thread(target=self._write, args=(data,), daemon=True)
+            self.writer.start()
+        stall = time.perf_counter() - start
+
+        self.stalls.append(stall)
+        logger.info("Autosave started, the game waited {:.2f}ms".format(stall * 1000))
+        return True
+
+    def _fork_save(self, game_context):
+        pid = os.fork()
+        if pid:
+            return pid
+        # child: write the snapshot and leave without running the exit handlers of the game
+        status = 0
+        try:
+            SaveGame.write_atomically(self.path, SaveGame.encode(game_context))
+        except Exception:
+            status = 1
+        finally:
+            os._exit(status)
+
+    def _write(self, data):
+        try:
+            SaveGame.write_atomically(self.path, data)
+            self.written = True
+        except Exception as e:
+            logger.error("Autosave could not write {}: {}".format(self.path, e))
+
+    def wait(self):
+        """Blocks until the autosave in flight, if any, is on disk"""
+        if self.child is not None:
+            _, status = os.waitpid(self.child, 0)
+            self.child = None
+            self._finished(status)
+        if self.writer is not None:
+            self.writer.join()
+            self.writer = None
+            self._finished(0 if self.written else 1)
+
+    def report(self):
+        if not self.stalls:
+            return "autosave: no saves"
+        stalls_ms = [stall * 1000 for stall in self.stalls]
+        return "autosave ({}): {} saves, {} skipped, {} failed, stall mean {:.2f}ms max {:.2f}ms".format(
+            "fork" if self.use_fork else "thread", len(stalls_ms), self.skipped, self.failed,
+            sum(stalls_ms) / len(stalls_ms), max(stalls_ms))
@@ -3,15 +3,37 @@ import logging
 from models.EnumStatus import EGameState, EAction, EMessage
 from models.GameObjects import Item, Equipment
 from models.GenericObjects import Vector2
+from models import GenericObjects
 from managers import InputPeripherals, ObjectManager, Messenger
-from utils import Colors
+from utils import Colors, Profiler
 
 logger = logging.getLogger('Rogue-EVE')
 
+# arrows, numpad and the home/end block, each with its interned step
+MOVE_KEYS = {
+    "UP": (GenericObjects.UP, EAction.MOVE_UP),
+    "KP8": (GenericObjects.UP, EAction.MOVE_UP),
+    "DOWN": (GenericObjects.DOWN, EAction.MOVE_DOWN),
+    "KP2": (GenericObjects.DOWN, EAction.MOVE_DOWN),
+    "LEFT": (GenericObjects.LEFT, EAction.MOVE_LEFT),
+    "KP4": (GenericObjects.LEFT, EAction.MOVE_LEFT),
+    "RIGHT": (GenericObjects.RIGHT, EAction.MOVE_RIGHT),
+    "KP6": (GenericObjects.RIGHT, EAction.MOVE_RIGHT),
+    "HOME": (GenericObjects.UP_LEFT, EAction.MOVE_DIAGONAL_UL),
+    "KP7": (GenericObjects.UP_LEFT, EAction.MOVE_DIAGONAL_UL),
+    "PAGEUP": (GenericObjects.UP_RIGHT, EAction.MOVE_DIAGONAL_UR),
+    "KP9": (GenericObjects.UP_RIGHT, EAction.MOVE_DIAGONAL_UR),
+    "END": (GenericObjects.DOWN_LEFT, EAction.MOVE_DIAGONAL_DL),
+    "KP1": (GenericObjects.DOWN_LEFT, EAction.MOVE_DIAGONAL_DL),
+    "PAGEDOWN": (GenericObjects.DOWN_RIGHT, EAction.MOVE_DIAGONAL_DR),
+    "KP3": (GenericObjects.DOWN_RIGHT, EAction.MOVE_DIAGONAL_DR),
+}
+
 
 class GameContext(object):
     def __init__(self, next_level, object_pool = None, mouse_controller = None, map = None, game_state=None,
-                 real_time=False, menu=None, camera=None, lower_gui_renderer=None):
+                 real_time=False, menu=None, camera=None, lower_gui_renderer=None, input_source=None, level_generator=None,
+                 previous_level=None):
         self.object_pool = object_pool
         self.mouse_controller = mouse_controller
         self.map = map
@@ -25,6 +47,11 @@ class GameContext(object):
         self.camera = camera
         self.lower_gui_renderer = lower_gui_renderer
         self.next_level = next_level
+        self.previous_level = previous_level
+        self.input_source = input_source
+        self.level_generator = level_generator
+        # the Level being played, as made by the level generator
+        self.level = None
         self.extras = {}
         self.setup_broadcast_message()
         if self.collision_handler and self.object_pool:
@@ -115,13 +142,17 @@ class GameContext(object):
     def message_box(self, message, width=40):
         self.menu(message, [], width)
 
+    @Profiler.timed('player')
     def handle_keys(self):
         self.player_action = EAction.DIDNT_TAKE_TURN
         self.fov_recompute = False
         user_input = None
         keypress = False
 
-        for event in tdl.event.get():
+        # headless runs are driven by a scripted input source instead of the window events
+        events = self.input_source.get() if self.input_source else tdl.event.get()
+
+        for event in events:
             if event.type == 'KEYDOWN':
                 user_input = event
                 keypress = True
@@ -147,51 +178,38 @@ class GameContext(object):
         if self.game_state.state == EGameState.PLAYING:
             self.fov_recompute = False
             # movement keys
-            if user_input.key == "UP" or user_input.key == "KP8":
-                self.fov_recompute = self.player.move_or_attack(Vector2(0, -1))
-                self.player_action = EAction.MOVE_UP
-            elif user_input.key == "DOWN" or user_input.key == "KP2":
-                self.fov_recompute = self.player.move_or_attack(Vector2(0, 1))
-                self.player_action = EAction.MOVE_DOWN
-            elif user_input.key == "LEFT" or user_input.key == "KP4":
-                self.fov_recompute = self.player.move_or_attack(Vector2(-1, 0))
-                self.player_action = EAction.MOVE_LEFT
-            elif user_input.key == "RIGHT" or user_input.key == "KP6":
-                self.fov_recompute = self.player.move_or_attack(Vector2(1, 0))
-                self.player_action = EAction.MOVE_RIGHT
-            elif user_input.key == "HOME" or user_input.key == "KP7":
-                self.fov_recompute = self.player.move_or_attack(Vector2(-1, -1))
-                self.player_action = EAction.MOVE_DIAGONAL_UL
-            elif user_input.key == "PAGEUP" or user_input.key == "KP9":
-                self.fov_recompute = self.player.move_or_attack(Vector2(1, -1))
-                self.player_action = EAction.MOVE_DIAGONAL_UR
-            elif user_input.key == "END" or user_input.key == "KP1":
-                self.fov_recompute = self.player.move_or_attack(Vector2(-1, 1))
-                self.player_action = EAction.MOVE_DIAGONAL_DL
-            elif user_input.key == "PAGEDOWN" or user_input.key == "KP3":
-                self.fov_recompute = self.player.move_or_attack(Vector2(1, 1))
-                self.player_action = EAction.MOVE_DIAGONAL_DR
+            move = MOVE_KEYS.get(user_input.key)
+            if move:
+                step, action = move
+                self.fov_recompute = self.player.move_or_attack(step)
+                self.player_action = action
             elif user_input.key == "KP5":
                 self.player_action = EAction.WAITING
                 # do nothing ie wait for the monster to come to you
 
             elif user_input.text == 'g':
                 # pick up an item
-                for obj in [item for item in self.object_pool.get_objects_as_list()
-                            if (type(item) == Item or type(item) == Equipment)
-                               and item.coord == self.player.coord]:
+                for obj in [item for item in self.object_pool.find_by_coord(self.player.coord.X, self.player.coord.Y)
+                            if type(item) == Item or type(item) == Equipment]:
                     obj.pick_up(self.player)
                     self.object_pool.delete_by_id(obj._id)
                     break
 
             elif user_input.text == '<' or user_input.text == '/' :
-                # pick up an item
+                # take the stairs the player is standing on, down or up
                 for obj in [stair for stair in self.object_pool.find_by_tag("stairs")
                             if stair.coord == self.player.coord]:
                     self.extras["dungeon_level"] += 1
                     self.next_level()
                     self.fov_recompute = True
                     break
+                else:
+                    for obj in [stair for stair in self.object_pool.find_by_tag("upstairs")
+                                if stair.coord == self.player.coord and self.previous_level]:
+                        self.extras["dungeon_level"] -= 1
+                        self.previous_level()
+                        self.fov_recompute = True
+                        break
 
             elif user_input.text == 'i':
                 # show the inventory
@@ -230,6 +248,7 @@ class GameContext(object):
         else:
             logger.error("menu function is not being referenced inside the game context")
 
+    @Profiler.timed('ai')
     def run_ai_turn(self):
         monster_action = True
 
@@ -241,9 +260,17 @@ class GameContext(object):
                 monster_action = False
 
         if self.game_state.get_state() == EGameState.PLAYING and monster_action:
-            for obj in self.object_pool.find_by_tag('monster'):
+            # one distance map toward the player serves every monster this turn
+            self.map.get_flow_field().update(self.player.coord)
+
+            # only the awake actors whose turn comes before the next one of the player
+            for obj in self.object_pool.scheduler.actors_until_player():
+                if self.game_state.get_state() != EGameState.PLAYING:
+                    break
                 if obj.ai:
                     obj.ai.take_turn()
+                    # an ai that runs out, like a confusion, swaps itself back without the pool noticing
+                    self.object_pool.touch(obj)
 
     def closest_object(self, max_range, tag_of_interest):
         # find closest enemy, up to a maximum range, and in the player's FOV
@@ -262,6 +289,9 @@ class GameContext(object):
     def target_tile(self, max_range=None):
         # return the position of a tile left-clicked in player's FOV (optionally in
         # a range), or (None,None) if right-clicked.
+        if self.input_source:
+            # scripted input has no mouse to aim with, so targeting is cancelled
+            return (None, None)
 
         while True:
             tdl.flush()
@@ -291,16 +321,10 @@ class GameContext(object):
             if x is None:  # player cancelled
                 return None
 
-            mouse_coord = Vector2(x,y)
             # return the first clicked monster, otherwise continue looping
-            if target_tag:
-                for obj in self.object_pool.find_by_tag(target_tag):
-                    if obj.coord == mouse_coord and obj != self.player:
-                        return obj
-            else:
-                for obj in self.object_pool.get_objects_as_list():
-                    if obj.coord == mouse_coord and obj != self.player:
-                        return obj
+            for obj in self.object_pool.find_by_coord(x, y):
+                if obj != self.player and (not target_tag or target_tag in obj.tags):
+                    return obj
 
     def targeting(self, **kwargs):
         target_mode, target_tag, range, visible_only, radius = None, None, None, True, 0
@@ -1,3 +1,4 @@
+import random
 import logging
 from models.GenericObjects import Vector2
 
@@ -31,14 +32,75 @@ class MouseController(object):
         # return a string with the names of all objects under the mouse
         (x, y) = self.camera.camera_coord + Vector2(*self.mouse_coord)
         # create a list with the names of all objects at the mouse's coordinates and in FOV
-        objects = self.object_pool.get_objects_as_list()
         names = ""
         if self.map and self.object_pool:
-            if objects and self.map:
-                names = [obj.name for obj in objects
-                         if obj.coord.X == x and obj.coord.Y == y  and (x,y) in self.map.get_visible_tiles()]
+            if self.map.in_fov(x, y):
+                names = [obj.name for obj in self.object_pool.find_by_coord(x, y)]
                 names = ', '.join(names)  # join the names, separated by commas
         else:
             logger.warning("map or object pool not initialized!")
 
         return names.capitalize()
+
+
+class KeyEvent(object):
+    """The few fields of a tdl key event the game looks at, for input that does not come from the window"""
+    def __init__(self, key, text=''):
+        self.type = 'KEYDOWN'
+        self.key = key
+        self.text = text
+        self.char = text
+        self.alt = False
+        self.control = False
+        self.shift = False
+
+    @staticmethod
+    def from_name(name):
+        """Key names follow tdl (UP, KP5, PAGEDOWN...), a single character is a text key"""
+        if len(name) == 1:
+            return KeyEvent('CHAR', text=name)
+        return KeyEvent(name)
+
+
+class ScriptedInput(object):
+    """Plays a fixed sequence of keys, one per turn, looping over it when it reaches the end"""
+    def __init__(self, keys, loop=True):
+        self.keys = [KeyEvent.from_name(key) for key in keys]
+        self.loop = loop
+        self.index = 0
+
+    def get(self):
+        if self.index >= len(self.keys):
+            if not self.loop or not self.keys:
+                return []
+            self.index = 0
+        event = self.keys[self.index]
+        self.index += 1
+        return [event]
+
+    def menu(self, header, options, width):
+        # always takes the first option, message boxes have none
+        return 0 if options else None
+
+
+class RandomInput(object):
+    """Wanders around the map pressing movement keys, keeping the same direction for a while so the player
+    actually leaves the starting room. Now and then tries to pick up items or take the stairs"""
+    MOVES = ['UP', 'DOWN', 'LEFT', 'RIGHT', 'HOME', 'PAGEUP', 'END', 'PAGEDOWN', 'KP5']
+    ACTIONS = ['g', '<']
+
+    def __init__(self, seed=None, momentum=0.8, action_chance=0.05):
+        self.random = random.Random(seed)
+        self.momentum = momentum
+        self.action_chance = action_chance
+        self.last_move = self.random.choice(self.MOVES)
+
+    def get(self):
+        if self.random.random() < self.action_chance:
+            return [KeyEvent.from_name(self.random.choice(self.ACTIONS))]
+        if self.random.random() > self.momentum:
+            self.last_move = self.random.choice(self.MOVES)
+        return [KeyEvent.from_name(self.last_move)]
+
+    def menu(self, header, options, width):
+        return self.random.randrange(len(options)) if options else None
@@ -0,0 +1,238 @@
+"""Append-only journal of the turns played since the last checkpoint, so a crash loses at most the turn
+being played. A checkpoint is a whole save file, written atomically; the journal next to it starts with the
+checksum of that checkpoint and then has one json line per turn with what changed in it:
+
+    changed    id -> fields of the object record that differ from the previous turn
+    spawned    full records of the objects that joined the pool
+    removed    ids of the objects that left it, killed and removed, picked up or used
+    inventory  records of everything the player carries, whenever any of it changed
+    explored   flat indexes of the cells explored this turn
+    extras, game_state, id_counter    when they changed
+
+Only the player and the objects the pool saw change (see ObjectPool.touch) are compared, so a turn costs
+a few hundred bytes. Every checkpoint_every turns the journal is compacted into a new checkpoint.
+Lines are flushed to the system at the end of every turn but not synced, the game process dying does not
+lose them, only the machine going down may. The message log is not journaled, a recovered game shows the
+messages of the checkpoint"""
+
+import os
+import json
+import zlib
+import logging
+import numpy as np
+from managers import SaveGame
+from models.EnumStatus import EGameState
+
+logger = logging.getLogger('Rogue-EVE')
+
+
+class Journal(object):
+    def __init__(self, base_path, checkpoint_every=200):
+        self.journal_path = base_path + '.journal'
+        self.checkpoint_path = base_path + '.checkpoint'
+        self.checkpoint_every = checkpoint_every
+        self.stream = None
+        self.turns = 0
+        # what the last line left on the disk, the next one is the difference to it
+        self.records = {}
+        self.inventory = []
+        self.explored = None
+        self.extras = None
+        self.game_state = None
+        self.id_counter = 0
+        # bytes of every turn written and of every checkpoint, for the report
+        self.turn_sizes = []
+        self.checkpoint_sizes = []
+
+    @staticmethod
+    def _pool_objects(game_context):
+        # the items the player carries are saved with its inventory, whether they are on the pool or not
+        carried = set(id(item) for item in game_context.player.get_inventory() or ())
+        return {key: obj for key, obj in game_context.object_pool.get_objects_as_dict().items()
+                if id(obj) not in carried}
+
+    def _inventory_records(self, game_context):
+        player = game_context.player
+        return [SaveGame.object_record(item, owner=player.get_id()) for item in player.get_inventory() or ()]
+
+    def checkpoint(self, game_context):
+        """Compacts everything journaled so far into a new checkpoint and starts an empty journal on it"""
+        data = SaveGame.encode(game_context, whole_level=True)
+        SaveGame.write_atomically(self.checkpoint_path, data)
+        # a crash before the journal is replaced leaves the old one, which has the checksum of the old checkpoint
+        if self.stream is not None:
+            self.stream.close()
+        self.stream = open(self.journal_path, 'w')
+        self.stream.write(json.dumps({'checkpoint': zlib.crc32(data)}) + '\n')
+        self.stream.flush()
+
+        self.records = {key: SaveGame.object_record(obj) for key, obj in self._pool_objects(game_context).items()}
+        self.inventory = self._inventory_records(game_context)
+        self.explored = game_context.map.explored.copy()
+        self.extras = json.dumps(game_context.extras, sort_keys=True)
+        self.game_state = game_context.game_state.get_state().name
+        self.id_counter = game_context.object_pool.id_counter
+        game_context.object_pool.touched.clear()
+        self.turns = 0
+        self.checkpoint_sizes.append(len(data))
+        logger.info("Journal checkpoint on {} ({} bytes)".format(self.checkpoint_path, len(data)))
+
+    def record_turn(self, game_context):
+        """Appends the changes of the turn that was just played"""
+        if self.stream is None:
+            self.checkpoint(game_context)
+            return
+
+        object_pool = game_context.object_pool
+        objects = self._pool_objects(game_context)
+        entry = {}
+
+        removed = [key for key in self.records if key not in objects]
+        for key in removed:
+            del self.records[key]
+        if removed:
+            entry['removed'] = removed
+
+        touched = object_pool.touched
+        touched.add(game_context.player.get_id())
+        changed, spawned = {}, []
+        for key, obj in objects.items():
+            previous = self.records.get(key)
+            if previous is not None and key not in touched:
+                continue
+            record = SaveGame.object_record(obj)
+            if previous is None:
+                spawned.append(record)
+            else:
+                changes = {name: value for name, value in record.items() if previous[name] != value}
+                if not changes:
+                    continue
+                changed[key] = changes
+            self.records[key] = record
+        touched.clear()
+        if changed:
+            entry['changed'] = changed
+        if spawned:
+            entry['spawned'] = spawned
+
+        inventory = self._inventory_records(game_context)
+        if inventory != self.inventory:
+            entry['inventory'] = self.inventory = inventory
+
+        explored = game_context.map.explored
+        gained = np.flatnonzero(explored & ~self.explored)
+        if gained.size:
+            entry['explored'] = gained.tolist()
+            self.explored[:] = explored
+
+        extras = json.dumps(game_context.extras, sort_keys=True)
+        if extras != self.extras:
+            entry['extras'] = game_context.extras
+            self.extras = extras
+        game_state = game_context.game_state.get_state().name
+        if game_state != self.game_state:
+            entry['game_state'] = self.game_state = game_state
+        if object_pool.id_counter != self.id_counter:
+            entry['id_counter'] = self.id_counter = object_pool.id_counter
+
+        size = 0
+        if entry:
+            line = json.dumps(entry, separators=(',', ':')) + '\n'
+            self.stream.write(line)
+            self.stream.flush()
+            size = len(line)
+        self.turn_sizes.append(size)
+
+        self.turns += 1
+        if self.checkpoint_every and self.turns >= self.checkpoint_every:
+            self.checkpoint(game_context)
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+    def discard(self):
+        """Called once the game is saved for good, the journal has nothing left to recover"""
+        self.close()
+        for path in (self.journal_path, self.checkpoint_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def newer_than(self, path):
+        """Tells if there is a journal to recover that was written after the file on the path"""
+        if not os.path.exists(self.checkpoint_path):
+            return False
+        if not os.path.exists(path):
+            return True
+        last_write = max(os.path.getmtime(self.checkpoint_path), os.path.getmtime(self.journal_path)
+                         if os.path.exists(self.journal_path) else 0)
+        return last_write > os.path.getmtime(path)
+
+    def report(self):
+        if not self.turn_sizes:
+            return "journal: no turns"
+        return "journal: {} turns, {:.0f} bytes/turn mean, {} max, {} checkpoints of {:.0f} bytes mean".format(
+            len(self.turn_sizes), sum(self.turn_sizes) / len(self.turn_sizes), max(self.turn_sizes),
+            len(self.checkpoint_sizes), sum(self.checkpoint_sizes) / max(1, len(self.checkpoint_sizes)))
+
+
+def replay(entry, game_context):
+    """Applies one line of the journal on the game"""
+    object_pool = game_context.object_pool
+    objects = object_pool.get_objects_as_dict()
+
+    for key in entry.get('removed', ()):
+        if key in objects:
+            del object_pool[key]
+    for record in entry.get('spawned', ()):
+        object_pool.append(SaveGame.make_object(record, game_context))
+    # json turned the ids into strings
+    for key, changes in entry.get('changed', {}).items():
+        SaveGame.apply_changes(objects[int(key)], changes, game_context)
+    if 'inventory' in entry:
+        SaveGame.give_inventory(game_context.player, entry['inventory'], game_context)
+
+    if 'explored' in entry:
+        game_context.map.explored.flat[entry['explored']] = True
+    if 'extras' in entry:
+        game_context.extras = entry['extras']
+    if 'game_state' in entry:
+        game_context.game_state.set_state(EGameState[entry['game_state']])
+    if 'id_counter' in entry:
+        object_pool.id_counter = max(object_pool.id_counter, entry['id_counter'])
+
+
+def recover(base_path, game_context, inventory_width=8):
+    """Restores the last checkpoint on a new game context and replays the journal written after it.
+    Returns the messages of the log, as SaveGame.load_game"""
+    journal = Journal(base_path)
+    with open(journal.checkpoint_path, 'rb') as stream:
+        data = stream.read()
+    messages = SaveGame.restore(*SaveGame.decode(data), game_context, inventory_width=inventory_width)
+
+    replayed = 0
+    if os.path.exists(journal.journal_path):
+        with open(journal.journal_path) as stream:
+            lines = stream.read().split('\n')
+        try:
+            header = json.loads(lines[0])
+        except ValueError:
+            header = {}
+        if header.get('checkpoint') != zlib.crc32(data):
+            # the game stopped between writing a checkpoint and starting its journal, the checkpoint has it all
+            lines = [lines[0]]
+        for line in lines[1:]:
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # the turn being written when the game stopped
+                logger.warning("Journal {} ends with a broken line, it was ignored".format(journal.journal_path))
+                break
+            replay(entry, game_context)
+            replayed += 1
+
+    logger.info("Game recovered from {} and {} journaled turns".format(journal.checkpoint_path, replayed))
+    return messages
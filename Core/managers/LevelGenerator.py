@@ -0,0 +1,225 @@
+"""Every level is generated from its own seed, derived from the seed of the game and the depth.
+The same seed always gives the same map and the same population, so a save only needs the seed and
+what changed since the level was generated, see SaveGame.
+Given an executor, the next level can be generated beforehand in a worker process, which hands it back as a
+level file with the whole map; taking the stairs then only reads that file"""
+
+import os
+import random
+import logging
+from models.EnumStatus import MapTypes
+from models.GameObjects import GameObject
+from models.MapObjects import MapConstructor, MapObjectsConstructor
+from utils import Colors
+from managers.SaveGame import layout_crc, object_record, encode_level, decode, restore_level
+
+logger = logging.getLogger('Rogue-EVE')
+
+# spawn key of the stairs up, placed after the population so it never changes what the level spawns
+UP_STAIRS_SPAWN_KEY = -1
+
+
+class Level(object):
+    """The seed a level was generated from and the state of the objects it was populated with"""
+
+    def __init__(self, depth, seed, layout_crc, baseline):
+        self.depth = depth
+        self.seed = seed
+        # checksum of the blocked layer, tells if the regeneration still matches the save
+        self.layout_crc = layout_crc
+        # spawn_key -> record of the object as it was spawned
+        self.baseline = baseline
+
+
+class LevelGenerator(object):
+    def __init__(self, game_seed, level_file, tiles_dir, map_size=(200, 200), min_rooms=7,
+                 starting_room="room-02.yaml", strategy=MapTypes.CONSTRUCTIVE1, maximum_number_of_tries=150,
+                 legacy_mode=False, executor=None):
+        self.game_seed = game_seed
+        self.level_file = level_file
+        self.tiles_dir = tiles_dir
+        self.map_size = map_size
+        self.min_rooms = min_rooms
+        self.starting_room = starting_room
+        self.strategy = strategy
+        self.maximum_number_of_tries = maximum_number_of_tries
+        self.legacy_mode = legacy_mode
+        self.executor = executor
+        # depth -> (seed, future) of the level being generated by the executor
+        self.pending = {}
+        self.pregenerated = 0
+        self.fallbacks = 0
+
+    def settings(self):
+        """The arguments that make the same generator on a worker process"""
+        return (self.game_seed, self.level_file, self.tiles_dir, self.map_size, self.min_rooms, self.starting_room,
+                self.strategy, self.maximum_number_of_tries, self.legacy_mode)
+
+    def map_settings(self):
+        """What the levels are generated with besides their seed, a save keeps it to make its level again the
+        same way whatever the game is started with. The level file is kept by name, it is looked up next to
+        the one of this generator"""
+        return {
+            'level_file': os.path.basename(self.level_file),
+            'map_size': list(self.map_size),
+            'min_rooms': self.min_rooms,
+            'starting_room': self.starting_room,
+            'strategy': self.strategy.name,
+            'maximum_number_of_tries': self.maximum_number_of_tries
+        }
+
+    def use_map_settings(self, settings):
+        """Generates the next levels with the settings of map_settings, the ones of a loaded game"""
+        if settings == self.map_settings():
+            return
+        self.level_file = os.path.join(os.path.dirname(self.level_file), settings['level_file'])
+        self.map_size = tuple(settings['map_size'])
+        self.min_rooms = settings['min_rooms']
+        self.starting_room = settings['starting_room']
+        self.strategy = MapTypes[settings['strategy']]
+        self.maximum_number_of_tries = settings['maximum_number_of_tries']
+        # whatever the worker process is generating was started with the old settings
+        for _, future in self.pending.values():
+            future.cancel()
+        self.pending = {}
+
+    def seed_for(self, depth):
+        # string seeds are hashed the same way on every run, unlike hash() of a tuple
+        return random.Random("{}-{}".format(self.game_seed, depth)).getrandbits(32)
+
+    def make_map(self, depth, rng):
+        max_rooms = max(self.min_rooms, int(depth * 1.25))
+
+        return MapConstructor(
+            self.map_size[0],
+            self.map_size[1],
+            max_number_of_rooms=max_rooms,
+            rng=rng
+        ).add_starting_tile_template(
+            os.path.join(self.tiles_dir, self.starting_room)
+        ).add_tile_template_folder(
+            self.tiles_dir
+        ).make_random_map(
+            strategy=self.strategy,
+            maximum_number_of_tries=self.maximum_number_of_tries,
+            legacy_mode=self.legacy_mode
+        )
+
+    def generate(self, depth, game_context, seed=None):
+        """Replaces the map and the objects of the context by the level at the depth, keeping the player.
+        The player is put on the first room before the population, which never gets any object,
+        so where it came from does not change what is spawned"""
+        seed = self.seed_for(depth) if seed is None else seed
+        if self._take_pregenerated(depth, seed, game_context):
+            return game_context.level
+        rng = random.Random(seed)
+
+        player = game_context.player
+        game_context.object_pool.clear_object_pool(keep_player=player is not None)
+        game_context.set_map(self.make_map(depth, rng))
+        if player is not None:
+            player.coord = game_context.map.get_rooms()[0].center()
+
+        MapObjectsConstructor(
+            game_instance=game_context,
+            rng=rng
+        ).load_object_templates(
+            self.level_file
+        ).populate_map()
+        self.level_up_monsters(game_context, rng)
+        if depth > 1:
+            self.place_up_stairs(game_context)
+
+        self._set_level(depth, seed, game_context)
+        logger.info("Level {} generated from seed {} with {} objects".format(
+            depth, seed, len(game_context.level.baseline)))
+        return game_context.level
+
+    @staticmethod
+    def _set_level(depth, seed, game_context):
+        baseline = {obj.spawn_key: object_record(obj)
+                    for obj in game_context.object_pool.get_objects_as_list() if obj.spawn_key is not None}
+        game_context.level = Level(depth, seed, layout_crc(game_context.map), baseline)
+
+    def prefetch(self, depth):
+        """Starts generating the level at the depth on the executor, generate takes it from there when it is done"""
+        if self.executor is None:
+            return
+        seed = self.seed_for(depth)
+        if depth in self.pending and self.pending[depth][0] == seed:
+            return
+        # only the next level is ever waited for
+        for _, future in self.pending.values():
+            future.cancel()
+        try:
+            self.pending = {depth: (seed, self.executor.submit(generate_in_worker, self.settings(), depth, seed))}
+        except Exception as e:
+            logger.error("Level {} could not be sent to the worker process: {}".format(depth, e))
+            self.pending = {}
+
+    def report(self):
+        return "level generation: {} levels taken from the worker process, {} generated while waiting".format(
+            self.pregenerated, self.fallbacks)
+
+    def _take_pregenerated(self, depth, seed, game_context):
+        pending = self.pending.pop(depth, None)
+        if pending is None or pending[0] != seed:
+            return False
+        future = pending[1]
+        if not future.done():
+            # the player was faster than the worker, it is left to finish on its own
+            self.fallbacks += 1
+            logger.info("Level {} is not ready on the worker process, generating it here".format(depth))
+            return False
+        try:
+            data = future.result()
+        except Exception as e:
+            self.fallbacks += 1
+            logger.error("Level {} failed on the worker process: {}".format(depth, e))
+            return False
+
+        document, arrays = decode(data)
+        player = game_context.player
+        restore_level(document, arrays, game_context, keep_id=False)
+        if player is not None:
+            player.coord = game_context.map.get_rooms()[0].center()
+        self._set_level(depth, seed, game_context)
+        self.pregenerated += 1
+        logger.info("Level {} taken from the worker process ({} bytes)".format(depth, len(data)))
+        return True
+
+    @staticmethod
+    def level_up_monsters(game_context, rng):
+        """The monsters of a new level are made stronger once, with the rng of the level, so the regeneration
+        makes them the same way and they are part of the baseline"""
+        for monster in game_context.object_pool.find_by_tag("monster"):
+            if monster.fighter:
+                monster.fighter.automatic_level_up(rng)
+
+    @staticmethod
+    def place_up_stairs(game_context):
+        """The stairs back to the level above, on the first room, where the player arrives"""
+        stairs = GameObject(
+            coord=game_context.map.get_rooms()[0].center(),
+            char='>',
+            color=Colors.white,
+            name='stairs up',
+            tags=['upstairs']
+        )
+        stairs.spawn_key = UP_STAIRS_SPAWN_KEY
+        game_context.object_pool.append(stairs)
+
+
+def generate_in_worker(settings, depth, seed):
+    """Runs on the worker process: generates the level on a context of its own and returns it as a level file"""
+    from managers import ObjectManager
+    from managers.ObjectPool import ObjectPool
+    from managers.GenericControllerObjects import GameContext
+    from models.EnumStatus import EGameState
+
+    generator = LevelGenerator(*settings)
+    game_context = GameContext(next_level=None, game_state=ObjectManager.GameState(EGameState.LOADING),
+                               level_generator=generator)
+    game_context.set_object_pool(ObjectPool())
+    generator.generate(depth, game_context, seed=seed)
+    return encode_level(game_context, whole_level=True)
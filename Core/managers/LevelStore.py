@@ -0,0 +1,123 @@
+"""The levels the player left, so they can be played again when the player takes the stairs back.
+A level is written to its own file as soon as it is left, in the format of the save files (its seed plus the
+objects that changed, see SaveGame.encode_level), and kept in memory while it is one of the last few levels
+left. Older ones are dropped from memory and read back from their file when the player returns, so the
+memory used stays the same however deep the game goes.
+The levels of a new game go to a folder of their own until the game is first saved, the levels of the game
+saved before are only replaced then, see commit"""
+
+import os
+import logging
+from collections import OrderedDict
+from managers import SaveGame
+
+logger = logging.getLogger('Rogue-EVE')
+
+
+class HotLevel(object):
+    """A level left recently, exactly as it was left"""
+
+    def __init__(self, tile_map, objects, level):
+        self.tile_map = tile_map
+        self.objects = objects
+        self.level = level
+
+
+class LevelStore(object):
+    def __init__(self, folder, hot_levels=3):
+        # levels of the saved game
+        self.folder = folder
+        # levels of the game being played, the same folder once it was saved
+        self.working = folder
+        self.hot_levels = hot_levels
+        # depth -> HotLevel, the least recently left first
+        self.hot = OrderedDict()
+        self.evictions = 0
+        self.reads = 0
+
+    def path_for(self, depth):
+        return os.path.join(self.working, "level-{}.sav".format(depth))
+
+    def visited(self, depth):
+        return depth in self.hot or os.path.exists(self.path_for(depth))
+
+    @staticmethod
+    def _remove(folder):
+        if os.path.isdir(folder):
+            for name in os.listdir(folder):
+                os.remove(os.path.join(folder, name))
+            os.rmdir(folder)
+
+    def begin(self):
+        """Starts the levels of a new game, apart from the ones of the saved game"""
+        self.hot.clear()
+        self.working = self.folder + '.new'
+        # left by a new game that was never saved
+        self._remove(self.working)
+
+    def commit(self):
+        """Called once the game being played was written where a load picks it up, its levels replace the ones
+        of the game saved before"""
+        if self.working == self.folder:
+            return
+        self._remove(self.folder)
+        if os.path.isdir(self.working):
+            os.rename(self.working, self.folder)
+        self.working = self.folder
+
+    def clear(self):
+        """Forgets every level of the game being played"""
+        self.hot.clear()
+        self._remove(self.working)
+
+    def release(self):
+        """Drops the levels kept in memory, they belong to the game context being replaced by a load.
+        Their files have everything, the levels of a new game that was never saved are thrown away"""
+        self.hot.clear()
+        if self.working != self.folder:
+            self._remove(self.working)
+            self.working = self.folder
+
+    def leave(self, depth, game_context):
+        """Stores the level being played, before the context moves to another one"""
+        if not os.path.isdir(self.working):
+            os.makedirs(self.working)
+        data = SaveGame.encode_level(game_context)
+        SaveGame.write_atomically(self.path_for(depth), data)
+
+        self.hot[depth] = HotLevel(game_context.map, SaveGame.level_objects(game_context), game_context.level)
+        self.hot.move_to_end(depth)
+        while len(self.hot) > self.hot_levels:
+            self.hot.popitem(last=False)
+            self.evictions += 1
+        logger.info("Level {} stored on {} ({} bytes)".format(depth, self.path_for(depth), len(data)))
+
+    def enter(self, depth, game_context, arrive_on=None):
+        """Makes the level at the depth the one being played, generating it if the player was never there.
+        The player is put on the first object tagged arrive_on, or on the first room.
+        Returns True when the level had been visited"""
+        hot = self.hot.pop(depth, None)
+        if hot is not None:
+            game_context.object_pool.clear_object_pool(keep_player=game_context.player is not None)
+            game_context.set_map(hot.tile_map)
+            game_context.level = hot.level
+            for obj in hot.objects:
+                game_context.object_pool.append(obj)
+        elif os.path.exists(self.path_for(depth)):
+            with open(self.path_for(depth), 'rb') as stream:
+                document, arrays = SaveGame.decode(stream.read())
+            SaveGame.restore_level(document, arrays, game_context)
+            self.reads += 1
+        else:
+            game_context.level_generator.generate(depth, game_context)
+            return False
+
+        player = game_context.player
+        if player is not None:
+            landing = next(iter(game_context.object_pool.find_by_tag(arrive_on)), None) if arrive_on else None
+            player.coord = landing.coord if landing is not None else game_context.map.get_rooms()[0].center()
+        return True
+
+    def report(self):
+        return "level store: {} hot, {} evicted, {} read back from disk".format(
+            len(self.hot), self.evictions, self.reads)
@@ -1,5 +1,5 @@
 import tdl
-from utils import Colors
+from utils import Colors, FieldOfView, Profiler
 import logging
 import textwrap
 from models.EnumStatus import EGameState
@@ -37,27 +37,53 @@ class CollisionHandler(object):
     def get_visible_tiles(self):
         return self.map.get_map().visible_tiles
 
+    @Profiler.timed('collision')
     def is_blocked(self, x, y):
-        if self.map.get_map()[x][y].blocked:
-            logger.debug(
-                "CollisionHandler [collided_with={} position={}]".format(self.map.get_map()[x][y], Vector2(x, y)))
+        if self.map.blocked[x, y]:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("CollisionHandler [collided_with={} position=({}, {})]".format(
+                    self.map.get_tile_by_id((x, y)), x, y))
             return True
 
-        # now check for any blocking objects
-        for obj in self.object_pool.get_objects_as_list():
-            if obj.blocks and obj.coord == Vector2(x, y):
-                logger.debug("CollisionHandler [collided_with={} position={}]".format(obj.name, obj.coord))
+        # now check for any blocking objects standing on that tile
+        for obj in self.object_pool.find_by_coord(x, y):
+            if obj.blocks:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("CollisionHandler [collided_with={} position={}]".format(obj.name, obj.coord))
                 return True
 
         return False
 
     def collides_with(self, this, x, y):
-        for obj in self.object_pool.get_objects_as_list():
-            if obj.blocks and obj.coord.X == x and obj.coord.Y == y and this._id != obj._id:
-                logger.debug("CollisionHandler [collided_with={} position={}]".format(obj.name, obj.coord))
+        for obj in self.object_pool.find_by_coord(x, y):
+            if obj.blocks and this._id != obj._id:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("CollisionHandler [collided_with={} position={}]".format(obj.name, obj.coord))
                 return obj
 
 
+class NullConsole(object):
+    """Stands in for a tdl console when running without a window, every drawing call is a no-op"""
+    def __init__(self, width=0, height=0):
+        self.width = width
+        self.height = height
+
+    def draw_char(self, x, y, char, fg=Ellipsis, bg=Ellipsis):
+        pass
+
+    def draw_str(self, x, y, string, fg=Ellipsis, bg=Ellipsis):
+        pass
+
+    def draw_rect(self, x, y, width, height, string, fg=Ellipsis, bg=Ellipsis):
+        pass
+
+    def clear(self, fg=Ellipsis, bg=Ellipsis):
+        pass
+
+    def blit(self, source, x=0, y=0, width=None, height=None, src_x=0, src_y=0):
+        pass
+
+
 class ConsoleBuffer(object):
     def __init__(self,
                  root,
@@ -80,6 +106,8 @@ class ConsoleBuffer(object):
 
         if console:
             self.console = console
+        elif isinstance(root, NullConsole):
+            self.console = NullConsole(width, height)
         else:
             self.console = tdl.Console(width, height)
 
@@ -170,6 +198,7 @@ class ConsoleBuffer(object):
              }
         )
 
+    @Profiler.timed('render')
     def render_gui(self):
 
         # prepare to render the GUI panel
@@ -239,6 +268,7 @@ class ConsoleBuffer(object):
 
         self.camera_coord = Vector2(x, y)
 
+    @Profiler.timed('render')
     def render_all_objects(self):
         player = self.object_pool.get_player()
         debug = True
@@ -252,16 +282,8 @@ class ConsoleBuffer(object):
             self.console.clear(fg=Colors.white, bg=Colors.black)
 
             self.reset_fov_recompute()
-            self.visible_tiles = tdl.map.quickFOV(
-                player.coord.X,
-                player.coord.Y,
-                self.map.is_visible_tile,
-                fov=self.fov_algorithm,
-                radius=player.torch,
-                lightWalls=self.fov_light_walls
-            )
-
-            self.map.set_visible_tiles(self.visible_tiles)
+            self.recompute_fov(player)
+
             if self.map:
                 self.map.draw(self.console, self)
 
@@ -269,7 +291,7 @@ class ConsoleBuffer(object):
             sorted_objects_list = sorted(self.object_pool.get_objects_as_list(), key=lambda x: x.z_index, reverse=False)
 
             for obj in sorted_objects_list:
-                if (obj.coord.X, obj.coord.Y) in self.visible_tiles:
+                if self.map.in_fov(obj.coord.X, obj.coord.Y):
                     obj.draw(self.console, self.camera_offset)
 
             if self.object_pool.get_player():
@@ -279,6 +301,18 @@ class ConsoleBuffer(object):
         self.root.blit(self.console, self.origin.X, self.origin.Y, self.width, self.height, self.target.X,
                        self.target.Y)
 
+    @Profiler.timed('fov')
+    def recompute_fov(self, player):
+        self.visible_tiles = FieldOfView.compute_fov(
+            self.map.transparent,
+            player.coord.X,
+            player.coord.Y,
+            radius=player.torch,
+            light_walls=self.fov_light_walls,
+            algorithm=self.fov_algorithm
+        )
+        self.map.set_visible_tiles(self.visible_tiles)
+
     def camera_offset(self, obj_coord):
         # convert coordinates on the map to coordinates on the screen
         coord = obj_coord - self.camera_coord
@@ -1,4 +1,5 @@
 import logging
+from managers.Scheduler import TurnScheduler
 
 logger = logging.getLogger('Rogue-EVE')
 
@@ -8,7 +9,12 @@ class ObjectPool(object):
     def __init__(self):
         self.id_counter = 0
         self.object_poll = {}
+        self.cells = {}
+        self.tag_index = {}
         self.player = None
+        self.scheduler = TurnScheduler(self)
+        # objects changed since the journal last looked at them, see Journal
+        self.touched = set()
 
     def __str__(self):
         return repr(self)
@@ -44,6 +50,57 @@ class ObjectPool(object):
         if obj._id not in self.object_poll.keys():
             self.object_poll[obj._id] = obj
             obj.object_pool = self
+            self._add_to_cell(obj, obj.coord)
+            self._add_tags(obj, obj.tags)
+            self.scheduler.add(obj)
+            self.touched.add(obj._id)
+
+    def _add_tags(self, obj, tags):
+        for tag in tags or ():
+            self.tag_index.setdefault(tag, {})[obj._id] = obj
+
+    def _remove_tags(self, obj, tags):
+        for tag in tags or ():
+            tagged = self.tag_index.get(tag)
+            if tagged is not None:
+                tagged.pop(obj._id, None)
+
+    def retag_object(self, obj, old_tags, new_tags):
+        """Called by the objects whenever their tags are replaced, to keep the tag index up to date"""
+        if self.object_poll.get(obj._id) is obj:
+            self._remove_tags(obj, old_tags)
+            self._add_tags(obj, new_tags)
+            self.touched.add(obj._id)
+
+    def _add_to_cell(self, obj, coord):
+        # vectors hash like (x, y) tuples, so they key the cells directly
+        if coord is not None:
+            self.cells.setdefault(coord, []).append(obj)
+
+    def _remove_from_cell(self, obj, coord):
+        if coord is not None:
+            cell = self.cells.get(coord)
+            if cell and obj in cell:
+                cell.remove(obj)
+                if not cell:
+                    del self.cells[coord]
+
+    def move_object(self, obj, old_coord, new_coord):
+        """Called by the objects whenever their coordinates change, to keep the occupancy index up to date"""
+        if self.object_poll.get(obj._id) is obj:
+            self._remove_from_cell(obj, old_coord)
+            self._add_to_cell(obj, new_coord)
+            self.touched.add(obj._id)
+
+    def touch(self, obj):
+        """Marks an object as changed in a way the pool can not see, like its hit points or its ai"""
+        if self.object_poll.get(obj._id) is obj:
+            self.touched.add(obj._id)
+
+    def find_by_coord(self, x, y):
+        """All the objects standing on (x, y), without going through the whole pool. It is a list taken when
+        called, as find_by_tag, so the callers can move or delete the objects while going through it"""
+        return list(self.cells.get((x, y), ()))
 
     def get_objects_as_list(self):
         """Get objects as a list instead of a dictionary"""
@@ -53,6 +110,10 @@ class ObjectPool(object):
         """Clears the object pool, used if necessary to reload the monstrs and itens on level or a new level,
         if the player is not set to be kept it will be deleted from the object pool, needing to recreate it"""
         self.object_poll = {}
+        self.cells = {}
+        self.tag_index = {}
+        self.touched = set()
+        self.scheduler.clear()
         if keep_player:
             self.append(self.player)
         else:
@@ -63,10 +124,16 @@ class ObjectPool(object):
         return self.object_poll
 
     def __delitem__(self, key):
-        del self.object_poll[key]
+        obj = self.object_poll.pop(key)
+        self._remove_from_cell(obj, obj.coord)
+        self._remove_tags(obj, obj.tags)
+        self.scheduler.unschedule(obj)
 
     def __delete__(self):
         self.object_poll = {}
+        self.cells = {}
+        self.tag_index = {}
+        self.scheduler.clear()
 
     def delete_object(self, obj):
         key_to_delete = None
@@ -75,11 +142,11 @@ class ObjectPool(object):
                 key_to_delete = key
                 break;
 
-        del self.object_poll[key_to_delete]
+        del self[key_to_delete]
 
     def delete_by_id(self, key):
         if key in self.object_poll.keys():
-            del self.object_poll[key]
+            del self[key]
         else:
             logger.error("Key not present in the object pool")
             # raise KeyError
@@ -92,4 +159,7 @@ class ObjectPool(object):
             # raise KeyError
 
     def find_by_tag(self, tag):
-        return [obj for obj in self.get_objects_as_list() if tag in obj.tags]
\ No newline at end of file
+        """The objects with the tag, out of the tag index. It is a list taken when called, so the callers can
+        kill, remove or retag the objects while going through it.
+        Tags must be replaced (obj.tags = [...]) and not changed in place for the index to notice"""
+        return list(self.tag_index.get(tag, {}).values())
\ No newline at end of file
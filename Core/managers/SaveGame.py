@@ -0,0 +1,531 @@
+"""Binary save files. A file is a fixed header, a json document with the object table and the game state,
+and a compressed numpy archive with the map layers and the numeric columns of the object table:
+
+    header     magic, format version and size of the json document
+    json       extras, messages, player id, object table columns and component records, zlib compressed
+    npz        blocked, transparent, tile_type, explored, visible, rooms, shade_rgb, object_*
+
+Every object is one row of the table. Functions and classes are stored by their registry name and colors
+as rgb, so a file does not depend on the code that wrote it the way a pickle does. Items carried by a
+character come after the objects on the pool, with the id of their owner, so loading is a single pass.
+
+A level made by a LevelGenerator is not stored at all: the document keeps its seed and the spawn keys of the
+objects that are gone, the table keeps only the objects that differ from the population, and the npz only
+the explored mask as bits. Loading generates the level again and applies that difference on top of it"""
+
+import io
+import os
+import json
+import zlib
+import struct
+import logging
+import numpy as np
+from models.GameObjects import Character, Item, Equipment, Fighter, BasicMonsterAI, object_types, ai_types, \
+    death_methods, use_functions, status_effects
+from models.GenericObjects import Vector2
+from models.MapObjects import TileMap, Rect
+from models.EnumStatus import EGameState, EEquipmentSlot
+from managers.ObjectPool import ObjectPool
+from utils.Registry import colors as palette
+
+logger = logging.getLogger('Rogue-EVE')
+
+MAGIC = b'REVE'
+VERSION = 1
+HEADER = struct.Struct('<4sHI')
+
+# shade_colors order of the TileMap: unseen, dark ground, dark wall, light ground, light wall
+DARK_GROUND, DARK_WALL, LIGHT_GROUND, LIGHT_WALL = 1, 2, 3, 4
+
+
+def _state(component, *skip):
+    """The plain attributes of a component, without the references that are rebuilt on load"""
+    return {key: value for key, value in vars(component).items() if key not in skip}
+
+
+def _restore(cls, state):
+    component = cls.__new__(cls)
+    component.__dict__.update(state)
+    return component
+
+
+def _encode_extra_params(extra_params):
+    if not extra_params:
+        return extra_params
+    encoded = dict(extra_params)
+    if callable(encoded.get("status_effect")):
+        encoded["status_effect"] = status_effects.name_of(encoded["status_effect"])
+    return encoded
+
+
+def _decode_extra_params(extra_params):
+    if not extra_params:
+        return extra_params
+    decoded = dict(extra_params)
+    if decoded.get("status_effect") in status_effects:
+        decoded["status_effect"] = status_effects[decoded["status_effect"]]
+    return decoded
+
+
+def _fighter_record(fighter):
+    record = _state(fighter, 'owner', 'equipment', '_bonus', 'death_function')
+    record['death_function'] = death_methods.name_of(fighter.death_function)
+    return record
+
+
+def _fighter_from_record(record):
+    fighter = _restore(Fighter, record)
+    fighter.death_function = death_methods.get(record['death_function'])
+    fighter.equipment = {}
+    fighter._bonus = None
+    return fighter
+
+
+def _ai_record(ai):
+    record = _state(ai, 'owner', 'visible_tiles_ref', 'old_ai')
+    record['type'] = ai_types.name_of(type(ai))
+    if hasattr(ai, 'old_ai'):
+        # the ai a confused or frozen monster goes back to
+        record['old_ai'] = _ai_record(ai.old_ai) if ai.old_ai else None
+    return record
+
+
+def _ai_from_record(record, owner, visible_tiles):
+    record = dict(record)
+    cls = ai_types[record.pop('type')]
+    has_old_ai = 'old_ai' in record
+    old_ai = record.pop('old_ai', None)
+    ai = _restore(cls, record)
+    ai.owner = owner
+    if has_old_ai:
+        ai.old_ai = _ai_from_record(old_ai, owner, visible_tiles) if old_ai else None
+    if cls is BasicMonsterAI:
+        ai.visible_tiles_ref = visible_tiles
+    return ai
+
+
+def _item_record(item):
+    record = {
+        'use_function': use_functions.name_of(item.use_function),
+        'extra_params': _encode_extra_params(item.extra_params)
+    }
+    if isinstance(item, Equipment):
+        record.update(
+            power_bonus=item.power_bonus,
+            defense_bonus=item.defense_bonus,
+            max_hp_bonus=item.max_hp_bonus,
+            slot=item.slot.name if item.slot else None,
+            charges=item.charges,
+            is_equipped=item.is_equipped
+        )
+    return record
+
+
+def _item_arguments(record):
+    arguments = dict(record)
+    arguments.pop('is_equipped', None)
+    arguments['use_function'] = use_functions.get(record['use_function'])
+    arguments['extra_params'] = _decode_extra_params(record['extra_params'])
+    if 'slot' in record:
+        arguments['slot'] = EEquipmentSlot[record['slot']] if record['slot'] else None
+    return arguments
+
+
+def object_record(obj, owner=None):
+    """Everything the save keeps of an object, as one row of the object table"""
+    is_character = isinstance(obj, Character)
+    return {
+        'id': obj._id,
+        'type': type(obj).__name__,
+        'name': obj.name,
+        'char': obj.char,
+        'tags': list(obj.tags or ()),
+        'owner': owner,
+        'spawn_key': obj.spawn_key,
+        'character': {
+            'torch': obj.torch, 'speed': obj.speed, 'has_inventory': obj.inventory is not None
+        } if is_character else None,
+        'fighter': _fighter_record(obj.fighter) if is_character and obj.fighter else None,
+        'ai': _ai_record(obj.ai) if is_character and obj.ai else None,
+        'item': _item_record(obj) if isinstance(obj, Item) else None,
+        'coord': (-1, -1) if obj.coord is None else (obj.coord.X, obj.coord.Y),
+        'color': tuple(obj.color),
+        'z_index': obj.z_index,
+        'blocks': obj.blocks
+    }
+
+
+class ObjectTable(object):
+    """Columns of the objects being saved, one row per object. The numeric columns go to the numpy archive"""
+    COLUMNS = ('id', 'type', 'name', 'char', 'tags', 'owner', 'spawn_key', 'character', 'fighter', 'ai', 'item')
+
+    def __init__(self):
+        self.columns = {name: [] for name in ObjectTable.COLUMNS}
+        self.coords = []
+        self.colors = []
+        self.z_index = []
+        self.blocks = []
+
+    def __len__(self):
+        return len(self.coords)
+
+    def add(self, obj, owner=None, record=None):
+        """Adds the object and, right after it, whatever it carries"""
+        record = record or object_record(obj, owner)
+        for name in ObjectTable.COLUMNS:
+            self.columns[name].append(record[name])
+        self.coords.append(record['coord'])
+        self.colors.append(record['color'])
+        self.z_index.append(record['z_index'])
+        self.blocks.append(record['blocks'])
+
+        if isinstance(obj, Character) and obj.inventory:
+            for item in obj.inventory:
+                self.add(item, owner=obj._id)
+
+    def arrays(self):
+        coords = np.array(self.coords, dtype=np.int32).reshape(-1, 2)
+        return {
+            'object_x': coords[:, 0],
+            'object_y': coords[:, 1],
+            'object_color': np.array(self.colors, dtype=np.uint8).reshape(-1, 3),
+            'object_z_index': np.array(self.z_index, dtype=np.int16),
+            'object_blocks': np.array(self.blocks, dtype=bool)
+        }
+
+
+def layout_crc(tile_map):
+    """Checksum of the blocked layer, tells if a regenerated level still matches the one that was saved"""
+    return zlib.crc32(np.packbits(tile_map.blocked).tobytes())
+
+
+def _map_arrays(tile_map):
+    return dict(
+        blocked=tile_map.blocked,
+        transparent=tile_map.transparent,
+        tile_type=tile_map.tile_type,
+        explored=tile_map.explored,
+        visible=tile_map.visible_tiles,
+        rooms=np.array([(room.x1, room.y1, room.x2, room.y2) for room in tile_map.get_rooms()],
+                       dtype=np.int32).reshape(-1, 4),
+        shade_rgb=palette.rgb[tile_map.shade_colors]
+    )
+
+
+def _add_level_objects(table, objects, level):
+    """Adds the objects to the table, but the spawned ones the regeneration of the level brings back as they are.
+    Returns the spawn keys of the spawned objects that are still there"""
+    present = set()
+    for obj in objects:
+        record = object_record(obj)
+        if level is not None and obj.spawn_key is not None:
+            present.add(obj.spawn_key)
+            if record == level.baseline.get(obj.spawn_key):
+                # untouched since it was spawned, the regeneration brings it back
+                continue
+        table.add(obj, record=record)
+    return present
+
+
+def _pack(game_context, level, present, document, arrays):
+    """Adds the map, whole or as the seed of its level, and puts the file together"""
+    tile_map = game_context.map
+    document['legacy_mode'] = tile_map.legacy_mode
+    # the levels still to come are generated from the seed of the game, with the strategy, size and templates
+    # it was started with, whether this level is saved whole or not. The game may be loaded with others
+    document['game_seed'] = game_context.level_generator.game_seed
+    document['generator'] = game_context.level_generator.map_settings()
+    if level is None:
+        arrays.update(_map_arrays(tile_map))
+    else:
+        document['level'] = {
+            'depth': level.depth,
+            'seed': level.seed,
+            'layout_crc': level.layout_crc,
+            # spawned objects that are gone: killed and removed, picked up or used
+            'removed': sorted(set(level.baseline) - present)
+        }
+        arrays['explored_bits'] = np.packbits(tile_map.explored)
+
+    stream = io.BytesIO()
+    np.savez_compressed(stream, **arrays)
+    encoded_document = zlib.compress(json.dumps(document, separators=(',', ':')).encode('utf-8'))
+    return HEADER.pack(MAGIC, VERSION, len(encoded_document)) + encoded_document + stream.getvalue()
+
+
+def level_objects(game_context):
+    """The objects of the level, without the player and what it carries"""
+    player = game_context.player
+    carried = set(id(item) for item in player.get_inventory() or ()) if player else set()
+    return [obj for obj in game_context.object_pool.get_objects_as_list()
+            if obj is not player and id(obj) not in carried]
+
+
+def encode(game_context, whole_level=False):
+    """The save file of the game as bytes. A level that came out of a LevelGenerator is saved as its seed,
+    the explored mask and the objects that differ from its population, any other level is saved whole.
+    With whole_level every level is saved whole, and loading it keeps the ids of the objects"""
+    object_pool = game_context.object_pool
+    player = game_context.player
+    level = None if whole_level else getattr(game_context, 'level', None)
+
+    table = ObjectTable()
+    # the player goes first, so it gets its id back before anyone else joins the pool
+    table.add(player)
+    present = _add_level_objects(table, level_objects(game_context), level)
+
+    messages = game_context.lower_gui_renderer.game_msg if game_context.lower_gui_renderer else None
+    document = {
+        'player': player.get_id(),
+        'id_counter': object_pool.id_counter,
+        'game_state': game_context.game_state.get_state().name,
+        'extras': game_context.extras,
+        'messages': [[line, list(color)] for line, color in messages or ()],
+        'objects': table.columns
+    }
+    return _pack(game_context, level, present, document, table.arrays())
+
+
+def encode_level(game_context, whole_level=False):
+    """The level being played without the player, as the level store keeps it. Same format as a save file"""
+    level = None if whole_level else getattr(game_context, 'level', None)
+    table = ObjectTable()
+    present = _add_level_objects(table, level_objects(game_context), level)
+    document = {
+        'player': None,
+        'id_counter': game_context.object_pool.id_counter,
+        'objects': table.columns
+    }
+    return _pack(game_context, level, present, document, table.arrays())
+
+
+def decode(data):
+    """Splits the bytes of a save file in the json document and the arrays"""
+    if len(data) < HEADER.size:
+        raise RuntimeError("Save file is truncated")
+    magic, version, document_size = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise RuntimeError("Not a save file")
+    if version != VERSION:
+        raise RuntimeError("Save file version {} is not supported, expected {}".format(version, VERSION))
+
+    start = HEADER.size
+    document = json.loads(zlib.decompress(data[start:start + document_size]).decode('utf-8'))
+    with np.load(io.BytesIO(data[start + document_size:]), allow_pickle=False) as archive:
+        arrays = {name: archive[name] for name in archive.files}
+    return document, arrays
+
+
+def _make_map(document, arrays):
+    shades = [tuple(int(c) for c in rgb) for rgb in arrays['shade_rgb']]
+    rooms = [Rect(x1, y1, x2 - x1, y2 - y1) for x1, y1, x2, y2 in arrays['rooms'].tolist()]
+    tile_map = TileMap(arrays['blocked'], rooms,
+                       color_dark_wall=shades[DARK_WALL], color_light_wall=shades[LIGHT_WALL],
+                       color_dark_ground=shades[DARK_GROUND], color_light_ground=shades[LIGHT_GROUND],
+                       legacy_mode=document['legacy_mode'],
+                       transparent=arrays['transparent'], tile_type=arrays['tile_type'])
+    tile_map.explored[:] = arrays['explored']
+    tile_map.visible_tiles = arrays['visible'].copy()
+    return tile_map
+
+
+def _regenerate_level(level, arrays, game_context):
+    """Generates the level again from its seed and takes out the spawned objects the save replaces or lost.
+    Returns the remaining spawned objects by spawn key. A level that does not come out as it was saved stops
+    the load, the objects of the save would land on another map"""
+    game_context.level_generator.generate(level['depth'], game_context, seed=level['seed'])
+
+    tile_map = game_context.map
+    if layout_crc(tile_map) != level['layout_crc']:
+        raise RuntimeError("Level {} regenerated from seed {} does not match the saved one, the tiles or the "
+                           "generator changed since the game was saved".format(level['depth'], level['seed']))
+    size = tile_map.width * tile_map.height
+    tile_map.explored[:] = np.unpackbits(arrays['explored_bits'])[:size].reshape(tile_map.explored.shape)
+
+    spawned = {obj.spawn_key: obj for obj in game_context.object_pool.get_objects_as_list()
+               if obj.spawn_key is not None}
+    for spawn_key in level['removed']:
+        obj = spawned.pop(spawn_key, None)
+        if obj is not None:
+            del game_context.object_pool[obj.get_id()]
+    return spawned
+
+
+def make_object(record, game_context, keep_id=True):
+    """Builds an object out of its record, with its components, and nothing it carries"""
+    cls = object_types[record['type']]
+    arguments = dict(
+        coord=None if record['coord'][0] < 0 else Vector2(*record['coord']),
+        char=record['char'],
+        color=tuple(record['color']),
+        name=record['name'],
+        blocks=record['blocks'],
+        _id=record['id'] if keep_id else None,
+        tags=record['tags'],
+        z_index=record['z_index']
+    )
+
+    character = record['character']
+    if character is not None:
+        arguments.update(
+            torch=character['torch'],
+            speed=character['speed'],
+            collision_handler=game_context.collision_handler,
+            inventory=list() if character['has_inventory'] else None
+        )
+    item = record['item']
+    if item is not None:
+        arguments.update(_item_arguments(item))
+
+    obj = cls(**arguments)
+    obj.spawn_key = record['spawn_key']
+
+    if record['fighter'] is not None:
+        obj.fighter = _fighter_from_record(record['fighter'])
+        obj.fighter.owner = obj
+    if record['ai'] is not None:
+        obj.ai = _ai_from_record(record['ai'], obj, game_context.map.visible_tiles)
+    if item is not None and 'is_equipped' in item:
+        obj.is_equipped = item['is_equipped']
+    return obj
+
+
+def apply_changes(obj, changes, game_context):
+    """Sets the fields of a record that changed on an object that already exists"""
+    for name, value in changes.items():
+        if name == 'coord':
+            obj.coord = None if value[0] < 0 else Vector2(*value)
+        elif name == 'color':
+            obj.color = tuple(value)
+        elif name in ('char', 'name', 'blocks', 'tags', 'z_index', 'spawn_key'):
+            setattr(obj, name, value)
+        elif name == 'character':
+            obj.torch, obj.speed = value['torch'], value['speed']
+        elif name == 'fighter':
+            obj.fighter = _fighter_from_record(value) if value is not None else None
+            if obj.fighter:
+                obj.fighter.owner = obj
+                if obj.inventory:
+                    obj.fighter.rebuild_equipment(obj.inventory)
+        elif name == 'ai':
+            obj.ai = _ai_from_record(value, obj, game_context.map.visible_tiles) if value is not None else None
+        elif name == 'item':
+            for key, argument in _item_arguments(value).items():
+                setattr(obj, key, argument)
+            if 'is_equipped' in value:
+                obj.is_equipped = value['is_equipped']
+
+
+def give_inventory(holder, records, game_context, keep_id=True):
+    """Replaces what the character carries by the items of the records"""
+    holder.inventory = []
+    for record in records:
+        item = make_object(record, game_context, keep_id=keep_id)
+        item.context = game_context
+        item.player = holder
+        holder.inventory.append(item)
+    if holder.fighter:
+        holder.fighter.rebuild_equipment(holder.inventory)
+
+
+def _restore_objects(document, arrays, game_context, spawned, keep_id, inventory_width=8):
+    """Puts the objects of the table on the pool, with what they carry, the player row as the player"""
+    columns = document['objects']
+    xs, ys = arrays['object_x'].tolist(), arrays['object_y'].tolist()
+    colors = arrays['object_color'].tolist()
+    z_index, blocks = arrays['object_z_index'].tolist(), arrays['object_blocks'].tolist()
+
+    loaded = {}
+    carried = {}
+    for row in range(len(xs)):
+        record = {name: columns[name][row] for name in ObjectTable.COLUMNS}
+        record.update(coord=(xs[row], ys[row]), color=colors[row], z_index=z_index[row], blocks=blocks[row])
+
+        owner = record['owner']
+        if owner is not None:
+            carried.setdefault(owner, []).append(record)
+            continue
+
+        obj = make_object(record, game_context, keep_id=keep_id)
+        if record['id'] == document['player']:
+            obj.game_state = game_context.game_state
+            game_context.set_player(obj, inventory_width=inventory_width)
+        else:
+            if obj.spawn_key in spawned:
+                # the saved state of a spawned object replaces the regenerated one
+                del game_context.object_pool[spawned.pop(obj.spawn_key).get_id()]
+            game_context.object_pool.append(obj)
+        loaded[record['id']] = obj
+
+    for owner, records in carried.items():
+        give_inventory(loaded[owner], records, game_context, keep_id=keep_id)
+
+
+def restore(document, arrays, game_context, inventory_width=8):
+    """Fills a new game context with the decoded save and returns the messages of the log.
+    The inventory width is the one the game sets the player up with, it is not part of the save"""
+    game_context.extras = document['extras']
+    game_context.game_state.set_state(EGameState[document['game_state']])
+    game_context.set_object_pool(ObjectPool())
+    # the levels of the level store keep the ids they were left with, below the counter of the save, and
+    # nothing regenerated or loaded here may take one of them
+    game_context.object_pool.id_counter = document['id_counter']
+    generator = game_context.level_generator
+    generator.game_seed = document['game_seed']
+    generator.use_map_settings(document['generator'])
+
+    level = document.get('level')
+    if level is None:
+        game_context.set_map(_make_map(document, arrays))
+        spawned = {}
+    else:
+        spawned = _regenerate_level(level, arrays, game_context)
+
+    # the regenerated objects took the ids already, the others get new ones as they join the pool
+    _restore_objects(document, arrays, game_context, spawned, keep_id=level is None,
+                     inventory_width=inventory_width)
+    return [(line, tuple(color)) for line, color in document['messages']]
+
+
+def restore_level(document, arrays, game_context, keep_id=True):
+    """Replaces the map and the objects of the context by a level written by encode_level, keeping the player.
+    Without keep_id the objects get new ids, for a level that was made by another process"""
+    level = document.get('level')
+    if level is None:
+        game_context.object_pool.clear_object_pool(keep_player=game_context.player is not None)
+        game_context.set_map(_make_map(document, arrays))
+        game_context.level = None
+        spawned = {}
+    else:
+        spawned = _regenerate_level(level, arrays, game_context)
+
+    # the ids of a level the game left are not taken by anything else, it was left with them
+    _restore_objects(document, arrays, game_context, spawned, keep_id=keep_id)
+    game_context.object_pool.id_counter = max(game_context.object_pool.id_counter, document['id_counter'])
+
+
+def write_atomically(path, data):
+    """Writes the file next to the old one and renames it over, a crash halfway never leaves a broken save"""
+    temporary = "{}.{}.tmp".format(path, os.getpid())
+    try:
+        with open(temporary, 'wb') as stream:
+            stream.write(data)
+            stream.flush()
+            os.fsync(stream.fileno())
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def save_game(path, game_context):
+    data = encode(game_context)
+    write_atomically(path, data)
+    logger.info("Game saved on {} ({} bytes)".format(path, len(data)))
+    return len(data)
+
+
+def load_game(path, game_context, inventory_width=8):
+    with open(path, 'rb') as stream:
+        document, arrays = decode(stream.read())
+    return restore(document, arrays, game_context, inventory_width=inventory_width)
@@ -0,0 +1,204 @@
+"""Turn scheduling for the actors of the object pool.
+Every action costs a delay in ticks that depends on the speed of the actor, a normal speed actor acts once
+every TICKS_PER_TURN ticks. The player is scheduled at a half tick offset and everyone is rescheduled in whole
+ticks, so the player is always alone in its event and no one ever seems to lose a turn.
+Actors far from the player are parked by chunk and cost nothing until the player comes close again."""
+
+import math
+import logging
+
+logger = logging.getLogger('Rogue-EVE')
+
+TICKS_PER_TURN = 12
+NORMAL_SPEED = 1.0
+PLAYER_OFFSET = 0.5
+
+
+class DeltaClock(object):
+    """Events sorted by the ticks between them, advancing to the next event is O(1)"""
+    class Node(object):
+        def __init__(self, delta, link):
+            self.delta = delta
+            self.link = link
+            self.events = set()
+
+    def __init__(self):
+        self.head = None
+        self.nodes = {}
+        self.now = 0
+
+    def __contains__(self, event):
+        return event in self.nodes
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def schedule(self, event, delta):
+        assert event not in self.nodes
+
+        prev, curr = None, self.head
+        while curr is not None and delta > curr.delta:
+            delta -= curr.delta
+            prev, curr = curr, curr.link
+
+        if curr is not None and delta == curr.delta:
+            node = curr
+        else:
+            node = DeltaClock.Node(delta, curr)
+            if prev is None:
+                self.head = node
+            else:
+                prev.link = node
+            if curr is not None:
+                curr.delta -= delta
+
+        node.events.add(event)
+        self.nodes[event] = node
+
+    def advance(self):
+        """Moves the clock to the next event and returns everything scheduled for it"""
+        if self.head is None:
+            return set()
+
+        events = self.head.events
+        for event in events:
+            del self.nodes[event]
+        self.now += self.head.delta
+        self.head = self.head.link
+        return events
+
+    def unschedule(self, event):
+        if event in self.nodes:
+            self.nodes[event].events.remove(event)
+            del self.nodes[event]
+
+    def clear(self):
+        self.head = None
+        self.nodes = {}
+
+
+class TurnScheduler(object):
+    """Decides which actors of the object pool act between two turns of the player.
+    Events are the _id of the objects, so the clock survives pickling with the pool"""
+
+    def __init__(self, object_pool, activity_radius=40, chunk_size=16):
+        self.object_pool = object_pool
+        self.activity_radius = activity_radius
+        self.chunk_size = chunk_size
+        self.clock = DeltaClock()
+        # chunk -> ids of the actors sleeping on it, and id -> chunk
+        self.chunks = {}
+        self.parked = {}
+
+    @staticmethod
+    def delay(obj):
+        """Ticks an action takes for the object, a faster actor acts more often"""
+        speed = getattr(obj, 'speed', NORMAL_SPEED) or NORMAL_SPEED
+        return max(1, int(round(TICKS_PER_TURN / speed)))
+
+    @staticmethod
+    def is_actor(obj):
+        return getattr(obj, 'ai', None) is not None
+
+    def _chunk_of(self, coord):
+        return coord.X // self.chunk_size, coord.Y // self.chunk_size
+
+    def _chunks_around(self, coord):
+        first_x, last_x = (coord.X - self.activity_radius) // self.chunk_size, (coord.X + self.activity_radius) // self.chunk_size
+        first_y, last_y = (coord.Y - self.activity_radius) // self.chunk_size, (coord.Y + self.activity_radius) // self.chunk_size
+        for chunk_x in range(first_x, last_x + 1):
+            for chunk_y in range(first_y, last_y + 1):
+                yield chunk_x, chunk_y
+
+    def _in_range(self, obj, player):
+        if obj.coord is None or player is None or player.coord is None:
+            return False
+        return max(abs(obj.coord.X - player.coord.X), abs(obj.coord.Y - player.coord.Y)) <= self.activity_radius
+
+    def add(self, obj):
+        """Called by the object pool whenever an object joins it"""
+        if obj is self.object_pool.player:
+            self.unschedule(obj)
+            self._schedule_player(obj)
+        elif self.is_actor(obj):
+            # every actor starts asleep, the next turn wakes the ones close to the player
+            self.park(obj)
+
+    def park(self, obj):
+        self.unschedule(obj)
+        if obj.coord is None:
+            return
+        chunk = self._chunk_of(obj.coord)
+        self.chunks.setdefault(chunk, set()).add(obj._id)
+        self.parked[obj._id] = chunk
+
+    def unschedule(self, obj):
+        """Takes the object out of the clock and out of the sleeping chunks, used when it dies or leaves the pool"""
+        self.clock.unschedule(obj._id)
+        chunk = self.parked.pop(obj._id, None)
+        if chunk is not None:
+            sleeping = self.chunks[chunk]
+            sleeping.discard(obj._id)
+            if not sleeping:
+                del self.chunks[chunk]
+
+    def clear(self):
+        self.clock.clear()
+        self.chunks = {}
+        self.parked = {}
+
+    def _schedule_player(self, player):
+        # the event of the player is its next turn, whatever comes before it acts in between
+        delta = math.floor(self.clock.now) + self.delay(player) + PLAYER_OFFSET - self.clock.now
+        self.clock.schedule(player._id, delta)
+
+    def _schedule_actor(self, obj):
+        # actors always land on whole ticks, away from the half tick of the player
+        delta = math.floor(self.clock.now) + self.delay(obj) - self.clock.now
+        self.clock.schedule(obj._id, delta)
+
+    def wake_up(self, player):
+        """Schedules the sleeping actors on the chunks within the activity radius of the player"""
+        for chunk in self._chunks_around(player.coord):
+            sleeping = self.chunks.get(chunk)
+            if not sleeping:
+                continue
+            for _id in list(sleeping):
+                obj = self.object_pool.object_poll.get(_id)
+                if obj is None or not self.is_actor(obj):
+                    sleeping.discard(_id)
+                    self.parked.pop(_id, None)
+                elif self._in_range(obj, player):
+                    sleeping.discard(_id)
+                    self.parked.pop(_id, None)
+                    self._schedule_actor(obj)
+            if not sleeping:
+                del self.chunks[chunk]
+
+    def actors_until_player(self):
+        """Advances the clock until the next turn of the player and returns the actors that act before it,
+        in order. They are already rescheduled, so killing one of them is just an unschedule"""
+        player = self.object_pool.player
+        if player is None:
+            return []
+        if player._id not in self.clock:
+            self._schedule_player(player)
+
+        self.wake_up(player)
+
+        acting = []
+        while True:
+            events = self.clock.advance()
+            if player._id in events:
+                self._schedule_player(player)
+                return acting
+
+            for _id in sorted(events):
+                obj = self.object_pool.object_poll.get(_id)
+                if obj is None or not self.is_actor(obj):
+                    continue
+                if self._in_range(obj, player):
+                    self._schedule_actor(obj)
+                    acting.append(obj)
+                else:
+                    self.park(obj)
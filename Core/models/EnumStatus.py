@@ -58,4 +58,10 @@ class Cardinals(Enum):
     NORTH = 0
     SOUTH = 1
     EAST = 2
-    WEST = 3
\ No newline at end of file
+    WEST = 3
+
+
+class ETileType(Enum):
+    WALL = 0
+    FLOOR = 1
+    CORRIDOR = 2
@@ -6,8 +6,10 @@ from models.GenericObjects import Vector2
 from utils import PathFinding
 from random import randint
 from utils import Colors
+from utils.Registry import Registry, colors as palette
 from models.EnumStatus import EGameState, EMessage, EEquipmentSlot
 from managers.Messenger import send_message, broadcast_message
+from managers.Scheduler import NORMAL_SPEED
 
 logger = logging.getLogger('Rogue-EVE')
 
@@ -32,19 +34,56 @@ class GameObject(DrawableObject):
                  z_index=1
                  ):
         self._id = _id
+        self.object_pool = None
         self.coord = coord
         self.char = char
         self.color = color
         self.blocks = blocks
         self.name = name
-        self.object_pool = None
         self.tags = tags
         self.z_index = z_index
         self.context = None
+        # order in which the level generation spawned the object, None for everything else
+        self.spawn_key = None
+
+    @property
+    def coord(self):
+        return self._coord
+
+    @coord.setter
+    def coord(self, value):
+        old_coord = self.__dict__.get('_coord')
+        self._coord = value
+        # keep the occupancy index of the object pool in sync
+        if self.object_pool is not None:
+            self.object_pool.move_object(self, old_coord, value)
+
+    @property
+    def tags(self):
+        return self._tags
+
+    @tags.setter
+    def tags(self, value):
+        old_tags = self.__dict__.get('_tags')
+        self._tags = value
+        # keep the tag index of the object pool in sync
+        if self.object_pool is not None:
+            self.object_pool.retag_object(self, old_tags, value)
 
     def get_id(self):
         return self._id
 
+    def clone(self):
+        """A new object with the same fields, used to spawn objects from a compiled template.
+        The clone has no id and is not on any object pool yet. Mutable fields are copied, not shared with the
+        template"""
+        obj = copy.copy(self)
+        obj._id = None
+        obj.object_pool = None
+        obj.context = None
+        obj.tags = list(self.tags)
+        return obj
+
     def __str__(self):
         return repr(self)
 
@@ -65,10 +104,7 @@ class GameObject(DrawableObject):
         else:
             values = hard_values
 
-        if values["color"] in [a for a in dir(Colors) if "__" not in a]:
-            color = eval("Colors." + values["color"])
-        else:
-            color = Colors.dark_crimson
+        color = palette.get(values["color"], Colors.dark_crimson)
 
         if "blocks" not in values.keys():
             values["blocks"] = False
@@ -106,12 +142,12 @@ class BasicMonsterAI(object):
     def take_turn(self):
         # a basic monster takes its turn. If you can see it, it can see you
         monster = self.owner
-        visible_tiles = self.owner.collision_handler.map.get_visible_tiles()
 
-        if (monster.coord.X, monster.coord.Y) in visible_tiles:
+        if monster.collision_handler.map.in_fov(monster.coord.X, monster.coord.Y):
             closest_point_of_interest = self.get_closest_point_of_interest()
             pos = closest_point_of_interest["coord"] - self.owner.coord
-            pos = (abs(pos.X) + abs(pos.Y))
+            # monsters also reach diagonally, like the player
+            pos = max(abs(pos.X), abs(pos.Y))
             # move towards player if far away
             if pos > 1:
                 monster.move_towards(closest_point_of_interest['obj'].coord)
@@ -194,6 +230,8 @@ class DeathMethods(object):
         monster.name = 'remains of ' + monster.name
         monster.z_index = 0
         monster.tags = ["corpse"]
+        if monster.object_pool:
+            monster.object_pool.scheduler.unschedule(monster)
 
 
 class UseFunctions(object):
@@ -339,6 +377,20 @@ class StatusEffects(object):
             monster.ai = FrozenMonsterAI(old_ai, number_of_turns)
 
         monster.ai.owner = monster  # tell the new component who owns it
+        if monster.object_pool is not None:
+            monster.object_pool.touch(monster)
+
+
+death_methods = Registry.from_class(DeathMethods)
+use_functions = Registry.from_class(UseFunctions)
+status_effects = Registry.from_class(StatusEffects)
+
+
+def resolve_status_effect(extra_params):
+    """The status effect of the extra params is given by name on the data files"""
+    if extra_params and extra_params.get("status_effect") in status_effects:
+        extra_params["status_effect"] = status_effects[extra_params["status_effect"]]
+    return extra_params
 
 
 class Fighter(object):
@@ -357,30 +409,65 @@ class Fighter(object):
         self.level_up_xp = self._level_up_base + level * self._level_up_factor
         self.level = level
         self.death_function = death_function
+        # EEquipmentSlot -> equipped item, and the (power, defense, max_hp) bonus of all of them
+        self.equipment = {}
+        self._bonus = None
 
     @property
     def defense(self):
-        bonus = sum(equipment.defense_bonus for equipment in self.get_equipped_items())
-        return self.base_defense + bonus
+        return self.base_defense + self.equipment_bonus()[1]
 
     @property
     def power(self):
-        bonus = sum(equipment.power_bonus for equipment in self.get_equipped_items())
-        return self.base_power + bonus
+        return self.base_power + self.equipment_bonus()[0]
 
     @property
     def max_hp(self):
-        bonus = sum(equipment.max_hp_bonus for equipment in self.get_equipped_items())
-        return self.base_max_hp + bonus
+        return self.base_max_hp + self.equipment_bonus()[2]
+
+    def equipment_bonus(self):
+        """Bonuses summed over the equipped items, computed again only after the equipment changes.
+        The base stats are read on every access, so leveling up needs no invalidation"""
+        if self._bonus is None:
+            items = self.equipment.values()
+            self._bonus = (
+                sum(item.power_bonus for item in items),
+                sum(item.defense_bonus for item in items),
+                sum(item.max_hp_bonus for item in items)
+            )
+        return self._bonus
 
     def get_equipped_items(self, slot=None):
-        if self.owner and "player" in self.owner.tags:
-            items = [item for item in self.owner.get_inventory() if type(item) == Equipment and item.is_equipped]
-            if slot:
-                items = [item for item in items if item.slot == slot]
-            return items
-        else:
-            return []  # other objects have no equipment
+        if slot:
+            item = self.equipment.get(slot)
+            return [item] if item is not None else []
+        return list(self.equipment.values())
+
+    def get_equipped_in_slot(self, slot):
+        return self.equipment.get(slot)
+
+    def equip_item(self, item):
+        """Puts the item on its slot and returns the one it replaced, if any"""
+        previous = self.equipment.get(item.slot)
+        self.equipment[item.slot] = item
+        self._bonus = None
+        return previous
+
+    def dequip_item(self, item):
+        if self.equipment.get(item.slot) is item:
+            del self.equipment[item.slot]
+            self._bonus = None
+
+    def rebuild_equipment(self, items):
+        """Fills the slot table from the equipped items of an inventory, ex.: after loading a game"""
+        self.equipment = {item.slot: item for item in items if isinstance(item, Equipment) and item.is_equipped}
+        self._bonus = None
+
+    def clone(self):
+        fighter = copy.copy(self)
+        fighter.equipment = {}
+        fighter._bonus = None
+        return fighter
 
     def gain_xp(self, amount):
         send_message("{name} gained {amount} xp".format(name=self.owner.name, amount=amount), color=Colors.cyan)
@@ -405,18 +492,26 @@ class Fighter(object):
     def _automatic_level_up_hp(self):
         self.base_max_hp = int(self.starting_max_hp * 20 * self.level)
 
-    def automatic_level_up(self):
+    def automatic_level_up(self, rng=random):
         choices = [self._automatic_level_up_defense,
                    self._automatic_level_up_power,
                    self._automatic_level_up_hp]
-        random_attribute = random.choice(choices)
+        random_attribute = rng.choice(choices)
         random_attribute()
+        self._touch()
+
+    def _touch(self):
+        # the object pool does not see the stats change, tell it the owner did
+        owner = getattr(self, 'owner', None)
+        if owner is not None and owner.object_pool is not None:
+            owner.object_pool.touch(owner)
 
     def heal(self, amount):
         # heal by the given amount, without going over the maximum
         self.hp += amount
         if self.hp > self.max_hp:
             self.hp = self.max_hp
+        self._touch()
 
     def heal_percent(self, amount_percent):
         """Heal the character in a percent from 0 to 1"""
@@ -424,11 +519,13 @@ class Fighter(object):
         self.hp += amount
         if self.hp > self.max_hp:
             self.hp = self.max_hp
+        self._touch()
 
     def take_damage(self, damage):
         # apply damage if possible
         if damage > 0:
             self.hp -= damage
+            self._touch()
         # check for death. if there's a death function, call it
         if self.hp <= 0:
             self.hp = 0
@@ -466,8 +563,7 @@ class Fighter(object):
         death_function = None
 
         if "death_function" in values.keys():
-            if values["death_function"] in [a for a in dir(DeathMethods) if "__" not in a]:
-                death_function = eval("DeathMethods." + values["death_function"])
+            death_function = death_methods.get(values["death_function"])
 
         return Fighter(
             hp=values["hp"],
@@ -493,11 +589,13 @@ class Character(GameObject):
                  tags=list(),
                  game_state=None,
                  inventory=None,
-                 z_index=1
+                 z_index=1,
+                 speed=NORMAL_SPEED
                  ):
         super(Character, self).__init__(coord=coord, char=char, color=color, name=name, blocks=blocks, _id=_id, tags=tags, z_index=z_index)
 
         self.torch = torch
+        self.speed = speed
         self.collision_handler = collision_handler
         self.game_state = game_state
         self.fighter = copy.copy(fighter)
@@ -516,6 +614,19 @@ class Character(GameObject):
     def __str__(self):
         return repr(self)
 
+    def clone(self):
+        obj = super(Character, self).clone()
+        # the components hold the state of each character, so they can't be shared with the prototype
+        obj.fighter = self.fighter.clone() if self.fighter else None
+        if obj.fighter:
+            obj.fighter.owner = obj
+        obj.ai = copy.copy(self.ai)
+        if obj.ai:
+            obj.ai.owner = obj
+        if self.inventory is not None:
+            obj.inventory = list()
+        return obj
+
     def __repr__(self):
         return "Character {name} _id={_id} coord={coord} char={char} color={color}".format(
             name=self.name, _id=self._id, coord=self.coord, char=self.char, color=self.color
@@ -563,9 +674,20 @@ class Character(GameObject):
         return fov_recompute
 
     def move_towards(self, target: Vector2):
-        result = PathFinding.breadth_first_search(self.collision_handler.map, self.coord.as_tuple(), target.as_tuple())
-        print(result)
-        coord = Vector2(*result[1])
+        flow_field = self.collision_handler.map.get_flow_field()
+
+        if flow_field.targets(target):
+            # everyone chasing the same target reads the shared distance map
+            step = flow_field.next_step(self.coord, self.collision_handler.is_blocked)
+            if step is None:
+                return
+        else:
+            result = PathFinding.a_star_search(self.collision_handler.map, self.coord, target)
+            if len(result) < 2:
+                return
+            step = result[1]
+
+        coord = Vector2(*step)
 
         self.move(coord-self.coord)
 
@@ -584,10 +706,7 @@ class Character(GameObject):
         if values["fighter"]:
             fighter = Fighter.load(hard_values=values["fighter"])
 
-        if values["color"] in [a for a in dir(Colors) if "__" not in a]:
-            color = eval("Colors." + values["color"])
-        else:
-            color = Colors.white
+        color = palette.get(values["color"], Colors.white)
 
         ai = None
         if "ai" in values.keys():
@@ -597,6 +716,10 @@ class Character(GameObject):
         if "torch" in values.keys():
             torch = values["torch"]
 
+        speed = NORMAL_SPEED
+        if "speed" in values.keys():
+            speed = values["speed"]
+
         if "blocks" not in values.keys():
             values["blocks"] = True
 
@@ -615,7 +738,8 @@ class Character(GameObject):
             torch=torch,
             tags=values["tags"],
             game_state=game_state,
-            inventory=inventory
+            inventory=inventory,
+            speed=speed
         )
 
 
@@ -675,6 +799,13 @@ class Item(GameObject):
     def get_name(self):
         return self.name
 
+    def clone(self):
+        obj = super(Item, self).clone()
+        obj.player = None
+        if self.extra_params:
+            obj.extra_params = dict(self.extra_params)
+        return obj
+
     @staticmethod
     def load(yaml_file=None, hard_values=None, coord=Vector2.zero(), collision_handler=None):
         if yaml_file:
@@ -686,12 +817,10 @@ class Item(GameObject):
         else:
             values = hard_values
 
-        color = Colors.white
-        if values["color"] in [a for a in dir(Colors) if "__" not in a]:
-            color = eval("Colors." + values["color"])
+        color = palette.get(values["color"], Colors.white)
 
-        if values["use_function"] in [a for a in dir(UseFunctions) if "__" not in a]:
-            use_function = eval("UseFunctions." + values["use_function"])
+        if values["use_function"] in use_functions:
+            use_function = use_functions[values["use_function"]]
         else:
             logger.error("Could not find use_function {}".format(values["use_function"]))
             use_function = UseFunctions.do_nothing
@@ -699,9 +828,7 @@ class Item(GameObject):
         if "blocks" not in values.keys():
             values["blocks"] = False
 
-        if "extra_params" in values.keys() and "status_effect" in values["extra_params"].keys():
-            if values["extra_params"]["status_effect"] in [a for a in dir(StatusEffects) if "__" not in a]:
-                values["extra_params"]["status_effect"] = eval("StatusEffects." +  values["extra_params"]["status_effect"])
+        values["extra_params"] = resolve_status_effect(values["extra_params"])
 
         return Item(
             coord=coord,
@@ -761,15 +888,18 @@ class Equipment(Item):
             self.equip()
 
     def equip(self):
-        equipment = self.player.fighter.get_equipped_items(self.slot)
-        if equipment:
-            equipment[0].dequip()
+        previous = self.player.fighter.get_equipped_in_slot(self.slot)
+        if previous is not None:
+            previous.dequip()
+        self.player.fighter.equip_item(self)
         self.is_equipped = True
         send_message('Equipped ' + self.name + ' on ' + self.slot.value + '.', color=Colors.light_green)
 
     def dequip(self):
         if self.is_equipped:
             self.is_equipped = False
+            if self.player and self.player.fighter:
+                self.player.fighter.dequip_item(self)
             send_message('Dequipped ' + self.name + ' from ' + self.slot.name + '.', color=Colors.light_yellow)
 
     def pick_up(self, player):
@@ -781,14 +911,20 @@ class Equipment(Item):
                 player.get_inventory().append(self)
                 self.player = player
                 send_message('You picked up a ' + self.name + '!', Colors.green)
-                if not self.player.fighter.get_equipped_items(self.slot):
+                if self.player.fighter.get_equipped_in_slot(self.slot) is None:
                     self.equip()
                 return True
         return False
 
     def drop(self):
-        super(Equipment, self).drop()
+        # dequip while the item still knows its player, drop forgets it
         self.dequip()
+        super(Equipment, self).drop()
+
+    def clone(self):
+        obj = super(Equipment, self).clone()
+        obj.is_equipped = False
+        return obj
 
     def get_name(self):
         full_name = "{}".format(self.name)
@@ -825,15 +961,13 @@ class Equipment(Item):
         else:
             values = hard_values
 
-        color = Colors.white
-        if "color" in values.keys()and values["color"] in [a for a in dir(Colors) if "__" not in a]:
-            color = eval("Colors." + values["color"])
+        color = palette.get(values.get("color"), Colors.white)
 
         if "use_function" not in values.keys():
             use_function = None
         else:
-            if values["use_function"] in [a for a in dir(UseFunctions) if "__" not in a]:
-                use_function = eval("UseFunctions." + values["use_function"])
+            if values["use_function"] in use_functions:
+                use_function = use_functions[values["use_function"]]
             else:
                 logger.error("Could not find use_function {}".format(values["use_function"]))
                 use_function = UseFunctions.do_nothing
@@ -849,9 +983,7 @@ class Equipment(Item):
         max_hp = values["max_hp"] if "max_hp" in values.keys() else 0
 
         if "extra_params" in values.keys():
-            if "status_effect" in values["extra_params"].keys():
-                if values["extra_params"]["status_effect"] in [a for a in dir(StatusEffects) if "__" not in a]:
-                    values["extra_params"]["status_effect"] = eval("StatusEffects." + values["extra_params"]["status_effect"])
+            values["extra_params"] = resolve_status_effect(values["extra_params"])
         else:
             values["extra_params"] = None
 
@@ -870,3 +1002,7 @@ class Equipment(Item):
             defense_bonus=defense,
             max_hp_bonus=max_hp
         )
+
+
+object_types = Registry({cls.__name__: cls for cls in (GameObject, Character, Item, Equipment)})
+ai_types = Registry({cls.__name__: cls for cls in (BasicMonsterAI, ConfusedMonsterAI, FrozenMonsterAI)})
@@ -1,41 +1,30 @@
 import math
 import numbers
+from collections import namedtuple
 
-class Vector2(object):
-    def __init__(self, X=0.0, Y=0.0):
-        self.X = X
-        self.Y = Y
+class Vector2(namedtuple('Vector2', 'X Y')):
+    """Immutable 2D vector. It is a tuple underneath, so it hashes and compares like (X, Y)
+    and can be used straight away as a dict or set key"""
+    __slots__ = ()
+
+    def __new__(cls, X=0.0, Y=0.0):
+        return _new(cls, (X, Y))
 
     def __add__(self, other):
-        if isinstance(other, Vector2):
-            new_vec = Vector2()
-            new_vec.X = self.X + other.X
-            new_vec.Y = self.Y + other.Y
-            return new_vec
-        else:
-            raise TypeError("other must be of type Vector2")
+        return _new(Vector2, (self[0] + other[0], self[1] + other[1]))
 
     def __radd__(self, other):
         return self.__add__(other)
 
     def __sub__(self, other):
-        if isinstance(other, Vector2):
-            new_vec = Vector2()
-            new_vec.X = self.X - other.X
-            new_vec.Y = self.Y - other.Y
-            return new_vec
-        else:
-            raise TypeError("other must be of type Vector2")
+        return _new(Vector2, (self[0] - other[0], self[1] - other[1]))
 
     def __rsub__(self, other):
-        return self.__sub__(other)
+        return _new(Vector2, (other[0] - self[0], other[1] - self[1]))
 
     def __mul__(self, value):
         if isinstance(value, numbers.Number):
-            new_vec = self.copy()
-            new_vec.X = new_vec.X * value
-            new_vec.Y = new_vec.Y * value
-            return new_vec
+            return _new(Vector2, (self[0] * value, self[1] * value))
         else:
             raise TypeError("value must be a number.")
 
@@ -45,10 +34,7 @@ class Vector2(object):
     def __truediv__(self, value):
         if isinstance(value, numbers.Number):
             if value:
-                new_vec = self.copy()
-                new_vec.X /= value
-                new_vec.Y /= value
-                return new_vec
+                return _new(Vector2, (self[0] / value, self[1] / value))
             else:
                 raise ZeroDivisionError("Cannot divide by zero.")
         else:
@@ -57,10 +43,7 @@ class Vector2(object):
     def __floordiv__(self, value):
         if isinstance(value, numbers.Number):
             if value:
-                new_vec = self.copy()
-                new_vec.X = new_vec.X // value
-                new_vec.Y = new_vec.Y // value
-                return new_vec
+                return _new(Vector2, (self[0] // value, self[1] // value))
             else:
                 raise ZeroDivisionError("Cannot divide by zero.")
         else:
@@ -73,65 +56,34 @@ class Vector2(object):
         return self.__floordiv__(value)
 
     def __abs__(self):
-        return Vector2(abs(self.X), abs(self.Y))
-
-    def __eq__(self, other):
-        """Check to see if two Vector2 objects are equal"""
-        if isinstance(other, Vector2):
-            if self.X == other.X and self.Y == other.Y:
-                return True
-        else:
-            raise TypeError("other must be of type Vector2")
-
-        return False
+        return _new(Vector2, (abs(self[0]), abs(self[1])))
 
     def __neg__(self):
-        return Vector2(-self.X, -self.Y)
+        return _new(Vector2, (-self[0], -self[1]))
 
-    def __getitem__(self, index):
-        if index > 1:
-            raise IndexError("Index must be less than 2")
-
-        if index == 0:
-            return self.X
-        else:
-            return self.Y
-
-    def __setitem__(self, index, value):
-        if index > 1:
-            raise IndexError("Index must be less than 2")
-
-        if index == 0:
-            self.X = value
-        else:
-            self.Y = value
+    def __repr__(self):
+        return "(X=" + str(self[0]) + " Y=" + str(self[1])+")"
 
     def __str__(self):
-        return "(X=" + str(self.X) + " Y=" + str(self.Y)+")"
-
-    def __len__(self):
-        return 2
+        return repr(self)
 
     def as_tuple(self):
-        return (self.X, self.Y)
+        return (self[0], self[1])
 
     # Define our properties
     @staticmethod
     def zero():
         """Returns a Vector2 with all attributes set to 0"""
-        return Vector2(0, 0)
+        return ZERO
 
     @staticmethod
     def one():
         """Returns a Vector2 with all attribures set to 1"""
-        return Vector2(1, 1)
+        return ONE
 
     def copy(self):
-        """Create a copy of this Vector"""
-        new_vec = Vector2()
-        new_vec.X = self.X
-        new_vec.Y = self.Y
-        return new_vec
+        """Vectors are immutable, the copy is the vector itself"""
+        return self
 
     def length(self):
         """Gets the length of this Vector"""
@@ -147,9 +99,7 @@ class Vector2(object):
 
     def normalize_copy(self):
         """Create a copy of this Vector, normalize it, and return it."""
-        vec = self.copy()
-        vec.normalize()
-        return vec
+        return self.normalize()
 
     @staticmethod
     def distance(vec1, vec2):
@@ -199,26 +149,32 @@ class Vector2(object):
     @staticmethod
     def from_polar(degrees, magnitude):
         """Convert polar coordinates to Carteasian Coordinates"""
-        vec = Vector2()
-        vec.X = math.cos(math.radians(degrees)) * magnitude
-
         # Negate because y in screen coordinates points down, oppisite from what is
         # expected in traditional mathematics.
-        vec.Y = -math.sin(math.radians(degrees)) * magnitude
-        return vec
+        return Vector2(math.cos(math.radians(degrees)) * magnitude, -math.sin(math.radians(degrees)) * magnitude)
 
     @staticmethod
     def component_mul(vec1, vec2):
         """Multiply the components of the vectors and return the result."""
-        new_vec = Vector2()
-        new_vec.X = vec1.X * vec2.X
-        new_vec.Y = vec1.Y * vec2.Y
-        return new_vec
+        return Vector2(vec1.X * vec2.X, vec1.Y * vec2.Y)
 
     @staticmethod
     def component_div(vec1, vec2):
         """Divide the components of the vectors and return the result."""
-        new_vec = Vector2()
-        new_vec.X = vec1.X / vec2.X
-        new_vec.Y = vec1.Y / vec2.Y
-        return new_vec
\ No newline at end of file
+        return Vector2(vec1.X / vec2.X, vec1.Y / vec2.Y)
+
+
+_new = tuple.__new__
+
+# interned vectors, the eight steps of a move plus the null ones
+ZERO = Vector2(0, 0)
+ONE = Vector2(1, 1)
+UP = Vector2(0, -1)
+DOWN = Vector2(0, 1)
+LEFT = Vector2(-1, 0)
+RIGHT = Vector2(1, 0)
+UP_LEFT = Vector2(-1, -1)
+UP_RIGHT = Vector2(1, -1)
+DOWN_LEFT = Vector2(-1, 1)
+DOWN_RIGHT = Vector2(1, 1)
+DIRECTIONS = (UP, DOWN, LEFT, RIGHT, UP_LEFT, UP_RIGHT, DOWN_LEFT, DOWN_RIGHT)
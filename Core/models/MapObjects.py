@@ -1,12 +1,15 @@
-from random import randint, uniform, choice
-import itertools
+import random
 import yaml
 import os
+import numpy as np
 from models import GameObjects
-from models.EnumStatus import MapTypes, Cardinals
+from models.EnumStatus import MapTypes, Cardinals, ETileType
 from models.GameObjects import DrawableObject
 from models.GenericObjects import Vector2
+from utils import Colors, PathFinding, Profiler, Sampling, WaveCollapse
+from utils.Registry import colors as palette
 import logging
+from collections import deque
 
 logger = logging.getLogger('Rogue-EVE')
 
@@ -32,37 +35,156 @@ class Tile(object):
     def __repr__(self):
         return f"<Tile blocked={self.blocked} x={self.x} y={self.y}>"
 
+
+class TileView(object):
+    """A thin Tile look-alike that reads and writes straight into the layers of a TileMap,
+    kept around so older callers that expect tile objects still work"""
+    __slots__ = ('tile_map', 'x', 'y')
+
+    def __init__(self, tile_map, x, y):
+        self.tile_map = tile_map
+        self.x = x
+        self.y = y
+
+    @property
+    def id(self):
+        return (self.x, self.y)
+
+    @property
+    def blocked(self):
+        return bool(self.tile_map.blocked[self.x, self.y])
+
+    @blocked.setter
+    def blocked(self, value):
+        self.tile_map.set_blocked(self.x, self.y, value)
+
+    @property
+    def block_sight(self):
+        return not self.tile_map.transparent[self.x, self.y]
+
+    @block_sight.setter
+    def block_sight(self, value):
+        self.tile_map.transparent[self.x, self.y] = not value
+
+    @property
+    def explored(self):
+        return bool(self.tile_map.explored[self.x, self.y])
+
+    @explored.setter
+    def explored(self, value):
+        self.tile_map.explored[self.x, self.y] = value
+
+    def __str__(self):
+        return repr(self)
+
+    def __repr__(self):
+        return f"<Tile blocked={self.blocked} x={self.x} y={self.y}>"
+
+
+class TileColumn(object):
+    """Column of tile views, so tile_map[x][y] keeps working for old callers"""
+    __slots__ = ('tile_map', 'x')
+
+    def __init__(self, tile_map, x):
+        self.tile_map = tile_map
+        self.x = x
+
+    def __getitem__(self, y):
+        return TileView(self.tile_map, self.x, y)
+
+    def __len__(self):
+        return self.tile_map.height
+
+
 class TileMap(DrawableObject):
-    def __init__(self, map, rooms, color_dark_wall, color_light_wall, color_dark_ground, color_light_ground, legacy_mode):
-        self.tile_map = map
+    """The map is kept as parallel numpy layers indexed by [x, y]: blocked, transparent, explored
+    and the tile type, instead of a grid of Tile objects"""
+    def __init__(self, blocked, rooms, color_dark_wall, color_light_wall, color_dark_ground, color_light_ground,
+                 legacy_mode, transparent=None, tile_type=None):
+        self.blocked = np.asarray(blocked, dtype=bool)
+        self.width, self.height = self.blocked.shape
+
+        if transparent is None:
+            # by default, if a tile is blocked, it also blocks sight
+            transparent = ~self.blocked
+        self.transparent = np.asarray(transparent, dtype=bool)
+
+        if tile_type is None:
+            tile_type = np.where(self.blocked, ETileType.WALL.value, ETileType.FLOOR.value)
+        self.tile_type = np.asarray(tile_type, dtype=np.uint8)
+
+        self.explored = np.zeros((self.width, self.height), dtype=bool)
         self.rooms = rooms
-        self.height = len(map[0])
-        self.width = len(map)
-        self.color_dark_wall = color_dark_wall
-        self.color_light_wall = color_light_wall
-        self.color_dark_ground = color_dark_ground
-        self.color_light_ground = color_light_ground
+        # palette index for each shade used by draw: unseen, dark ground/wall, light ground/wall
+        self.shade_colors = np.array([palette.index_of_rgb(color) for color in (
+            Colors.black, color_dark_ground, color_dark_wall, color_light_ground, color_light_wall)], dtype=np.uint16)
         self.legacy_mode = legacy_mode
-        self.visible_tiles = None
+        self.visible_tiles = np.zeros((self.width, self.height), dtype=bool)
+        self.layout_version = 0
+        self.flow_field = None
         logger.info("Tilemap created with {} rooms".format(len(self.rooms)))
 
+    @staticmethod
+    def from_tiles(tiles, rooms, color_dark_wall, color_light_wall, color_dark_ground, color_light_ground, legacy_mode):
+        """Builds the map out of an old style list of lists of Tile objects"""
+        blocked = np.array([[tile.blocked for tile in column] for column in tiles], dtype=bool)
+        transparent = np.array([[not tile.block_sight for tile in column] for column in tiles], dtype=bool)
+        tile_map = TileMap(blocked, rooms, color_dark_wall, color_light_wall, color_dark_ground, color_light_ground,
+                           legacy_mode, transparent=transparent)
+        tile_map.explored[:] = [[tile.explored for tile in column] for column in tiles]
+        return tile_map
+
+    def __getitem__(self, x):
+        return TileColumn(self, x)
+
+    def __len__(self):
+        return self.width
+
     def get_tile_by_id(self, id):
         x, y = id
-        return self.tile_map[x][y]
+        return TileView(self, x, y)
 
     def get_tile_id(self, x, y):
         return (x, y)
 
+    def set_blocked(self, x, y, blocked, block_sight=None):
+        """Changes the blocking layout of a tile, bumping the layout version so cached paths know about it"""
+        if block_sight is None:
+            block_sight = blocked
+        self.blocked[x, y] = blocked
+        self.transparent[x, y] = not block_sight
+        self.tile_type[x, y] = ETileType.WALL.value if blocked else ETileType.FLOOR.value
+        self.layout_version += 1
+
+    def get_flow_field(self):
+        """Distance map shared by every monster heading to the same target, see PathFinding.FlowField"""
+        if self.flow_field is None:
+            self.flow_field = PathFinding.FlowField(self)
+        return self.flow_field
+
     def set_visible_tiles(self, visible_tiles):
-        self.visible_tiles = visible_tiles
+        """Receives the boolean mask computed by the field of view, a set of coordinates is still accepted"""
+        if isinstance(visible_tiles, np.ndarray):
+            self.visible_tiles = visible_tiles
+            return
+
+        self.visible_tiles = np.zeros((self.width, self.height), dtype=bool)
+        if visible_tiles:
+            xs, ys = np.array(list(visible_tiles)).T
+            inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+            self.visible_tiles[xs[inside], ys[inside]] = True
+
+    def in_fov(self, x, y):
+        """True if the tile is inside the field of view last computed"""
+        return 0 <= x < self.width and 0 <= y < self.height and bool(self.visible_tiles[x, y])
 
     def in_bounds(self, id):
         (x, y) = id
         return 0 <= x < self.width and 0 <= y < self.height
 
     def passable(self, id):
-        tile = self.get_tile_by_id(id)
-        return not tile.blocked
+        x, y = id
+        return not self.blocked[x, y]
 
     def neighbors(self, id):
         (x, y) = id
@@ -85,7 +207,7 @@ class TileMap(DrawableObject):
         return self.height
 
     def get_map(self):
-        return self.tile_map
+        return self
 
     def get_visible_tiles(self):
         return self.visible_tiles
@@ -101,8 +223,7 @@ class TileMap(DrawableObject):
             .format(height=self.height, width=self.width, alt_print=self.legacy_mode)
 
     def totals(self):
-        total_tiles = list(itertools.chain(*self.tile_map))
-        total_explored = sum([tile.explored for tile in total_tiles])
+        total_explored = int(np.count_nonzero(self.explored))
         logger.debug("Total explored: {}".format(total_explored))
 
     def is_visible_tile(self, x=None, y=None):
@@ -110,77 +231,71 @@ class TileMap(DrawableObject):
             return False
         elif y >= self.height or y < 0:
             return False
-        elif self.tile_map[x][y].blocked:
-            return False
-        elif self.tile_map[x][y].block_sight:
-            return False
-        else:
-            return True
+        return bool(self.transparent[x, y] and not self.blocked[x, y])
 
     def draw(self, console, camera):
-        for x in range(camera.camera_width):
-            for y in range(camera.camera_height):
-                map_x, map_y = x + camera.camera_coord.X, y + camera.camera_coord.Y
-
-                visible = (map_x, map_y) in self.visible_tiles
-
-                wall = self.tile_map[map_x][map_y].block_sight
-                explored = self.tile_map[map_x][map_y].explored
-
-                if visible:
-                    self.tile_map[map_x][map_y].explored = True
-
-                bg_color = None
-                fg_color = None
-                char = None
-                if not visible:
-                    if explored:
-                        if wall:
-                            if not self.legacy_mode:
-                                bg_color = self.color_dark_wall
-                            else:
-                                fg_color = self.color_dark_wall
-                                char = '#'
-
-                        else:
-                            if not self.legacy_mode:
-                                bg_color = self.color_dark_ground
-                            else:
-                                fg_color = self.color_dark_ground
-                                char = '.'
-                elif visible:
-                    if wall:
-                        if not self.legacy_mode:
-                            bg_color = self.color_light_wall
-                        else:
-                            fg_color = self.color_light_wall
-                            char = '#'
+        x0, y0 = camera.camera_coord.X, camera.camera_coord.Y
+        view = np.s_[x0:x0 + camera.camera_width, y0:y0 + camera.camera_height]
 
-                    else:
-                        if not self.legacy_mode:
-                            bg_color = self.color_light_ground
-                        else:
-                            fg_color = self.color_light_ground
-                            char = '.'
+        visible = self.visible_tiles[view]
+        explored = self.explored[view]
+        wall = ~self.transparent[view]
+
+        # palette index per cell: 0 unseen, 1/2 dark ground/wall, 3/4 light ground/wall
+        shade = np.where(visible, 3, np.where(explored, 1, 0)).astype(np.uint8)
+        shade += wall & (visible | explored)
+
+        self.explored[view] |= visible
 
-                console.draw_char(x, y, char, fg=fg_color, bg=bg_color)
+        palette = self._palette()
+
+        # push the viewport row by row as runs of cells sharing the same look
+        rows = shade.T
+        change = np.ones(rows.shape, dtype=bool)
+        change[:, 1:] = rows[:, 1:] != rows[:, :-1]
+        starts = np.flatnonzero(change)
+        lengths = np.diff(np.append(starts, rows.size))
+        row_width = rows.shape[1]
+
+        for start, length, index in zip(starts.tolist(), lengths.tolist(), rows.ravel()[starts].tolist()):
+            if index:
+                char, fg_color, bg_color = palette[index]
+                console.draw_rect(start % row_width, start // row_width, length, 1, char, fg=fg_color, bg=bg_color)
         self.totals()
 
+    def _palette(self):
+        """(char, fg, bg) for each shade index used by draw"""
+        colors = [palette.tuples[index] for index in self.shade_colors.tolist()]
+        if self.legacy_mode:
+            return [None] + [('#' if index % 2 == 0 else '.', colors[index], None) for index in range(1, 5)]
+        return [None] + [(None, None, colors[index]) for index in range(1, 5)]
+
 
 class MapConstructor(object):
-    def __init__(self, width, height, max_number_of_rooms):
+    # weight of solid rock against the weight of 1 of every tile piece, for the constraint strategy
+    CONSTRAINT_ROCK_WEIGHT = 1.0
+    # every try of the constraint strategy is a whole collapse, it never goes through more of them than this
+    CONSTRAINT_MAX_TRIES = 10
+
+    def __init__(self, width, height, max_number_of_rooms, rng=None):
         self.width = width
         self.height = height
-        self.color_dark_wall = (0, 0, 100)
-        self.color_light_wall = (130, 110, 50)
-        self.color_dark_ground = (50, 50, 150)
-        self.color_light_ground = (200, 180, 50)
+        self.color_dark_wall = Colors.dungeon_dark_wall
+        self.color_light_wall = Colors.dungeon_light_wall
+        self.color_dark_ground = Colors.dungeon_dark_ground
+        self.color_light_ground = Colors.dungeon_light_ground
         self.rooms= []
         self.room_max_size = 10
         self.room_min_size = 6
         self.max_rooms = max_number_of_rooms
         self.tile_set = []
         self.starting_tile = None
+        # a seeded random.Random makes the same map every time
+        self.rng = rng or random
+        # placement attempts the last make_random_map went through, out of its maximum_number_of_tries
+        self.tries_used = 0
+        # names of the tile templates the constraint strategy could not cut in pieces of its cells
+        self.skipped_templates = []
 
     def set_width(self, width):
         self.width = width
@@ -213,23 +328,24 @@ class MapConstructor(object):
 
     def _create_random_room(self):
         # random width and height
-        w = randint(self.room_min_size, self.room_max_size)
-        h = randint(self.room_min_size, self.room_max_size)
+        w = self.rng.randint(self.room_min_size, self.room_max_size)
+        h = self.rng.randint(self.room_min_size, self.room_max_size)
         # random position without going out of the boundaries of the map
-        x = randint(0, self.width - w - 1)
-        y = randint(0, self.height - h - 1)
+        x = self.rng.randint(0, self.width - w - 1)
+        y = self.rng.randint(0, self.height - h - 1)
         # "Rect" class makes rectangles easier to work with
         return Rect(x, y, w, h)
 
+    @Profiler.timed('mapgen')
     def make_random_map(self, strategy: str="random", maximum_number_of_tries=100, legacy_mode=False):
         if strategy is MapTypes.RANDOM:
             return self._random_strategy(maximum_number_of_tries, legacy_mode)
         elif strategy is MapTypes.CONSTRAINT:
-            raise NotImplementedError("Only the default random method is implemented by now")
+            return self._constraint_strategy(maximum_number_of_tries, legacy_mode)
         elif strategy is MapTypes.CONSTRUCTIVE1:
             return self._constructive_strategy(strategy, maximum_number_of_tries, legacy_mode)
         elif strategy is MapTypes.CONSTRUCTIVE2:
-            raise NotImplementedError("Only the default random method is implemented by now")
+            return self._bsp_strategy(legacy_mode)
         elif strategy is MapTypes.CONSTRUCTIVE3:
             raise NotImplementedError("Only the default random method is implemented by now")
         else:
@@ -241,7 +357,7 @@ class MapConstructor(object):
         return self
 
     def add_tile_template_folder(self, folder):
-        for file in os.listdir(folder):
+        for file in sorted(os.listdir(folder)):
             self.tile_set.append(os.path.join(folder, file))
         return self
 
@@ -250,99 +366,257 @@ class MapConstructor(object):
         return self
 
     def _constructive_strategy(self, strategy, maximum_number_of_tries, legacy_mode):
-
-        def room_has_no_intersections(_room):
-            for r in self.rooms:
-                if _room.intersect(r) or _room.x2 >= self.width and _room.y2 >= self.height:
-                        return False
-            return True
-
-        def try_to_attach_room(new_room_tile):
-            for attachment in [att for att in room_attachments if att.attached is None]:
-                for new_room_attachment in new_room_tile.attachments:
-                    if attachment.can_attach(new_room_attachment):
-                        x = attachment.x
-                        y = attachment.y
-                        if attachment.cardinal == Cardinals.SOUTH:
-                            x = x - new_room_attachment.x - 1
-                            y = y
-                        if attachment.cardinal == Cardinals.NORTH:
-                            y = y - new_room.get_height()-1
-                            x = x - new_room_attachment.x - 1
-                        if attachment.cardinal == Cardinals.EAST:
-                            y = y - new_room_attachment.y - 1
-                            x = x
-                        if attachment.cardinal == Cardinals.WEST:
-                            x = x - new_room.get_width() - 1
-                            y = y - new_room_attachment.y - 1
-                        h, w = y + new_room.get_height(), x + new_room.get_width()
-                        if x >= 0 and y >= 0 and h < self.height and w < self.width:
-                            new_room_tile.setting_new_position(x, y)
-                            if room_has_no_intersections(new_room_tile):
-                                attachment.attach(new_room_attachment)
-                                return True
-            return False
-
-        room_attachments = []
+        """Grows the map from the starting room, attaching a random tile template to the open attachments of
+        the rooms already placed on every try. The cells taken by the rooms are kept on an occupancy bitmap,
+        so testing a position costs the area of the new room and not the number of rooms, and only the open
+        attachments facing one of the new room are tried. After too many failures in a row the last room is
+        taken out again, and the one before it gets its chance with other templates"""
+        occupied = np.zeros((self.width, self.height), dtype=bool)
+        frontier = AttachmentFrontier(occupied)
+        # room, attachment it was attached to, attachments it opened and attachments it covered, for each room
+        placed = []
         failure = 0
-        # if strategy == MapTypes.CONSTRUCTIVE1:
-        #     maximum_number_of_tries = 50
-        # if strategy == MapTypes.CONSTRUCTIVE2:
-        #     maximum_number_of_tries = 75
-        # if strategy == MapTypes.CONSTRUCTIVE3:
-        #     maximum_number_of_tries = 150
 
+        def try_to_attach_room(new_room):
+            width, height = new_room.get_width(), new_room.get_height()
+            facing = {}
+            for index, new_room_attachment in enumerate(new_room.attachments):
+                facing.setdefault(OPPOSITE_CARDINALS[new_room_attachment.cardinal], []).append(
+                    (index, new_room_attachment))
+
+            for attachment in frontier.facing(facing.keys()):
+                for index, new_room_attachment in facing[attachment.cardinal]:
+                    x = attachment.x
+                    y = attachment.y
+                    if attachment.cardinal == Cardinals.SOUTH:
+                        x = x - new_room_attachment.x - 1
+                    if attachment.cardinal == Cardinals.NORTH:
+                        y = y - height - 1
+                        x = x - new_room_attachment.x - 1
+                    if attachment.cardinal == Cardinals.EAST:
+                        y = y - new_room_attachment.y - 1
+                    if attachment.cardinal == Cardinals.WEST:
+                        x = x - width - 1
+                        y = y - new_room_attachment.y - 1
+                    if x >= 0 and y >= 0 and y + height < self.height and x + width < self.width \
+                            and not occupied[x:x + width, y:y + height].any():
+                        new_room.setting_new_position(x, y)
+                        return attachment, index
+            return None
+
+        def place(new_room, parent=None, index=None):
+            occupied[new_room.x1:new_room.x2, new_room.y1:new_room.y2] = True
+            self.rooms.append(new_room)
+            attachments = new_room.get_attachments()
+            if parent is not None:
+                frontier.close(parent)
+                parent.attach(attachments[index])
+            covered = frontier.cover(new_room)
+            opened = [attachment for attachment in attachments
+                      if attachment.attached is None and frontier.open(attachment)]
+            placed.append((new_room, parent, opened, covered))
+
+        def backtrack():
+            room, parent, opened, covered = placed.pop()
+            self.rooms.pop()
+            occupied[room.x1:room.x2, room.y1:room.y2] = False
+            for attachment in opened:
+                frontier.close(attachment)
+            for attachment in covered:
+                frontier.open(attachment)
+            if parent is not None:
+                parent.attached.detach()
+                parent.detach()
+                frontier.open(parent)
+
+        self.tries_used = 0
         for n in range(maximum_number_of_tries):
             if len(self.rooms) >= self.max_rooms:
                 break
+            self.tries_used += 1
 
             if not self.rooms:
                 new_room = Room.load(self.starting_tile)
-                x = randint(self.width // 2, self.width - new_room.get_width() - 1)
-                y = randint(self.height // 2, self.height - new_room.get_height() - 1)
+                x = self.rng.randint(self.width // 2, self.width - new_room.get_width() - 1)
+                y = self.rng.randint(self.height // 2, self.height - new_room.get_height() - 1)
                 new_room.setting_new_position(x, y)
-                room_attachments = new_room.get_attachments()
-                self.rooms.append(new_room)
+                place(new_room)
             else:
-                new_room = Room.load(choice(self.tile_set))
-
-                if try_to_attach_room(new_room):
-                    self.rooms.append(new_room)
-                    new_attachments = new_room.get_attachments()
-                    room_attachments.extend(new_attachments)
+                new_room = Room.load(self.rng.choice(self.tile_set))
+                attached = try_to_attach_room(new_room)
+                if attached is not None:
+                    place(new_room, *attached)
                     failure = 0
                 else:
                     failure += 1
-            if failure > 100 and len(self.rooms) <= 3:
-                self.rooms = []
+            if failure > 100:
+                # stuck, the last room goes away; the starting room too, when it is the only one left
+                backtrack()
+                failure = 0
 
         # Here we can start to "paint" the map
-        my_map = [[Tile(True, x, y)
-                   for y in range(self.height)]
-                  for x in range(self.width)]
+        blocked = np.ones((self.width, self.height), dtype=bool)
 
         # build rooms
         for idx, room in enumerate(self.rooms):
-            internals = room.get_internals()
-            for n, x in enumerate(range(room.x1, room.x2)):
-                for m, y in enumerate(range(room.y1, room.y2)):
-                    try:
-                        if internals[m][n] == "#":
-                            my_map[x][y].blocked = True
-                            my_map[x][y].block_sight = True
-                        else:
-                            my_map[x][y].blocked = False
-                            my_map[x][y].block_sight = False
-                    except IndexError as e:
-                        logger.error("Index error X={} Y={} M={} N={}".format(x,y,m,n))
+            # internals are indexed [y, x] as the rows of the template, the map is indexed [x, y]
+            blocked[room.x1:room.x2, room.y1:room.y2] = (room.get_internals() == TileTemplate.WALL).T
+
+        return TileMap(
+            blocked, self.rooms, self.color_dark_wall, self.color_light_wall,
+            self.color_dark_ground, self.color_light_ground, legacy_mode
+        )
+
+    def _tile_pieces(self, cell_width, cell_height):
+        """Cuts the tile templates and their quarter turns in pieces of one cell of the constraint grid, the
+        starting template first.
+        Returns the templates, the (template, px, py) of every piece and the sockets of its sides, in the
+        order of the Cardinals. A side on the border of its template has the offsets of its attachments along
+        the side as socket, none when it has no attachment, and a side inside the template has a seam that
+        only the piece on the other side of it has"""
+        templates = [tile_templates.get(self.starting_tile)]
+        seen = set()
+        for path in [self.starting_tile] + self.tile_set:
+            template = tile_templates.get(path)
+            if template.width % cell_width or template.height % cell_height:
+                self.skipped_templates.append(template.name)
+                logger.warning("Tile template {} does not fit the {}x{} cells of the constraint strategy".format(
+                    template.name, cell_width, cell_height))
+                continue
+            # every quarter turn of the template is a module of its own, the templates do not have rooms with
+            # doors on every pair of sides and the collapse would run into cells no module fits far more often
+            for turns in range(4):
+                turned = template.rotated(turns) if turns else template
+                if turned.width % cell_width or turned.height % cell_height:
+                    continue
+                key = (turned.internals.shape, turned.internals.tobytes())
+                if key not in seen:
+                    seen.add(key)
+                    if turned is not templates[0]:
+                        templates.append(turned)
+
+        def doors(template, cardinal, px, py):
+            return tuple(sorted(x - px * cell_width if cardinal in (Cardinals.NORTH, Cardinals.SOUTH)
+                                else y - py * cell_height for x, y, side in template.attachments
+                                if side == cardinal and x // cell_width == px and y // cell_height == py))
+
+        pieces, sockets = [], []
+        for index, template in enumerate(templates):
+            columns, rows = template.width // cell_width, template.height // cell_height
+            for px in range(columns):
+                for py in range(rows):
+                    pieces.append((index, px, py))
+                    sockets.append((
+                        doors(template, Cardinals.NORTH, px, py) if py == 0 else ('seam', index, px, py, 'v'),
+                        doors(template, Cardinals.SOUTH, px, py) if py == rows - 1 else
+                        ('seam', index, px, py + 1, 'v'),
+                        doors(template, Cardinals.EAST, px, py) if px == columns - 1 else
+                        ('seam', index, px + 1, py, 'h'),
+                        doors(template, Cardinals.WEST, px, py) if px == 0 else ('seam', index, px, py, 'h')))
+        return templates, pieces, sockets
+
+    def _constraint_strategy(self, maximum_number_of_tries, legacy_mode):
+        """Fills the map with a wave function collapse over a grid of cells the size of the starting template.
+        The modules are the pieces of the tile templates plus solid rock, and the rules are learnt from the
+        templates: two sides can touch when both have attachments at the same offsets or both have none, so
+        every door meets a door. The starting template is set on a random cell first and the rooms are the
+        ones connected to it, nearest first, up to the maximum of rooms. Every try is a whole collapse, ended
+        early by a contradiction, and the try with the most rooms is kept. There are at most
+        CONSTRAINT_MAX_TRIES of them, whatever maximum_number_of_tries is"""
+        starting = tile_templates.get(self.starting_tile)
+        cell_width, cell_height = starting.width, starting.height
+        templates, pieces, sockets = self._tile_pieces(cell_width, cell_height)
+        # solid rock, closed on every side
+        pieces.append(None)
+        sockets.append(((), (), (), ()))
+        weights = [1.0] * (len(pieces) - 1) + [self.CONSTRAINT_ROCK_WEIGHT]
+
+        opposite = [Cardinals.SOUTH, Cardinals.NORTH, Cardinals.WEST, Cardinals.EAST]
+        rules = np.array([[[sockets[a][direction] == sockets[b][opposite[direction].value]
+                            for b in range(len(pieces))] for a in range(len(pieces))] for direction in range(4)])
+        # the grid leaves a frame of rock around the map, nothing opens towards it
+        columns, rows = (self.width - 2) // cell_width, (self.height - 2) // cell_height
+        closed = [np.array([side[direction] == () for side in sockets]) for direction in range(4)]
+
+        start_columns, start_rows = starting.width // cell_width, starting.height // cell_height
+        best = []
+        self.tries_used = 0
+        solver = WaveCollapse.WaveFunctionCollapse(rules, weights, columns, rows, self.rng)
+        for _ in range(min(maximum_number_of_tries, self.CONSTRAINT_MAX_TRIES)):
+            self.tries_used += 1
+            solver.reset()
+            solver.restrict(0, 0, columns, 1, closed[Cardinals.NORTH.value])
+            solver.restrict(0, rows - 1, columns, rows, closed[Cardinals.SOUTH.value])
+            solver.restrict(columns - 1, 0, columns, rows, closed[Cardinals.EAST.value])
+            solver.restrict(0, 0, 1, rows, closed[Cardinals.WEST.value])
+            sx = self.rng.randint(0, columns - start_columns)
+            sy = self.rng.randint(0, rows - start_rows)
+            for module, piece in enumerate(pieces[:start_columns * start_rows]):
+                only = np.zeros(len(pieces), dtype=bool)
+                only[module] = True
+                solver.restrict(sx + piece[1], sy + piece[2], sx + piece[1] + 1, sy + piece[2] + 1, only)
+
+            grid = solver.run()
+            if grid is None:
+                continue
+            rooms = self._connected_rooms(grid, (sx, sy), templates, pieces, sockets, cell_width, cell_height)
+            if len(rooms) > len(best):
+                best = rooms
+            if len(best) >= self.max_rooms:
+                break
+
+        if not best:
+            logger.warning("<MapConstructor error=\"The constraint strategy found no map in {} tries\">".format(
+                self.tries_used))
+            best = [starting.instantiate(1 + self.rng.randint(0, columns - start_columns) * cell_width,
+                                         1 + self.rng.randint(0, rows - start_rows) * cell_height)]
+        self.rooms = best
+
+        blocked = np.ones((self.width, self.height), dtype=bool)
+        for room in self.rooms:
+            blocked[room.x1:room.x2, room.y1:room.y2] = (room.get_internals() == TileTemplate.WALL).T
 
         return TileMap(
-            my_map, self.rooms, self.color_dark_wall, self.color_light_wall,
+            blocked, self.rooms, self.color_dark_wall, self.color_light_wall,
             self.color_dark_ground, self.color_light_ground, legacy_mode
         )
 
+    def _connected_rooms(self, grid, start, templates, pieces, sockets, cell_width, cell_height):
+        """The rooms of the collapsed grid that can be reached from the starting one through their doors,
+        in the order they are reached, at most max_rooms of them"""
+        columns, rows = grid.shape
+        # cell where the first piece of the template the cell belongs to is
+        origins = {}
+        for x in range(columns):
+            for y in range(rows):
+                piece = pieces[grid[x, y]]
+                if piece is not None:
+                    origins[(x, y)] = (x - piece[1], y - piece[2])
+
+        rooms = []
+        reached = {start}
+        queue = [start]
+        while queue and len(rooms) < self.max_rooms:
+            origin = queue.pop(0)
+            template = templates[pieces[grid[origin]][0]]
+            rooms.append(template.instantiate(1 + origin[0] * cell_width, 1 + origin[1] * cell_height))
+            for px in range(template.width // cell_width):
+                for py in range(template.height // cell_height):
+                    x, y = origin[0] + px, origin[1] + py
+                    for direction, (dx, dy) in enumerate(WaveCollapse.DIRECTIONS):
+                        side = sockets[grid[x, y]][direction]
+                        if not side or side[0] == 'seam':
+                            continue
+                        neighbour = origins.get((x + dx, y + dy))
+                        if neighbour is not None and neighbour not in reached:
+                            reached.add(neighbour)
+                            queue.append(neighbour)
+        return rooms
+
     def _random_strategy(self, maximum_number_of_tries, legacy_mode):
+        self.tries_used = 0
         for _ in range(maximum_number_of_tries):
+            self.tries_used += 1
             new_room = self._create_random_room()
 
             # run through the other rooms and see if they intersect with this one
@@ -357,48 +631,110 @@ class MapConstructor(object):
             if not failed:
                 self.add_room(new_room)
 
-        # fill map with "unblocked" tiles
-        my_map = [[Tile(True, x, y)
-                   for y in range(self.height)]
-                  for x in range(self.width)]
+        # fill map with "blocked" tiles
+        blocked = np.ones((self.width, self.height), dtype=bool)
+        tile_type = np.full((self.width, self.height), ETileType.WALL.value, dtype=np.uint8)
 
         # build rooms
         for idx, room in enumerate(self.rooms):
-            for x in range(room.x1 + 1, room.x2):
-                for y in range(room.y1 + 1, room.y2):
-                    my_map[x][y].blocked = False
-                    my_map[x][y].block_sight = False
+            blocked[room.x1 + 1:room.x2, room.y1 + 1:room.y2] = False
+            tile_type[room.x1 + 1:room.x2, room.y1 + 1:room.y2] = ETileType.FLOOR.value
 
-            new_vector = room.center()
             if idx:
-                prev_vector = self.rooms[idx - 1].center()
-
-                # draw a coin (random number that is either 0 or 1)
-                if randint(0, 1):
-                    # first move horizontally, then vertically
-                    self._create_h_tunnel(my_map, prev_vector.X, new_vector.X, prev_vector.Y)
-                    self._create_v_tunnel(my_map, prev_vector.Y, new_vector.Y, new_vector.X)
-                else:
-                    # first move vertically, then horizontally
-                    self._create_v_tunnel(my_map, prev_vector.Y, new_vector.Y, prev_vector.X)
-                    self._create_h_tunnel(my_map, prev_vector.X, new_vector.X, new_vector.Y)
-
-        return TileMap(my_map, self.rooms, self.color_dark_wall, self.color_light_wall,
-                       self.color_dark_ground, self.color_light_ground, legacy_mode)
+                self._connect(blocked, tile_type, self.rooms[idx - 1], room)
+
+        return TileMap(blocked, self.rooms, self.color_dark_wall, self.color_light_wall,
+                       self.color_dark_ground, self.color_light_ground, legacy_mode, tile_type=tile_type)
+
+    def _split(self, region, min_size):
+        """Cuts the region in two, each at least min_size wide and high, or returns None when it is too small.
+        The longer side is cut, a random one when the region is close to a square"""
+        width, height = region.get_width(), region.get_height()
+        across = width >= 2 * min_size
+        down = height >= 2 * min_size
+        if not across and not down:
+            return None
+        if across and down:
+            across = width > height * 1.25 or (height <= width * 1.25 and self.rng.randint(0, 1))
+        if across:
+            cut = self.rng.randint(min_size, width - min_size)
+            return Rect(region.x1, region.y1, cut, height), Rect(region.x1 + cut, region.y1, width - cut, height)
+        cut = self.rng.randint(min_size, height - min_size)
+        return Rect(region.x1, region.y1, width, cut), Rect(region.x1, region.y1 + cut, width, height - cut)
+
+    def _bsp_strategy(self, legacy_mode):
+        """Binary space partition: the map is cut in two, and the parts again, until there is a part for each
+        room, then each part gets one room that fits inside it and needs no intersection test. Every cut is
+        bridged by a corridor between a room of each side, so the map is connected by construction.
+        The parts are cut oldest first, max_rooms - 1 cuts at most and no retries, so the rooms come out
+        about the same size and the time only depends on the number of rooms"""
+        min_size = self.room_min_size + 1
+        # partitions as [region, first part, second part], the leaves have no parts
+        root = [Rect(0, 0, self.width, self.height), None, None]
+        leaves = deque([root])
+        parts = 1
+        while leaves and parts < self.max_rooms:
+            node = leaves.popleft()
+            halves = self._split(node[0], min_size)
+            if halves is None:
+                continue
+            node[1], node[2] = [halves[0], None, None], [halves[1], None, None]
+            leaves.extend((node[1], node[2]))
+            parts += 1
+
+        blocked = np.ones((self.width, self.height), dtype=bool)
+        tile_type = np.full((self.width, self.height), ETileType.WALL.value, dtype=np.uint8)
+
+        def build(node):
+            # rooms of the leaves left to right, returns the room the corridor of the cut above comes to
+            region, first, second = node
+            if first is None:
+                # the walls of a Rect are on x1 and x2, both inside the region
+                w = self.rng.randint(self.room_min_size, min(self.room_max_size, region.get_width() - 1))
+                h = self.rng.randint(self.room_min_size, min(self.room_max_size, region.get_height() - 1))
+                room = Rect(self.rng.randint(region.x1, region.x2 - w - 1),
+                            self.rng.randint(region.y1, region.y2 - h - 1), w, h)
+                blocked[room.x1 + 1:room.x2, room.y1 + 1:room.y2] = False
+                tile_type[room.x1 + 1:room.x2, room.y1 + 1:room.y2] = ETileType.FLOOR.value
+                self.rooms.append(room)
+                return room
+            first_room, second_room = build(first), build(second)
+            self._connect(blocked, tile_type, first_room, second_room)
+            return self.rng.choice((first_room, second_room))
+
+        self.rooms = []
+        build(root)
+        # the map is made in one go, there is nothing to retry
+        self.tries_used = 1
+
+        return TileMap(blocked, self.rooms, self.color_dark_wall, self.color_light_wall,
+                       self.color_dark_ground, self.color_light_ground, legacy_mode, tile_type=tile_type)
+
+    def _connect(self, blocked, tile_type, room, other_room):
+        # L shaped corridor between the centers, the coin tells which way it bends
+        prev_vector, new_vector = room.center(), other_room.center()
+        if self.rng.randint(0, 1):
+            # first move horizontally, then vertically
+            self._create_h_tunnel(blocked, tile_type, prev_vector.X, new_vector.X, prev_vector.Y)
+            self._create_v_tunnel(blocked, tile_type, prev_vector.Y, new_vector.Y, new_vector.X)
+        else:
+            # first move vertically, then horizontally
+            self._create_v_tunnel(blocked, tile_type, prev_vector.Y, new_vector.Y, prev_vector.X)
+            self._create_h_tunnel(blocked, tile_type, prev_vector.X, new_vector.X, new_vector.Y)
 
     @staticmethod
-    def _create_h_tunnel(my_map, x1, x2, y):
-        # build horzontal tunnels
-        for x in range(min(x1, x2), max(x1, x2) + 1):
-            my_map[x][y].blocked = False
-            my_map[x][y].block_sight = False
+    def _create_h_tunnel(blocked, tile_type, x1, x2, y):
+        # build horzontal tunnels, only floor that was still rock becomes corridor
+        tunnel = np.s_[min(x1, x2):max(x1, x2) + 1, y]
+        tile_type[tunnel][blocked[tunnel]] = ETileType.CORRIDOR.value
+        blocked[tunnel] = False
 
     @staticmethod
-    def _create_v_tunnel(my_map, y1, y2, x):
-        # build vertical tunnels
-        for y in range(min(y1, y2), max(y1, y2) + 1):
-            my_map[x][y].blocked = False
-            my_map[x][y].block_sight = False
+    def _create_v_tunnel(blocked, tile_type, y1, y2, x):
+        # build vertical tunnels, only floor that was still rock becomes corridor
+        tunnel = np.s_[x, min(y1, y2):max(y1, y2) + 1]
+        tile_type[tunnel][blocked[tunnel]] = ETileType.CORRIDOR.value
+        blocked[tunnel] = False
 
 
 class Rect(object):
@@ -439,12 +775,95 @@ class Rect(object):
         return cond1 and cond2 and cond3 and cond4
 
 
+OPPOSITE_CARDINALS = {
+    Cardinals.NORTH: Cardinals.SOUTH,
+    Cardinals.SOUTH: Cardinals.NORTH,
+    Cardinals.EAST: Cardinals.WEST,
+    Cardinals.WEST: Cardinals.EAST
+}
+
+
+class AttachmentFrontier(object):
+    """The attachments still open on the rooms placed, by cardinal. They come out in the order they were
+    opened, an attachment opened again after a backtrack takes back its place.
+    Any room attached to an attachment covers the cell right outside it, its doorstep, so an attachment whose
+    doorstep is taken can not be used and is kept out until the room on it goes away"""
+    def __init__(self, occupied):
+        self.occupied = occupied
+        self.by_cardinal = {cardinal: {} for cardinal in Cardinals}
+        # doorstep -> open attachments in front of it
+        self.doorsteps = {}
+        self.opened = 0
+
+    def __len__(self):
+        return sum(len(attachments) for attachments in self.by_cardinal.values())
+
+    @staticmethod
+    def doorstep(attachment):
+        # the attachment coordinates are one cell off on the axis they do not face, see Room.get_attachments
+        if attachment.cardinal == Cardinals.EAST:
+            return attachment.x, attachment.y - 1
+        if attachment.cardinal == Cardinals.WEST:
+            return attachment.x - 2, attachment.y - 1
+        if attachment.cardinal == Cardinals.SOUTH:
+            return attachment.x - 1, attachment.y
+        return attachment.x - 1, attachment.y - 2
+
+    def open(self, attachment):
+        """Adds the attachment unless its doorstep is off the map or taken, returns if it was added"""
+        x, y = doorstep = self.doorstep(attachment)
+        width, height = self.occupied.shape
+        if not (0 <= x < width and 0 <= y < height) or self.occupied[x, y]:
+            return False
+        if attachment.order is None:
+            attachment.order = self.opened
+            self.opened += 1
+        self.by_cardinal[attachment.cardinal][attachment.order] = attachment
+        self.doorsteps.setdefault(doorstep, []).append(attachment)
+        return True
+
+    def close(self, attachment):
+        if self.by_cardinal[attachment.cardinal].pop(attachment.order, None) is not None:
+            doorstep = self.doorstep(attachment)
+            attachments = self.doorsteps[doorstep]
+            attachments.remove(attachment)
+            if not attachments:
+                del self.doorsteps[doorstep]
+
+    def cover(self, room):
+        """Closes the attachments whose doorstep the room takes, and returns them"""
+        covered = []
+        if len(self.doorsteps) < (room.x2 - room.x1) * (room.y2 - room.y1):
+            cells = [cell for cell in self.doorsteps
+                     if room.x1 <= cell[0] < room.x2 and room.y1 <= cell[1] < room.y2]
+        else:
+            cells = [(x, y) for x in range(room.x1, room.x2) for y in range(room.y1, room.y2)
+                     if (x, y) in self.doorsteps]
+        for cell in cells:
+            for attachment in list(self.doorsteps[cell]):
+                self.close(attachment)
+                covered.append(attachment)
+        return covered
+
+    def facing(self, cardinals):
+        """The open attachments of the cardinals, oldest first"""
+        opened = [self.by_cardinal[cardinal] for cardinal in cardinals]
+        keys = sorted(key for attachments in opened for key in attachments)
+        for key in keys:
+            for attachments in opened:
+                if key in attachments:
+                    yield attachments[key]
+                    break
+
+
 class Attachment(object):
     def __init__(self, x, y, cardinal):
         self.x = x
         self.y = y
         self.cardinal = cardinal
         self.attached = None
+        # when it was opened on the frontier of the constructive placer
+        self.order = None
 
     def can_attach(self, other):
         if other.cardinal == Cardinals.SOUTH and self.cardinal == Cardinals.NORTH:
@@ -540,42 +959,101 @@ class Room(Rect):
 
     @staticmethod
     def load(yaml_file=None, hard_values=None):
+        """Room from a tile template, the files are parsed only once and kept on the tile_templates registry"""
         if yaml_file:
-            with open(yaml_file) as stream:
-                values = yaml.safe_load(stream)
-
-            if not values:
-                raise RuntimeError("File could not be read")
+            template = tile_templates.get(yaml_file)
         else:
-            values = hard_values
+            template = TileTemplate.from_values(hard_values)
 
+        return template.instantiate()
+
+
+class TileTemplate(object):
+    """A parsed tile template. The internals are kept as an array of character codes indexed [y, x], shared
+    read only by every room made from it, and the attachments are scanned once as (x, y, cardinal) tuples"""
+    WALL = ord("#")
+    ATTACHMENT = ord("A")
+
+    def __init__(self, name, internals, attachments):
+        self.name = name
+        self.internals = internals
+        self.internals.flags.writeable = False
+        self.attachments = attachments
+        self.height, self.width = internals.shape
+
+    @staticmethod
+    def _scan_attachments(name, internals):
+        height, width = internals.shape
         attachments = []
+        for y, x in np.argwhere(internals == TileTemplate.ATTACHMENT).tolist():
+            try:
+                attachments.append((x, y, Room.get_cardinal(x, y, width, height)))
+            except Exception as e:
+                print(e)
+                raise RuntimeError(name + " failed to load an attachment")
+        return tuple(attachments)
 
+    @staticmethod
+    def from_values(values):
         room = values["room_tiles"]
-        map = room["map"]
-        height = len(map)
-        width = len(map[0])
-        for y in range(height):
-            for x in range(width):
-                if map[y][x] == "A":
-                    try:
-                        attachments.append(Attachment(x, y, Room.get_cardinal(x, y, width, height)))
-                    except Exception as e:
-                        print(e)
-                        raise RuntimeError(room["name"] + " failed to load an attachment")
-
-        internals = map
+        rows = room["map"]
+        internals = np.array([np.frombuffer(row.encode("ascii"), dtype=np.uint8) for row in rows], dtype=np.uint8)
+
+        attachments = TileTemplate._scan_attachments(room["name"], internals)
 
         logging.debug("Loading tile template {}".format(room["name"]))
 
+        return TileTemplate(room["name"], internals, attachments)
+
+    def rotated(self, turns):
+        """The template turned a quarter clockwise the number of turns, with its attachments on the new sides"""
+        # the internals are indexed [y, x], rot90 on them turns the room counterclockwise as it is drawn
+        internals = np.ascontiguousarray(np.rot90(self.internals, -turns))
+        name = "{} turned {}".format(self.name, turns * 90) if turns % 4 else self.name
+        return TileTemplate(name, internals, TileTemplate._scan_attachments(name, internals))
+
+    @staticmethod
+    def load(yaml_file):
+        with open(yaml_file) as stream:
+            values = yaml.safe_load(stream)
+
+        if not values:
+            raise RuntimeError("File could not be read")
+
+        return TileTemplate.from_values(values)
+
+    def instantiate(self, x=0, y=0):
+        """A new room placed at (x, y), only the attachments are created since they are the only mutable part"""
         return Room(
-                x=0,
-                y=0,
-                h=height,
-                w=width,
-                attachments=attachments,
-                internals=internals
-            )
+            x=x,
+            y=y,
+            h=self.height,
+            w=self.width,
+            attachments=[Attachment(att_x, att_y, cardinal) for att_x, att_y, cardinal in self.attachments],
+            internals=self.internals
+        )
+
+
+class TileTemplateRegistry(object):
+    """Keeps the parsed tile templates by path, a template is parsed again only when its file changes,
+    so the rooms saved by the level editor are picked up by the next map"""
+
+    def __init__(self):
+        self.templates = {}
+
+    def get(self, yaml_file):
+        mtime = os.stat(yaml_file).st_mtime_ns
+        cached = self.templates.get(yaml_file)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, TileTemplate.load(yaml_file))
+            self.templates[yaml_file] = cached
+        return cached[1]
+
+    def clear(self):
+        self.templates = {}
+
+
+tile_templates = TileTemplateRegistry()
 
 
 class MapObjectsConstructor(object):
@@ -583,20 +1061,39 @@ class MapObjectsConstructor(object):
     and automatically populates the map necessary objects with the proper references for those newly added
     objects to the map, collision handler and object pool
     """
-    def __init__(self, object_templates=list(), max_monster_per_room: int=0, max_items_per_room: int=0, game_instance=None):
+    def __init__(self, object_templates=None, max_monster_per_room: int=0, max_items_per_room: int=0, game_instance=None,
+                 sampler=None, rng=None):
         print("starting object constructor")
         self.game_instance = game_instance
         self.tile_map = game_instance.map
         self.object_pool = game_instance.object_pool
         self.collision_handler = game_instance.collision_handler
-        self.object_templates = object_templates
+        # a fresh list each time, a shared default would pile up the templates of every level
+        self.object_templates = object_templates if object_templates is not None else list()
         self.max_monsters_per_room = max_monster_per_room
         self.max_items_per_room=max_items_per_room
+        self.rng = rng or random
+        self.sampler = sampler
+        self.spawned = 0
+
+    def _copy(self):
+        return MapObjectsConstructor(object_templates=self.object_templates, max_items_per_room=self.max_items_per_room,
+                                     max_monster_per_room=self.max_monsters_per_room, game_instance=self.game_instance,
+                                     sampler=self.sampler, rng=self.rng)
+
+    def _compile_sampler(self):
+        """Every template is loaded once into a prototype, with its colors and functions already resolved,
+        and goes into one alias table per tag. Spawning is then a draw plus a clone of the prototype"""
+        sampler = Sampling.TagSampler(rng=self.rng)
+        for obj_template, argument_template, weight in self.object_templates:
+            prototype = obj_template.load(hard_values=argument_template)
+            sampler.add(prototype, weight, argument_template["tags"])
+        return sampler.compile()
 
     def _append_template(self, obj):
         """Runs the proper safe evals on the object to create the template and add to the template list"""
-        if obj["type"] in [a for a in dir(GameObjects) if "__" not in a]:
-            obj_template = eval("GameObjects." + obj["type"])
+        if obj["type"] in GameObjects.object_types:
+            obj_template = GameObjects.object_types[obj["type"]]
             self.object_templates.append((obj_template, obj["params"], obj["weight"]))
         else:
             logger.warning("Object {} is not recognizable as a GameObject", obj["type"])
@@ -623,41 +1120,35 @@ class MapObjectsConstructor(object):
         self._append_object_template(template, "items")
         self._append_object_template(template, "monsters")
         self._append_object_template(template, "mandatory")
+        self.sampler = self._compile_sampler()
 
-        return MapObjectsConstructor(object_templates=self.object_templates, max_items_per_room=self.max_items_per_room,
-                                     max_monster_per_room=self.max_monsters_per_room, game_instance=self.game_instance)
+        return self._copy()
 
     def _append_object_template(self, level_template, key):
         if key in level_template.keys():
             for obj in level_template[key]:
-                if obj["type"] in [a for a in dir(GameObjects) if "__" not in a]:
-                    obj_template = eval("GameObjects." + obj["type"])
+                if obj["type"] in GameObjects.object_types:
+                    obj_template = GameObjects.object_types[obj["type"]]
                     self.object_templates.append((obj_template, obj["params"], obj["weight"]))
                 else:
                     logger.warning("Object {} is not recognizable as a GameObject", obj["type"])
 
     def set_max_objects_per_room(self, value):
         self.max_monsters_per_room = value
-        return MapObjectsConstructor(object_templates=self.object_templates, max_items_per_room=self.max_items_per_room,
-                                     max_monster_per_room=self.max_monsters_per_room, game_instance=self.game_instance)
+        return self._copy()
 
     def set_max_items_per_room(self, value):
         self.max_items_per_room = value
-        return MapObjectsConstructor(object_templates=self.object_templates, max_items_per_room=self.max_items_per_room,
-                                     max_monster_per_room=self.max_monsters_per_room, game_instance=self.game_instance)
+        return self._copy()
+
+    def _get_sampler(self):
+        if self.sampler is None:
+            self.sampler = self._compile_sampler()
+        return self.sampler
 
     def _get_random_object_template(self, tag):
-        filtered_template_list = [template for template in self.object_templates if tag in template[1]["tags"]]
-
-        total = sum(w for _, _, w in filtered_template_list)
-        r = uniform(0, total)
-        upto = 0
-        for obj_template, argument_template, weight in filtered_template_list:
-            if upto + weight >= r:
-                return obj_template.load(hard_values=argument_template)
-            upto += weight
-        else:
-            assert False, "List is empty"
+        return self._get_sampler().draw(tag).clone()
+
 
     def _populate_room(self, room):
         self._place_object(room, self.max_items_per_room, "item", 1)
@@ -680,49 +1171,53 @@ class MapObjectsConstructor(object):
         except Exception as e:
             logger.warning("Could not find any item with tag " + item_tag)
 
-        return MapObjectsConstructor(object_templates=self.object_templates, max_items_per_room=self.max_items_per_room,
-                                 max_monster_per_room=self.max_monsters_per_room, game_instance=self.game_instance)
+        return self._copy()
 
     def _place_object(self, room, max_objects, tag, z_index, mandatory=False):
 
-        num_objects = max(1, randint(0, max_objects)) if mandatory else randint(0, max_objects)
+        num_objects = max(1, self.rng.randint(0, max_objects)) if mandatory else self.rng.randint(0, max_objects)
+        if not num_objects:
+            return
+        # every prototype of the room in one batch, they are only cloned when there is room for them
+        prototypes = self._get_sampler().draw_many(tag, num_objects)
 
         print("Trying to put {} from {} max {} on room {}".format(num_objects, max_objects, tag, room))
-        for i in range(num_objects):
+        for prototype in prototypes:
             # choose random spot for this object
             if type(room) == Room:
                 print("It is a proper room")
-                internals = room.internals
-                positions = []
-                for y in range(len(internals)):
-                    for x in range(len(internals[0])):
-                        if internals[y][x] != "#":
-                            positions.append(Vector2(x + room.x1,y + room.y1))
+                positions = [Vector2(x + room.x1, y + room.y1)
+                             for y, x in np.argwhere(room.internals != TileTemplate.WALL).tolist()]
                 tries = 3
-                coord = choice(positions)
+                coord = self.rng.choice(positions)
                 while tries or mandatory:
                     if not self.collision_handler.is_blocked(coord.X, coord.Y):
                         print("monster placed", room, coord, tries)
                         break
                     else:
-                        coord = choice(positions)
+                        coord = self.rng.choice(positions)
                         tries -= 1
                         print("could not add monster to map", room, coord, tries)
             else:
                 print("It is just a rect!")
-                coord = Vector2(randint(room.x1+1, room.x2-1), randint(room.y1+1, room.y2-1))
+                coord = Vector2(self.rng.randint(room.x1+1, room.x2-1), self.rng.randint(room.y1+1, room.y2-1))
 
             if not self.collision_handler.is_blocked(coord.X, coord.Y):
                 print("Adding monster to map")
-                prototype = self._get_random_object_template(tag)
-                prototype.coord = coord
-                prototype.z_index=z_index
-                prototype.collision_handler = self.collision_handler
-                self.object_pool.append(prototype)
+                obj = prototype.clone()
+                obj.spawn_key = self.spawned
+                self.spawned += 1
+                obj.coord = coord
+                obj.z_index=z_index
+                obj.collision_handler = self.collision_handler
+                self.object_pool.append(obj)
             else:
                 print("could not add monster to map", room, coord)
 
+    @Profiler.timed('mapgen')
     def populate_map(self):
+        # with a seeded rng the same objects get the same spawn keys, the saves match them by it
+        self.spawned = 0
         for idx, room in enumerate(self.tile_map.get_rooms()):
             if idx and idx < len(self.tile_map.get_rooms()) - 1:
                 self._populate_room(room)
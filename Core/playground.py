@@ -1,6 +1,6 @@
 import os
-from utils import Colors
-colors = [color for color in dir(Colors) if "__" not in color]
+from utils import Registry
+colors = Registry.colors.names
 
 print(
     colors
@@ -0,0 +1,59 @@
+"""Shared setup of the tests. The modules of the game import each other from the Core folder, as core.py does,
+so it goes first on the path.
+
+Run from the Core folder: python -m pytest tests
+"""
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def game():
+    """A game at the second dungeon level, populated and explored, the player carrying every item of the level
+    file, as the save benchmark sets it up"""
+    from benchmarks.save_benchmark import make_game
+    return make_game(2, 7)
+
+
+@pytest.fixture
+def empty_context():
+    """Makes contexts to load a game on, as core.load does"""
+    from managers import ObjectManager
+    from managers.GenericControllerObjects import GameContext
+    from managers.LevelGenerator import LevelGenerator
+    from models.EnumStatus import EGameState
+    from benchmarks.save_benchmark import level_file, tiles_dir
+
+    def make():
+        return GameContext(next_level=None, game_state=ObjectManager.GameState(EGameState.LOADING),
+                           level_generator=LevelGenerator(None, level_file, tiles_dir))
+    return make
+
+
+@pytest.fixture
+def snapshot():
+    """Everything a save must bring back of a game, without the ids a seed level hands out again"""
+    from managers import SaveGame
+
+    def record(obj):
+        fields = SaveGame.object_record(obj)
+        del fields['id'], fields['owner']
+        return json.dumps(fields, sort_keys=True)
+
+    def take(game_context):
+        player = game_context.player
+        return {
+            'player': record(player),
+            'inventory': [record(item) for item in player.get_inventory()],
+            'objects': sorted(record(obj) for obj in SaveGame.level_objects(game_context)),
+            'blocked': game_context.map.blocked.tobytes(),
+            'explored': game_context.map.explored.tobytes(),
+            'extras': json.dumps(game_context.extras, sort_keys=True),
+            'game_state': game_context.game_state.get_state()
+        }
+    return take
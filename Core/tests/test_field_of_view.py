@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from utils import FieldOfView
+
+ALGORITHMS = sorted(FieldOfView.ALGORITHMS)
+
+
+def random_transparency(seed, size=12, walls=0.25):
+    return np.random.RandomState(seed).rand(size, size) > walls
+
+
+@pytest.mark.parametrize('algorithm', ALGORITHMS)
+def test_open_floor_is_all_visible(algorithm):
+    transparent = np.ones((11, 11), dtype=bool)
+    assert FieldOfView.compute_fov(transparent, 5, 5, algorithm=algorithm).all()
+
+
+@pytest.mark.parametrize('algorithm', ALGORITHMS)
+def test_wall_hides_what_is_behind_it(algorithm):
+    transparent = np.ones((11, 11), dtype=bool)
+    transparent[7, :] = False
+
+    visible = FieldOfView.compute_fov(transparent, 3, 5, algorithm=algorithm)
+    assert visible[:7].all()
+    assert visible[7].all()
+    assert not visible[8:].any()
+
+    visible = FieldOfView.compute_fov(transparent, 3, 5, light_walls=False, algorithm=algorithm)
+    assert visible[:7].all()
+    assert not visible[7:].any()
+
+
+@pytest.mark.parametrize('algorithm', ALGORITHMS)
+def test_radius_limits_the_view(algorithm):
+    transparent = np.ones((21, 21), dtype=bool)
+    xs, ys = np.nonzero(FieldOfView.compute_fov(transparent, 10, 10, radius=4, algorithm=algorithm))
+    assert ((xs - 10) ** 2 + (ys - 10) ** 2).max() <= 4 ** 2
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_permissive_view_is_symmetric(seed):
+    """Shadowcasting is not symmetric, precise permissive is: a floor seen from another sees it back"""
+    transparent = random_transparency(seed)
+    views = {}
+    for x, y in zip(*np.nonzero(transparent)):
+        views[(x, y)] = FieldOfView.compute_fov(transparent, x, y, algorithm='PERMISSIVE')
+
+    for (x, y), visible in views.items():
+        for other in zip(*np.nonzero(visible & transparent)):
+            assert views[other][x, y], "{} sees {} but not the other way".format((x, y), other)
+
+
+def test_unknown_algorithm():
+    with pytest.raises(ValueError):
+        FieldOfView.compute_fov(np.ones((3, 3), dtype=bool), 1, 1, algorithm='NOPE')
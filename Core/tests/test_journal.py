@@ -0,0 +1,71 @@
+import json
+from managers import Journal
+from models.GenericObjects import Vector2
+
+
+def play_turns(game_context, journal):
+    """Three turns: the player walks and forgets a cell, monsters are wounded and killed, one is cloned, the
+    cell is explored again and an item picked up"""
+    pool = game_context.object_pool
+    player = game_context.player
+    monsters = pool.find_by_tag('monster')
+
+    player.coord = player.coord + Vector2(1, 0)
+    monsters[0].fighter.take_damage(1)
+    game_context.map.explored[0, 0] = False
+    journal.record_turn(game_context)
+
+    del pool[monsters[1].get_id()]
+    twin = monsters[2].clone()
+    twin.coord = twin.coord + Vector2(0, 1)
+    pool.append(twin)
+    journal.record_turn(game_context)
+
+    game_context.map.explored[0, 0] = True
+    pool.find_by_tag('item')[0].pick_up(player)
+    game_context.add_extra('dungeon_level', 3)
+    journal.record_turn(game_context)
+
+
+def test_recover_replays_the_turns(game, empty_context, snapshot, tmp_path):
+    journal = Journal.Journal(str(tmp_path / 'savegame.sav'))
+    journal.checkpoint(game)
+    play_turns(game, journal)
+    journal.close()
+
+    recovered = empty_context()
+    Journal.recover(str(tmp_path / 'savegame.sav'), recovered)
+    assert snapshot(recovered) == snapshot(game)
+    assert recovered.object_pool.id_counter == game.object_pool.id_counter
+
+
+def test_recover_ignores_the_turn_being_written(game, empty_context, snapshot, tmp_path):
+    journal = Journal.Journal(str(tmp_path / 'savegame.sav'))
+    journal.checkpoint(game)
+    play_turns(game, journal)
+    journal.close()
+    # the game died halfway through the line of the next turn
+    with open(journal.journal_path, 'a') as stream:
+        stream.write(json.dumps({'removed': [game.player.get_id()]})[:10])
+
+    recovered = empty_context()
+    Journal.recover(str(tmp_path / 'savegame.sav'), recovered)
+    assert snapshot(recovered) == snapshot(game)
+
+
+def test_recover_drops_a_journal_of_another_checkpoint(game, empty_context, snapshot, tmp_path):
+    journal = Journal.Journal(str(tmp_path / 'savegame.sav'))
+    journal.checkpoint(game)
+    checkpointed = snapshot(game)
+    play_turns(game, journal)
+    journal.close()
+    # the game died after writing a new checkpoint but before starting its journal
+    with open(journal.journal_path) as stream:
+        lines = stream.read().split('\n')
+    lines[0] = json.dumps({'checkpoint': json.loads(lines[0])['checkpoint'] + 1})
+    with open(journal.journal_path, 'w') as stream:
+        stream.write('\n'.join(lines))
+
+    recovered = empty_context()
+    Journal.recover(str(tmp_path / 'savegame.sav'), recovered)
+    assert snapshot(recovered) == checkpointed
@@ -0,0 +1,51 @@
+import os
+from managers.LevelStore import LevelStore
+
+
+def level_of(snapshot):
+    """What a level left and entered again must keep, the player walks in through the stairs"""
+    return {key: snapshot[key] for key in ('objects', 'blocked', 'explored')}
+
+
+def test_new_game_levels_replace_the_saved_ones_on_commit(game, tmp_path):
+    folder = str(tmp_path / 'levels')
+    store = LevelStore(folder)
+    store.leave(1, game)
+    saved = os.listdir(folder)
+
+    store.begin()
+    store.leave(2, game)
+    assert os.listdir(folder + '.new') == ['level-2.sav']
+    assert os.listdir(folder) == saved
+
+    store.commit()
+    assert not os.path.exists(folder + '.new')
+    assert os.listdir(folder) == ['level-2.sav']
+    assert store.path_for(2) == os.path.join(folder, 'level-2.sav')
+
+
+def test_release_throws_away_a_new_game_never_saved(game, tmp_path):
+    folder = str(tmp_path / 'levels')
+    store = LevelStore(folder)
+    store.leave(1, game)
+
+    store.begin()
+    store.leave(2, game)
+    store.release()
+    assert not os.path.exists(folder + '.new')
+    assert os.listdir(folder) == ['level-1.sav']
+    assert store.visited(1) and not store.visited(2)
+
+
+def test_evicted_level_is_read_back(game, snapshot, tmp_path):
+    store = LevelStore(str(tmp_path / 'levels'), hot_levels=0)
+    left = snapshot(game)
+    store.leave(2, game)
+    assert not store.hot and store.evictions == 1
+
+    assert not store.enter(3, game)
+    assert level_of(snapshot(game)) != level_of(left)
+    store.leave(3, game)
+    assert store.enter(2, game, arrive_on='stairs')
+    assert store.reads == 1
+    assert level_of(snapshot(game)) == level_of(left)
@@ -0,0 +1,84 @@
+import heapq
+import math
+import numpy as np
+import pytest
+from models.MapObjects import TileMap
+from utils import Colors, PathFinding
+
+# heuristic -> (diagonal moves, cost of a diagonal move)
+SEARCHES = {
+    'octile': (True, math.sqrt(2)),
+    'chebyshev': (True, 1),
+    'dijkstra': (True, 1),
+    'manhattan': (False, None)
+}
+
+
+def make_map(seed, size=10, walls=0.25):
+    blocked = np.random.RandomState(seed).rand(size, size) < walls
+    return TileMap(blocked, [], Colors.dark_gray, Colors.gray, Colors.black, Colors.white, False)
+
+
+def steps(diagonal):
+    return PathFinding.CARDINAL_STEPS + (PathFinding.DIAGONAL_STEPS if diagonal else [])
+
+
+def shortest_costs(tile_map, start, diagonal, diagonal_cost):
+    """Plain Dijkstra over a dict, what the searches must agree with"""
+    costs = {start: 0}
+    frontier = [(0, start)]
+    while frontier:
+        cost, (x, y) = heapq.heappop(frontier)
+        if cost > costs[(x, y)]:
+            continue
+        for dx, dy in steps(diagonal):
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < tile_map.width and 0 <= ny < tile_map.height and not tile_map.blocked[nx, ny]:
+                next_cost = cost + (diagonal_cost if dx and dy else 1)
+                if next_cost < costs.get((nx, ny), math.inf):
+                    costs[(nx, ny)] = next_cost
+                    heapq.heappush(frontier, (next_cost, (nx, ny)))
+    return costs
+
+
+def path_cost(tile_map, path, diagonal, diagonal_cost):
+    cost = 0
+    for (x1, y1), (x2, y2) in zip(path, path[1:]):
+        assert (x2 - x1, y2 - y1) in steps(diagonal)
+        assert not tile_map.blocked[x2, y2]
+        cost += diagonal_cost if x1 != x2 and y1 != y2 else 1
+    return cost
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('heuristic', sorted(SEARCHES))
+def test_a_star_finds_shortest_paths(seed, heuristic):
+    diagonal, diagonal_cost = SEARCHES[heuristic]
+    tile_map = make_map(seed)
+    floors = list(zip(*np.nonzero(~tile_map.blocked)))
+    start = floors[0]
+    costs = shortest_costs(tile_map, start, diagonal, diagonal_cost)
+
+    for goal in floors[1:]:
+        if goal not in costs:
+            continue
+        path = PathFinding.a_star_search(tile_map, start, goal, heuristic=heuristic, diagonal=diagonal)
+        assert path[0] == start and path[-1] == goal
+        assert path_cost(tile_map, path, diagonal, diagonal_cost) == pytest.approx(costs[goal])
+
+
+def test_manhattan_refuses_diagonal_moves():
+    with pytest.raises(ValueError):
+        PathFinding.a_star_search(make_map(0), (0, 0), (1, 1), heuristic='manhattan', diagonal=True)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_dijkstra_map_counts_steps(seed):
+    tile_map = make_map(seed)
+    floors = list(zip(*np.nonzero(~tile_map.blocked)))
+    costs = shortest_costs(tile_map, floors[0], True, 1)
+
+    distances = PathFinding.dijkstra_map(tile_map, [floors[0]])
+    for x, y in floors:
+        expected = costs.get((x, y), PathFinding.unreachable(tile_map))
+        assert distances[x * tile_map.height + y] == expected
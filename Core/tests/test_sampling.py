@@ -0,0 +1,53 @@
+import random
+from collections import Counter
+import pytest
+from utils.Sampling import AliasTable, TagSampler
+
+
+def table_distribution(table):
+    """The exact probability of every index: its own column plus what the other columns alias to it"""
+    distribution = [0.0] * table.size
+    for i in range(table.size):
+        distribution[i] += table.probability[i] / table.size
+        distribution[table.alias[i]] += (1.0 - table.probability[i]) / table.size
+    return distribution
+
+
+@pytest.mark.parametrize('weights', [[1], [1, 1], [15, 3, 2, 0, 1], [0.1, 5, 0.3, 7, 0, 0, 2.5]])
+def test_alias_table_keeps_the_weights(weights):
+    total = float(sum(weights))
+    assert table_distribution(AliasTable(weights)) == pytest.approx([w / total for w in weights])
+
+
+@pytest.mark.parametrize('weights', [[], [0, 0]])
+def test_alias_table_needs_a_positive_weight(weights):
+    with pytest.raises(ValueError):
+        AliasTable(weights)
+
+
+def test_tag_sampler_draws_by_weight():
+    sampler = TagSampler(rng=random.Random(1))
+    sampler.add('potion', 15.0, ['item', 'small'])
+    sampler.add('scroll', 3.0, ['item', 'small', 'magic'])
+    sampler.add('staff', 1.0, ['item', 'magic'])
+    sampler.add('nothing', 0.0, ['item'])
+    sampler.compile()
+
+    draws = 40000
+    counts = Counter(sampler.draw_many('item', draws))
+    assert 'nothing' not in counts
+    for value, weight in (('potion', 15.0), ('scroll', 3.0), ('staff', 1.0)):
+        assert counts[value] / draws == pytest.approx(weight / 19.0, abs=0.01)
+
+    counts = Counter(sampler.draw('magic') for _ in range(draws))
+    assert counts['scroll'] / draws == pytest.approx(0.75, abs=0.01)
+    assert set(counts) == {'scroll', 'staff'}
+
+
+def test_tag_sampler_unknown_tag():
+    sampler = TagSampler(rng=random.Random(1))
+    sampler.add('rock', 0.0, ['junk'])
+    sampler.compile()
+    assert 'junk' not in sampler
+    with pytest.raises(KeyError):
+        sampler.draw('junk')
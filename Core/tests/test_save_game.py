@@ -0,0 +1,74 @@
+import pytest
+from managers import SaveGame
+from models.GenericObjects import Vector2
+
+
+def play_a_little(game_context):
+    """Kills a monster, wounds another, kicks an item, moves the player and forgets a cell, like a few turns
+    would"""
+    monsters = game_context.object_pool.find_by_tag('monster')
+    del game_context.object_pool[monsters[0].get_id()]
+    monsters[1].fighter.take_damage(1)
+    item = game_context.object_pool.find_by_tag('item')[0]
+    item.coord = item.coord + Vector2(0, 1)
+    player = game_context.player
+    player.coord = player.coord + Vector2(1, 0)
+    game_context.map.explored[0, 0] = False
+    game_context.add_extra('dungeon_level', 2)
+    return monsters[0], monsters[1], item
+
+
+@pytest.mark.parametrize('whole_level', [False, True])
+def test_round_trip(game, empty_context, snapshot, tmp_path, whole_level):
+    play_a_little(game)
+    path = str(tmp_path / 'savegame.sav')
+    if whole_level:
+        SaveGame.write_atomically(path, SaveGame.encode(game, whole_level=True))
+    else:
+        SaveGame.save_game(path, game)
+
+    loaded = empty_context()
+    messages = SaveGame.load_game(path, loaded)
+    assert snapshot(loaded) == snapshot(game)
+    assert messages == [(line, tuple(color)) for line, color in game.lower_gui_renderer.game_msg]
+    assert loaded.level_generator.game_seed == game.level_generator.game_seed
+    if whole_level:
+        assert loaded.player.get_id() == game.player.get_id()
+        assert loaded.object_pool.id_counter == game.object_pool.id_counter
+    else:
+        # the regenerated level takes new ids, none of them one the stored levels may hold
+        assert loaded.object_pool.id_counter > game.object_pool.id_counter
+
+
+def test_seed_level_keeps_only_what_changed(game):
+    """Only the spawned objects that differ from the regenerated level are written, the dead ones by their key"""
+    def spawned_rows(document):
+        return set(key for key in document['objects']['spawn_key'] if key is not None)
+
+    document, _ = SaveGame.decode(SaveGame.encode(game))
+    untouched = spawned_rows(document)
+
+    dead, wounded, kicked = play_a_little(game)
+    document, _ = SaveGame.decode(SaveGame.encode(game))
+    assert spawned_rows(document) == (untouched - {dead.spawn_key}) | {wounded.spawn_key, kicked.spawn_key}
+    assert document['level']['removed'] == [dead.spawn_key]
+
+
+def test_level_that_does_not_regenerate_stops_the_load(game, empty_context):
+    document, arrays = SaveGame.decode(SaveGame.encode(game))
+    document['level']['layout_crc'] += 1
+    with pytest.raises(RuntimeError):
+        SaveGame.restore(document, arrays, empty_context())
+
+
+@pytest.mark.parametrize('damage', ['truncated', 'magic', 'version'])
+def test_decode_refuses_other_files(game, damage):
+    data = SaveGame.encode(game)
+    if damage == 'truncated':
+        data = data[:SaveGame.HEADER.size - 1]
+    elif damage == 'magic':
+        data = b'XXXX' + data[4:]
+    else:
+        data = SaveGame.HEADER.pack(SaveGame.MAGIC, SaveGame.VERSION + 1, 0) + data[SaveGame.HEADER.size:]
+    with pytest.raises(RuntimeError):
+        SaveGame.decode(data)
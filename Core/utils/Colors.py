@@ -218,3 +218,9 @@ silver=(203,203,203)
 # miscellaneous
 celadon=(172,255,175)
 peach=(255,159,127)
+
+# dungeon
+dungeon_dark_wall=(0,0,100)
+dungeon_light_wall=(130,110,50)
+dungeon_dark_ground=(50,50,150)
+dungeon_light_ground=(200,180,50)
@@ -0,0 +1,290 @@
+"""Field of view computed straight over the transparency layer of the map.
+Every algorithm gets the transparency array indexed [x, y] and returns a boolean mask of the same shape
+with the visible tiles, so no python callback is needed per tile"""
+
+import numpy as np
+
+# multipliers to transform the first octant coordinates into the other seven
+_OCTANTS = [
+    (1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+    (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1)
+]
+
+
+def _window(transparent, x, y, radius):
+    """Crops the transparency layer to the square the radius can reach, as nested lists for fast lookups"""
+    width, height = transparent.shape
+    if radius <= 0:
+        radius = max(width, height)
+    x0, y0 = max(0, x - radius), max(0, y - radius)
+    x1, y1 = min(width, x + radius + 1), min(height, y + radius + 1)
+    return x0, y0, transparent[x0:x1, y0:y1].tolist(), radius
+
+
+def _to_mask(shape, x0, y0, xs, ys):
+    mask = np.zeros(shape, dtype=bool)
+    mask[np.array(xs, dtype=np.intp) + x0, np.array(ys, dtype=np.intp) + y0] = True
+    return mask
+
+
+def shadowcast(transparent, x, y, radius=0, light_walls=True):
+    """Recursive shadowcasting, each octant is scanned row by row and blocking tiles
+    narrow the slopes that are still visible on the next rows"""
+    x0, y0, window, radius = _window(transparent, x, y, radius)
+    origin_x, origin_y = x - x0, y - y0
+    xs, ys = [origin_x], [origin_y]
+
+    for xx, xy, yx, yy in _OCTANTS:
+        _cast_light(window, origin_x, origin_y, 1, 1.0, 0.0, radius, xx, xy, yx, yy, light_walls, xs, ys)
+
+    return _to_mask(transparent.shape, x0, y0, xs, ys)
+
+
+def _cast_light(window, origin_x, origin_y, row, start, end, radius, xx, xy, yx, yy, light_walls, xs, ys):
+    if start < end:
+        return
+
+    width, height = len(window), len(window[0])
+    radius_squared = radius * radius
+    new_start = 0.0
+
+    for j in range(row, radius + 1):
+        dx, dy = -j - 1, -j
+        blocked = False
+        while dx <= 0:
+            dx += 1
+            # translate the relative coordinates into window coordinates
+            map_x, map_y = origin_x + dx * xx + dy * xy, origin_y + dx * yx + dy * yy
+            left_slope, right_slope = (dx - 0.5) / (dy + 0.5), (dx + 0.5) / (dy - 0.5)
+            if start < right_slope:
+                continue
+            elif end > left_slope:
+                break
+
+            inside = 0 <= map_x < width and 0 <= map_y < height
+            opaque = not inside or not window[map_x][map_y]
+
+            if inside and dx * dx + dy * dy <= radius_squared and (light_walls or not opaque):
+                xs.append(map_x)
+                ys.append(map_y)
+
+            if blocked:
+                # we're scanning a row of blocked squares
+                if opaque:
+                    new_start = right_slope
+                    continue
+                else:
+                    blocked = False
+                    start = new_start
+            elif opaque and j < radius:
+                # this is a blocking square, start a child scan
+                blocked = True
+                _cast_light(window, origin_x, origin_y, j + 1, start, left_slope, radius,
+                            xx, xy, yx, yy, light_walls, xs, ys)
+                new_start = right_slope
+
+        # row is scanned, do next row unless last square was blocked
+        if blocked:
+            break
+
+
+class _Line(object):
+    __slots__ = ('xi', 'yi', 'xf', 'yf')
+
+    def __init__(self, xi, yi, xf, yf):
+        self.xi = xi
+        self.yi = yi
+        self.xf = xf
+        self.yf = yf
+
+    def relative_slope(self, x, y):
+        return (self.yf - self.yi) * (self.xf - x) - (self.xf - self.xi) * (self.yf - y)
+
+    def below(self, x, y):
+        return self.relative_slope(x, y) > 0
+
+    def below_or_collinear(self, x, y):
+        return self.relative_slope(x, y) >= 0
+
+    def above(self, x, y):
+        return self.relative_slope(x, y) < 0
+
+    def above_or_collinear(self, x, y):
+        return self.relative_slope(x, y) <= 0
+
+    def collinear(self, x, y):
+        return self.relative_slope(x, y) == 0
+
+    def line_collinear(self, line):
+        return self.collinear(line.xi, line.yi) and self.collinear(line.xf, line.yf)
+
+    def copy(self):
+        return _Line(self.xi, self.yi, self.xf, self.yf)
+
+
+class _ViewBump(object):
+    __slots__ = ('x', 'y', 'parent')
+
+    def __init__(self, x, y, parent):
+        self.x = x
+        self.y = y
+        self.parent = parent
+
+
+class _View(object):
+    __slots__ = ('shallow_line', 'steep_line', 'shallow_bump', 'steep_bump')
+
+    def __init__(self, shallow_line, steep_line, shallow_bump=None, steep_bump=None):
+        self.shallow_line = shallow_line
+        self.steep_line = steep_line
+        self.shallow_bump = shallow_bump
+        self.steep_bump = steep_bump
+
+    def copy(self):
+        # bumps are never changed once created, so the chains can be shared
+        return _View(self.shallow_line.copy(), self.steep_line.copy(), self.shallow_bump, self.steep_bump)
+
+
+def permissive(transparent, x, y, radius=0, light_walls=True):
+    """Precise permissive field of view, a tile is visible if any line from any point of the origin tile
+    reaches any point of it. Each quadrant keeps a list of views bounded by a shallow and a steep line"""
+    x0, y0, window, radius = _window(transparent, x, y, radius)
+    origin_x, origin_y = x - x0, y - y0
+    width, height = len(window), len(window[0])
+    visited = {(origin_x, origin_y)}
+
+    min_extent_x, max_extent_x = origin_x, width - origin_x - 1
+    min_extent_y, max_extent_y = origin_y, height - origin_y - 1
+
+    for dx, dy, extent_x, extent_y in ((1, 1, max_extent_x, max_extent_y), (1, -1, max_extent_x, min_extent_y),
+                                       (-1, -1, min_extent_x, min_extent_y), (-1, 1, min_extent_x, max_extent_y)):
+        _check_quadrant(window, visited, origin_x, origin_y, dx, dy, extent_x, extent_y)
+
+    radius_squared = radius * radius
+    xs, ys = [], []
+    for map_x, map_y in visited:
+        offset_x, offset_y = map_x - origin_x, map_y - origin_y
+        if offset_x * offset_x + offset_y * offset_y <= radius_squared and (light_walls or window[map_x][map_y]):
+            xs.append(map_x)
+            ys.append(map_y)
+    xs.append(origin_x)
+    ys.append(origin_y)
+
+    return _to_mask(transparent.shape, x0, y0, xs, ys)
+
+
+def _check_quadrant(window, visited, origin_x, origin_y, dx, dy, extent_x, extent_y):
+    active_views = [_View(_Line(0, 1, extent_x, 0), _Line(1, 0, 0, extent_y))]
+
+    max_i = extent_x + extent_y
+    i = 1
+    while i != max_i + 1 and active_views:
+        start_j = max(0, i - extent_x)
+        max_j = min(i, extent_y)
+
+        j = start_j
+        while j != max_j + 1 and active_views:
+            _visit_coord(window, visited, origin_x, origin_y, i - j, j, dx, dy, active_views)
+            j += 1
+        i += 1
+
+
+def _visit_coord(window, visited, origin_x, origin_y, x, y, dx, dy, active_views):
+    top_left_x, top_left_y = x, y + 1
+    bottom_right_x, bottom_right_y = x + 1, y
+
+    view_index = 0
+    while view_index < len(active_views) and \
+            active_views[view_index].steep_line.below_or_collinear(bottom_right_x, bottom_right_y):
+        # the tile is above the current view, try the next steeper one
+        view_index += 1
+
+    if view_index == len(active_views) or \
+            active_views[view_index].shallow_line.above_or_collinear(top_left_x, top_left_y):
+        # the tile is below every view left
+        return
+
+    map_x, map_y = origin_x + x * dx, origin_y + y * dy
+    visited.add((map_x, map_y))
+
+    if window[map_x][map_y]:
+        return
+
+    view = active_views[view_index]
+    if view.shallow_line.above(bottom_right_x, bottom_right_y) and view.steep_line.below(top_left_x, top_left_y):
+        # the blocking tile covers the whole view
+        del active_views[view_index]
+    elif view.shallow_line.above(bottom_right_x, bottom_right_y):
+        _add_shallow_bump(top_left_x, top_left_y, active_views, view_index)
+        _check_view(active_views, view_index)
+    elif view.steep_line.below(top_left_x, top_left_y):
+        _add_steep_bump(bottom_right_x, bottom_right_y, active_views, view_index)
+        _check_view(active_views, view_index)
+    else:
+        # the blocking tile is in the middle of the view, split it in two
+        shallow_view_index = view_index
+        steep_view_index = view_index + 1
+        active_views.insert(shallow_view_index, active_views[shallow_view_index].copy())
+        _add_steep_bump(bottom_right_x, bottom_right_y, active_views, shallow_view_index)
+        if not _check_view(active_views, shallow_view_index):
+            steep_view_index -= 1
+        _add_shallow_bump(top_left_x, top_left_y, active_views, steep_view_index)
+        _check_view(active_views, steep_view_index)
+
+
+def _add_shallow_bump(x, y, active_views, view_index):
+    view = active_views[view_index]
+    view.shallow_line.xf = x
+    view.shallow_line.yf = y
+    view.shallow_bump = _ViewBump(x, y, view.shallow_bump)
+
+    bump = view.steep_bump
+    while bump is not None:
+        if view.shallow_line.above(bump.x, bump.y):
+            view.shallow_line.xi = bump.x
+            view.shallow_line.yi = bump.y
+        bump = bump.parent
+
+
+def _add_steep_bump(x, y, active_views, view_index):
+    view = active_views[view_index]
+    view.steep_line.xf = x
+    view.steep_line.yf = y
+    view.steep_bump = _ViewBump(x, y, view.steep_bump)
+
+    bump = view.shallow_bump
+    while bump is not None:
+        if view.steep_line.below(bump.x, bump.y):
+            view.steep_line.xi = bump.x
+            view.steep_line.yi = bump.y
+        bump = bump.parent
+
+
+def _check_view(active_views, view_index):
+    """Removes the view if its lines collapsed into one passing through the origin tile"""
+    shallow_line = active_views[view_index].shallow_line
+    steep_line = active_views[view_index].steep_line
+    if shallow_line.line_collinear(steep_line) and (shallow_line.collinear(0, 1) or shallow_line.collinear(1, 0)):
+        del active_views[view_index]
+        return False
+    return True
+
+
+ALGORITHMS = {
+    'SHADOW': shadowcast,
+    'PERMISSIVE': permissive,
+}
+
+
+def register_algorithm(name, function):
+    """Plugs a new algorithm, it must take (transparent, x, y, radius, light_walls) and return a boolean mask"""
+    ALGORITHMS[name.upper()] = function
+
+
+def compute_fov(transparent, x, y, radius=0, light_walls=True, algorithm='SHADOW'):
+    """Returns a boolean mask of the tiles visible from (x, y). A radius of 0 means no limit"""
+    try:
+        function = ALGORITHMS[algorithm.upper()]
+    except KeyError:
+        raise ValueError("Unknown field of view algorithm {}".format(algorithm))
+    return function(transparent, x, y, radius=radius, light_walls=light_walls)
@@ -1,4 +1,6 @@
 import collections
+import heapq
+import math
 
 
 class Queue:
@@ -43,3 +45,203 @@ def breadth_first_search(graph, start, goal):
 
     return path
 
+
+
+SQRT2 = math.sqrt(2)
+
+# the same eight steps the player can take in GameContext.handle_keys
+CARDINAL_STEPS = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+DIAGONAL_STEPS = [(-1, -1), (1, -1), (-1, 1), (1, 1)]
+
+
+def manhattan(dx, dy):
+    return dx + dy
+
+
+def octile(dx, dy):
+    return max(dx, dy) + (SQRT2 - 1) * min(dx, dy)
+
+
+def chebyshev(dx, dy):
+    return max(dx, dy)
+
+
+def no_heuristic(dx, dy):
+    return 0
+
+
+HEURISTICS = {
+    'manhattan': manhattan,
+    'octile': octile,
+    'chebyshev': chebyshev,
+    'dijkstra': no_heuristic
+}
+
+
+def _steps(height, heuristic, diagonal):
+    """Moves as (dx, dy, offset in the flat arrays, cost). Diagonals cost sqrt(2) only for the octile heuristic,
+    otherwise they take a turn like any other step"""
+    steps = [(dx, dy, dx * height + dy, 1) for dx, dy in CARDINAL_STEPS]
+    if diagonal:
+        diagonal_cost = SQRT2 if heuristic == 'octile' else 1
+        steps += [(dx, dy, dx * height + dy, diagonal_cost) for dx, dy in DIAGONAL_STEPS]
+    return steps
+
+
+def _reconstruct_path(came_from, height, start_index, index):
+    path = []
+    while index != start_index:
+        path.append((index // height, index % height))
+        index = came_from[index]
+    path.append((start_index // height, start_index % height))
+    path.reverse()
+    return path
+
+
+def a_star_search(graph, start, goal, heuristic='octile', diagonal=True, max_expansions=4000):
+    """A* over the blocked layer of a TileMap. The open set is a heap and g scores, parents and the closed set
+    are flat arrays indexed by x * height + y, so nothing is hashed while searching.
+    Returns the path as a list of (x, y) from start to goal. If the budget of expansions runs out it falls back
+    to a greedy answer, the path to the node seen closest to the goal.
+    The manhattan heuristic only fits four way moves, with diagonals it overestimates and the paths get longer"""
+    if heuristic == 'manhattan' and diagonal:
+        raise ValueError("The manhattan heuristic overestimates diagonal moves, use it with diagonal=False")
+    width, height = graph.width, graph.height
+    blocked = graph.blocked.tobytes()
+    estimate = HEURISTICS[heuristic]
+    steps = _steps(height, heuristic, diagonal)
+
+    (start_x, start_y), (goal_x, goal_y) = start, goal
+    start_index, goal_index = start_x * height + start_y, goal_x * height + goal_y
+
+    g_score = [math.inf] * (width * height)
+    came_from = [-1] * (width * height)
+    closed = bytearray(width * height)
+
+    g_score[start_index] = 0
+    best_index, best_estimate = start_index, estimate(abs(goal_x - start_x), abs(goal_y - start_y))
+    open_set = [(best_estimate, best_estimate, start_index, start_x, start_y)]
+    expansions = 0
+
+    while open_set:
+        _, _, index, x, y = heapq.heappop(open_set)
+        if index == goal_index:
+            return _reconstruct_path(came_from, height, start_index, index)
+        if closed[index]:
+            continue
+        closed[index] = 1
+
+        expansions += 1
+        if expansions > max_expansions:
+            break
+
+        g = g_score[index]
+        for dx, dy, offset, cost in steps:
+            next_x, next_y = x + dx, y + dy
+            if 0 <= next_x < width and 0 <= next_y < height:
+                next_index = index + offset
+                if closed[next_index] or blocked[next_index]:
+                    continue
+                next_g = g + cost
+                if next_g < g_score[next_index]:
+                    g_score[next_index] = next_g
+                    came_from[next_index] = index
+                    h = estimate(abs(goal_x - next_x), abs(goal_y - next_y))
+                    if h < best_estimate:
+                        best_index, best_estimate = next_index, h
+                    heapq.heappush(open_set, (next_g + h, h, next_index, next_x, next_y))
+
+    return _reconstruct_path(came_from, height, start_index, best_index)
+
+
+def dijkstra_search(graph, start, goal, diagonal=True, max_expansions=40000):
+    """Uniform cost search, A* without a heuristic"""
+    return a_star_search(graph, start, goal, heuristic='dijkstra', diagonal=diagonal, max_expansions=max_expansions)
+
+
+def dijkstra_map(graph, sources, diagonal=True):
+    """Number of steps from the closest source to every tile, as a flat list indexed by x * height + y.
+    Tiles that can't be reached keep the value returned by unreachable(graph)"""
+    width, height = graph.width, graph.height
+    blocked = graph.blocked.tobytes()
+    steps = _steps(height, 'chebyshev', diagonal)
+
+    distances = [unreachable(graph)] * (width * height)
+    frontier = collections.deque()
+    for x, y in sources:
+        distances[x * height + y] = 0
+        frontier.append((x * height + y, x, y))
+
+    while frontier:
+        index, x, y = frontier.popleft()
+        distance = distances[index] + 1
+        for dx, dy, offset, _ in steps:
+            next_x, next_y = x + dx, y + dy
+            if 0 <= next_x < width and 0 <= next_y < height:
+                next_index = index + offset
+                if distance < distances[next_index] and not blocked[next_index]:
+                    distances[next_index] = distance
+                    frontier.append((next_index, next_x, next_y))
+
+    return distances
+
+
+def unreachable(graph):
+    return graph.width * graph.height
+
+
+class FlowField(object):
+    """A distance map toward a single target shared by everything that chases it.
+    It is computed once, lazily, the first time someone asks for a step, and only thrown away
+    when the target moves or the blocking layout of the map changes"""
+    def __init__(self, graph, diagonal=True):
+        self.graph = graph
+        self.diagonal = diagonal
+        self.target = None
+        self.distances = None
+        self.layout_version = None
+
+    def __getstate__(self):
+        # the distances are cheap to rebuild, no need to save them
+        state = dict(self.__dict__)
+        state['distances'] = None
+        return state
+
+    def update(self, target):
+        target = tuple(target)
+        if target != self.target:
+            self.target = target
+            self.distances = None
+
+    def targets(self, coord):
+        return self.target is not None and tuple(coord) == self.target
+
+    def get_distances(self):
+        if self.distances is None or self.layout_version != self.graph.layout_version:
+            self.distances = dijkstra_map(self.graph, [self.target], diagonal=self.diagonal)
+            self.layout_version = self.graph.layout_version
+        return self.distances
+
+    def distance(self, coord):
+        x, y = coord
+        return self.get_distances()[x * self.graph.height + y]
+
+    def next_step(self, coord, is_blocked=None):
+        """The downhill neighbor of coord, skipping the ones is_blocked(x, y) rejects, or None if stuck"""
+        distances = self.get_distances()
+        width, height = self.graph.width, self.graph.height
+        x, y = coord
+        current = distances[x * height + y]
+
+        candidates = []
+        for dx, dy in CARDINAL_STEPS + (DIAGONAL_STEPS if self.diagonal else []):
+            next_x, next_y = x + dx, y + dy
+            if 0 <= next_x < width and 0 <= next_y < height:
+                distance = distances[next_x * height + next_y]
+                if distance < current:
+                    candidates.append((distance, next_x, next_y))
+
+        for _, next_x, next_y in sorted(candidates):
+            if is_blocked is None or not is_blocked(next_x, next_y):
+                return (next_x, next_y)
+        return None
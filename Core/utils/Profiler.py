@@ -0,0 +1,95 @@
+"""Per phase timings for the headless runs.
+Methods decorated with timed(phase) are measured only while a PhaseTimer is started, otherwise they cost
+one extra call. Phases are exclusive, the time of a phase nested in another is not counted twice"""
+
+import time
+import functools
+from collections import OrderedDict
+
+try:
+    import resource
+except ImportError:
+    # not available on windows, peak memory is just not reported there
+    resource = None
+
+active_timer = None
+
+
+class PhaseTimer(object):
+    def __init__(self):
+        self.totals = OrderedDict()
+        self.calls = OrderedDict()
+        self._stack = []
+
+    def enter(self, name):
+        # [name, start, time spent on nested phases]
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def exit(self):
+        name, start, nested = self._stack.pop()
+        elapsed = time.perf_counter() - start
+        self.totals[name] = self.totals.get(name, 0.0) + elapsed - nested
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def report(self, turns=None):
+        lines = ["{:<12} {:>10} {:>10} {:>12}".format("phase", "calls", "total ms", "ms per turn")]
+        for name, total in self.totals.items():
+            per_turn = total * 1000 / turns if turns else float('nan')
+            lines.append("{:<12} {:>10} {:>10.1f} {:>12.3f}".format(name, self.calls[name], total * 1000, per_turn))
+        memory = peak_memory_kb()
+        lines.append("peak memory: {}".format("{} KB".format(memory) if memory is not None else "not available"))
+        return "\n".join(lines)
+
+
+class _Phase(object):
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.timer.enter(self.name)
+        return self.timer
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.timer.exit()
+
+
+def start(timer=None):
+    global active_timer
+    active_timer = timer or PhaseTimer()
+    return active_timer
+
+
+def stop():
+    global active_timer
+    timer, active_timer = active_timer, None
+    return timer
+
+
+def timed(phase):
+    """Decorator that accounts the calls of the function to the phase while a timer is started"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            timer = active_timer
+            if timer is None:
+                return function(*args, **kwargs)
+            timer.enter(phase)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                timer.exit()
+        return wrapper
+    return decorator
+
+
+def peak_memory_kb():
+    """Peak resident memory of the process, as reported by getrusage"""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
@@ -0,0 +1,110 @@
+"""Name lookups for the values the data files refer to by name: colors, and the functions and classes of
+the game objects. Every lookup is a dict access instead of scanning dir() and evaluating a string"""
+
+import numpy as np
+from utils import Colors
+
+
+class Registry(object):
+    """Maps names to objects"""
+
+    def __init__(self, entries=None):
+        self.entries = {}
+        # id of the value -> first name it was registered with, the entries keep the values alive
+        self._names = {}
+        for name, value in (entries or {}).items():
+            self.register(name, value)
+
+    @staticmethod
+    def from_class(cls):
+        """Every static method of the class, by name"""
+        return Registry({name: getattr(cls, name) for name, value in vars(cls).items()
+                         if isinstance(value, staticmethod)})
+
+    def register(self, name, value):
+        replaced = self.entries.get(name)
+        self.entries[name] = value
+        if replaced is not None and self._names.get(id(replaced)) == name:
+            # the replaced value keeps the next name it is still registered with, if any
+            del self._names[id(replaced)]
+            for other, entry in self.entries.items():
+                if entry is replaced:
+                    self._names[id(replaced)] = other
+                    break
+        self._names.setdefault(id(value), name)
+        return value
+
+    def get(self, name, default=None):
+        return self.entries.get(name, default)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __getitem__(self, name):
+        return self.entries[name]
+
+    def names(self):
+        return list(self.entries.keys())
+
+    def name_of(self, value, default=None):
+        """The name an object was registered with, the saves refer to functions and classes by it"""
+        return self._names.get(id(value), default)
+
+
+class Palette(object):
+    """Colors by name and by index. The rgb array, shaped (N, 3), can be indexed straight away
+    by arrays of palette indices, and tuples keeps the same colors as tuples for the consoles"""
+
+    def __init__(self):
+        self.names = []
+        self.index = {}
+        self.tuples = []
+        self._rgb_index = {}
+        self.rgb = np.zeros((0, 3), dtype=np.uint8)
+
+    @staticmethod
+    def from_module(module):
+        palette = Palette()
+        for name, value in vars(module).items():
+            if not name.startswith("_") and isinstance(value, tuple) and len(value) == 3:
+                palette.add(name, value)
+        return palette
+
+    def add(self, name, color):
+        """Adds a named color and returns its index"""
+        color = tuple(int(c) for c in color)
+        if name in self.index:
+            return self.index[name]
+        index = len(self.tuples)
+        self.names.append(name)
+        self.index[name] = index
+        self.tuples.append(color)
+        self._rgb_index.setdefault(color, index)
+        self.rgb = np.vstack([self.rgb, np.array(color, dtype=np.uint8)])
+        return index
+
+    def index_of(self, name, default=None):
+        return self.index.get(name, default)
+
+    def index_of_rgb(self, color):
+        """Index of the color, colors not in the palette are added with their rgb as name.
+        Those indices depend on the order they were added in, keep them out of the saves"""
+        color = tuple(int(c) for c in color)
+        index = self._rgb_index.get(color)
+        if index is None:
+            index = self.add("rgb{}".format(color), color)
+        return index
+
+    def get(self, name, default=None):
+        """The color as a tuple, or default when the name is unknown"""
+        index = self.index.get(name)
+        return default if index is None else self.tuples[index]
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __len__(self):
+        return len(self.tuples)
+
+
+colors = Palette.from_module(Colors)
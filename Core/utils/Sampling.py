@@ -0,0 +1,87 @@
+"""Weighted random choices in constant time, using the alias method of Vose.
+A table is compiled once from the weights and every draw takes one index and one coin flip,
+no matter how many entries the table has"""
+
+import random
+
+
+class AliasTable(object):
+    def __init__(self, weights):
+        n = len(weights)
+        total = float(sum(weights))
+        if n == 0 or total <= 0:
+            raise ValueError("An alias table needs at least one positive weight")
+
+        self.size = n
+        self.probability = [0.0] * n
+        self.alias = [0] * n
+
+        scaled = [w * n / total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] = scaled[more] + scaled[less] - 1.0
+            if scaled[more] < 1.0:
+                small.append(more)
+            else:
+                large.append(more)
+
+        # whatever is left is 1 up to rounding errors
+        for i in large + small:
+            self.probability[i] = 1.0
+
+    def draw(self, rng=random):
+        """Index of a random entry, chosen with the probability of its weight"""
+        i = int(rng.random() * self.size)
+        return i if rng.random() < self.probability[i] else self.alias[i]
+
+    def draw_many(self, n, rng=random):
+        size, probability, alias, uniform = self.size, self.probability, self.alias, rng.random
+        indices = []
+        for _ in range(n):
+            i = int(uniform() * size)
+            indices.append(i if uniform() < probability[i] else alias[i])
+        return indices
+
+
+class TagSampler(object):
+    """Weighted entries grouped by tag, an entry with many tags can be drawn from any of them.
+    compile() builds one alias table per tag, entries added afterwards need another compile"""
+
+    def __init__(self, rng=None):
+        self.rng = rng or random
+        self.entries = {}
+        self.weights = {}
+        self.tables = {}
+
+    def add(self, value, weight, tags):
+        for tag in tags:
+            self.entries.setdefault(tag, []).append(value)
+            self.weights.setdefault(tag, []).append(weight)
+
+    def compile(self):
+        self.tables = {tag: AliasTable(weights) for tag, weights in self.weights.items() if sum(weights) > 0}
+        return self
+
+    def __contains__(self, tag):
+        return tag in self.tables
+
+    def _table(self, tag):
+        try:
+            return self.tables[tag]
+        except KeyError:
+            raise KeyError("No entry with a positive weight has the tag {}".format(tag))
+
+    def draw(self, tag):
+        table = self._table(tag)
+        return self.entries[tag][table.draw(self.rng)]
+
+    def draw_many(self, tag, n):
+        """n entries with the tag at once, ex.: draw_many('monster', 200)"""
+        table = self._table(tag)
+        entries = self.entries[tag]
+        return [entries[i] for i in table.draw_many(n, self.rng)]
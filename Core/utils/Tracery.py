@@ -1,6 +1,6 @@
 import tracery
 import random
-from utils import Colors
+from utils import Registry
 from tracery.modifiers import base_english
 
 """Pitch, use Tracery to randomly create monsters, items, magic spells and levels"""
@@ -28,7 +28,7 @@ base_character_yaml = """  - type: Character
 alphabet = "a b c d e f g h i j k l m n o p q r s t u v w x y z"
 alpha = alphabet.upper().split() + alphabet.split()
 
-colors = [color for color in dir(Colors) if "__" not in color]
+colors = Registry.colors.names
 
 
 def generate_monster():
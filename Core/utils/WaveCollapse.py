@@ -0,0 +1,142 @@
+"""Wave function collapse on a grid, with the domain of every cell kept as a bitset of the modules it can
+still take: a python int with bit m set while module m is allowed, so restricting a cell is one and.
+Propagation goes through a worklist of the cells whose domain changed, never over cells that did not. The
+modules allowed next to a cell, in one direction, are the or of the rules of its modules; a grid only ever
+holds a few distinct domains, so that support is computed once per domain and direction and looked up after.
+Cells are collapsed one at a time, always one of those with the fewest modules left"""
+
+import numpy as np
+
+# offset of the neighbour in each direction, in the order of the Cardinals: north, south, east, west.
+# the grid is indexed [x, y] as the maps, north is towards y = 0
+DIRECTIONS = ((0, -1), (0, 1), (1, 0), (-1, 0))
+
+
+def bits_of(allowed):
+    """The bitset of a boolean per module"""
+    bits = 0
+    for module in np.flatnonzero(allowed).tolist():
+        bits |= 1 << module
+    return bits
+
+
+def popcount(bits):
+    return bin(bits).count('1')
+
+
+class WaveFunctionCollapse(object):
+    def __init__(self, rules, weights, width, height, rng):
+        """rules[d, a, b] tells if module b can be the neighbour in direction d of module a"""
+        rules = np.asarray(rules, dtype=bool)
+        self.weights = [float(weight) for weight in weights]
+        self.modules = len(self.weights)
+        self.width = width
+        self.height = height
+        self.rng = rng
+        # direction -> module -> modules it allows next to it
+        self.rules = [[bits_of(rules[direction, module]) for module in range(self.modules)]
+                      for direction in range(len(DIRECTIONS))]
+        # direction -> domain -> modules the domain allows next to it, kept over resets
+        self.supports = [{} for _ in DIRECTIONS]
+        # direction -> cell -> its neighbour, -1 off the grid. Cells are indexed x * height + y, as the flat maps
+        self.neighbours = [[(x + dx) * height + y + dy if 0 <= x + dx < width and 0 <= y + dy < height else -1
+                            for x in range(width) for y in range(height)] for dx, dy in DIRECTIONS]
+        self.domains = None
+        self.counts = None
+        self.collapses = 0
+        self.reset()
+
+    def reset(self):
+        """Allows every module on every cell again, to start another collapse with the same rules"""
+        cells = self.width * self.height
+        self.domains = [(1 << self.modules) - 1] * cells
+        # modules left on every cell
+        self.counts = np.full(cells, self.modules, dtype=np.int32)
+
+    def restrict(self, x1, y1, x2, y2, allowed):
+        """Keeps only the allowed modules, a boolean per module, on the cells of the block"""
+        bits = bits_of(allowed)
+        for x in range(x1, x2):
+            for y in range(y1, y2):
+                cell = x * self.height + y
+                self.domains[cell] &= bits
+                self.counts[cell] = popcount(self.domains[cell])
+
+    def support(self, direction, domain):
+        """The modules a cell with the domain allows next to it in the direction"""
+        supports = self.supports[direction]
+        bits = supports.get(domain)
+        if bits is None:
+            bits = 0
+            rules = self.rules[direction]
+            rest = domain
+            while rest:
+                lowest = rest & -rest
+                bits |= rules[lowest.bit_length() - 1]
+                rest ^= lowest
+            supports[domain] = bits
+        return bits
+
+    def propagate(self, cells=None):
+        """Removes from the domains every module left without a neighbour it can stand next to, starting from
+        the cells given, every cell when none. Returns False on a contradiction, a cell with no module left"""
+        domains, counts = self.domains, self.counts
+        pending = list(range(len(domains))) if cells is None else list(cells)
+        queued = set(pending)
+        while pending:
+            cell = pending.pop()
+            queued.discard(cell)
+            domain = domains[cell]
+            for direction, neighbours in enumerate(self.neighbours):
+                neighbour = neighbours[cell]
+                if neighbour < 0:
+                    continue
+                before = domains[neighbour]
+                after = before & self.support(direction, domain)
+                if after == before:
+                    continue
+                if not after:
+                    return False
+                domains[neighbour] = after
+                counts[neighbour] = popcount(after)
+                if neighbour not in queued:
+                    queued.add(neighbour)
+                    pending.append(neighbour)
+        return True
+
+    def _choose(self, domain):
+        modules = [module for module in range(self.modules) if domain >> module & 1]
+        total = sum(self.weights[module] for module in modules)
+        pick = self.rng.random() * total
+        for module in modules:
+            pick -= self.weights[module]
+            if pick < 0:
+                return module
+        return modules[-1]
+
+    def collapse(self):
+        """Collapses one of the undecided cells with the fewest modules left and propagates it.
+        Returns None when every cell is decided, False on a contradiction"""
+        counts = self.counts
+        undecided = counts > 1
+        if not undecided.any():
+            return None
+        fewest = counts[undecided].min()
+        cell = self.rng.choice(np.flatnonzero(counts == fewest).tolist())
+
+        self.domains[cell] = 1 << self._choose(self.domains[cell])
+        counts[cell] = 1
+        self.collapses += 1
+        return self.propagate([cell])
+
+    def run(self):
+        """Collapses the whole grid. Returns the module of every cell, or None on a contradiction"""
+        if not self.propagate():
+            return None
+        while True:
+            collapsed = self.collapse()
+            if collapsed is None:
+                return np.array([domain.bit_length() - 1 for domain in self.domains]).reshape(
+                    self.width, self.height)
+            if not collapsed:
+                return None